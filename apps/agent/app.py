@@ -1,6 +1,10 @@
 import os
+import sys
 import streamlit as st
 
+# The shared LLM client layer lives in apps/shared
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
 from src.constants import DESCRIPTION, SYSTEM_PROMPT
 from src.tools import tools
 from src.llm import validate_openai_api_key, initialize_sidebar, get_agent
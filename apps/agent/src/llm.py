@@ -1,11 +1,12 @@
 import streamlit as st
 from langchain.agents import AgentExecutor, create_react_agent
-from langchain_openai import OpenAI, ChatOpenAI
-from langchain.prompts import PromptTemplate
+from langchain_openai import OpenAI
 from langchain.chains import LLMChain
 
 from .constants import SYSTEM_PROMPT
 
+from shared.llm import get_chat_model, prompt_template
+
 def validate_openai_api_key(api_key):
     """Check if the OpenAI API key is valid. Returns True if valid, False otherwise. Shows a warning in the sidebar if invalid."""
     if not api_key:
@@ -57,12 +58,13 @@ def initialize_sidebar():
 
 def get_agent(tools: list) -> AgentExecutor:
     """Create and return an agent executor for multi-turn LLM agent."""
-    agent_prompt = PromptTemplate(
-        input_variables=["input", "tool_names", "chat_history"], 
-        template=SYSTEM_PROMPT + "\nPrevious conversation:\n{chat_history}\n"
+    agent_prompt = prompt_template(
+        SYSTEM_PROMPT + "\nPrevious conversation:\n{chat_history}\n",
+        input_variables=["input", "tool_names", "chat_history"]
     )
-    llm = ChatOpenAI(
-        model=st.session_state['model'], 
+    # Shared across reruns: pooled connections and per-model rate limits
+    llm = get_chat_model(
+        st.session_state['model'], 
         temperature=st.session_state['temperature'] 
     )
     agent = create_react_agent(llm, tools, agent_prompt)
@@ -1,10 +1,10 @@
-from langchain_openai import OpenAI 
 from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
 from langchain.tools import Tool
 from langchain_community.tools import DuckDuckGoSearchRun
 from langchain_community.utilities import WikipediaAPIWrapper
 
+from shared.llm import get_completion_model, prompt_template
+
 
 
 # Web search tool
@@ -38,8 +38,8 @@ def create_calculator_chain():
     Think step by step until you reach the final answer.
     Your final response should be the answer to the math problem, without any additional text.
     """
-    calculator_prompt = PromptTemplate(template=calculator_template, input_variables=["query"])
-    calculator_llm = OpenAI(
+    calculator_prompt = prompt_template(calculator_template, input_variables=["query"])
+    calculator_llm = get_completion_model(
         temperature=0
     )
     return calculator_prompt | calculator_llm
@@ -6,6 +6,32 @@ import streamlit as st
 from src.ui.main import validate_openai_api_key, init_sidebar
 
 
+@st.cache_resource(show_spinner="Loading card search indexes...")
+def load_search():
+    """Open the vector store and load the search indexes once per process; reruns skip straight past it."""
+    from src.search import warm_up
+    warm_up()
+
+
+async def render_answer(events):
+    """Show pipeline_stream progress as it happens: stage status, then the answer as it is generated."""
+    status = st.status("Searching...")
+    answer = st.empty()
+    text = ""
+    async for kind, value in events:
+        if kind == "status":
+            status.update(label=value)
+        elif kind == "candidates":
+            status.update(label=f"Ranking {value} candidate cards...")
+        elif kind == "token":
+            text += value
+            answer.markdown(text + "▌")
+        else:
+            text = value
+    answer.markdown(text)
+    status.update(label="Done", state="complete")
+
+
 def run():
     # STREAMLIT APP CONFIGURATION
     st.set_page_config(page_title="AI MTG Card Search & Rec", layout="wide")
@@ -26,17 +52,15 @@ def run():
     # Only proceed if API key is provided
     if validate_openai_api_key(api_key):
         os.environ["OPENAI_API_KEY"] = api_key 
-        from src.db.vectorstore import get_vector_store
-        from src.llm import pipeline
+        from src.llm import pipeline_stream
         
-        vectorstore = get_vector_store()
+        load_search()
+        filters = init_sidebar()
 
         query = st.text_input("Enter your card search query:")
 
         if query:
-            
-            response = asyncio.run(pipeline(query))
-            st.markdown(response)
+            asyncio.run(render_answer(pipeline_stream(query, filters=filters, k=st.session_state['k'])))
         
 
 if __name__ == "__main__":
@@ -0,0 +1,78 @@
+"""Resident-memory comparison of the plain-object vs. compact card table.
+
+Also checks that `to_object_frame(compact_card_table(df))` round-trips exactly, and that a warm
+(cached Arrow) load_card_table gives the same dtypes and values as a cold build. Run from `apps/ai_mtg_search`:
+
+    python -m benchmarks.card_table
+"""
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from src.db import utils
+from src.db.utils import JSON_PATH, iter_card_chunks, compact_card_table, to_object_frame
+from benchmarks.normalize import frame_differences
+
+
+def table_mb(df):
+    """Deep memory usage of a DataFrame in MB (includes Python string/float objects)."""
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default=str(JSON_PATH))
+    parser.add_argument('--top', type=int, default=10, help='largest columns to list')
+    args = parser.parse_args()
+
+    plain = pd.concat(iter_card_chunks(args.path))
+
+    start = time.perf_counter()
+    compact = compact_card_table(plain)
+    compact_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    restored = to_object_frame(compact)
+    restore_seconds = time.perf_counter() - start
+
+    plain_mb, compact_mb = table_mb(plain), table_mb(compact)
+    print(f"rows: {len(plain)}")
+    print(f"plain-object: {plain_mb:.1f} MB  compact: {compact_mb:.1f} MB  ({plain_mb / compact_mb:.1f}x smaller)")
+    print(f"compact: {compact_seconds:.2f}s  to_object_frame: {restore_seconds:.2f}s\n")
+
+    usage = pd.DataFrame({
+        'plain_mb': plain.memory_usage(deep=True, index=False) / (1024 * 1024),
+        'compact_mb': compact.memory_usage(deep=True, index=False) / (1024 * 1024),
+        'compact_dtype': compact.dtypes.astype(str),
+    }).sort_values('plain_mb', ascending=False)
+    print(usage.head(args.top).round(2).to_string())
+
+    with tempfile.TemporaryDirectory() as cache_folder:
+        utils.JSON_PATH, utils.CACHE_FOLDER = Path(args.path), Path(cache_folder)
+        start = time.perf_counter()
+        cold = utils.load_card_table()
+        cold_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        warm = utils.load_card_table()
+        warm_seconds = time.perf_counter() - start
+        print(f"\nload_card_table cold: {cold_seconds:.2f}s  warm: {warm_seconds:.3f}s")
+        cache_diffs = frame_differences(cold, warm)
+        del warm
+
+    failures = []
+    diffs = frame_differences(plain, restored)
+    if diffs:
+        failures.append(f"round trip differs in: {', '.join(diffs)}")
+    if cache_diffs:
+        failures.append(f"cached card table differs from a cold build in: {', '.join(cache_diffs)}")
+    for failure in failures:
+        print(f"\nFAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
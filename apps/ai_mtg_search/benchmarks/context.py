@@ -0,0 +1,70 @@
+"""Ranker context size: the old all-fields rows vs the compact encoding, with and without the token budget.
+
+Candidate pools are random card table rows with descending scores, sized like seed card searches
+(K=50 per text line). Counts with the tiktoken encoding, falling back to ~4 characters per token when it
+can't be loaded; `--approx` always estimates. Run from `apps/ai_mtg_search`:
+
+    python -m benchmarks.context --pools 50 150 300 --budget 4000
+"""
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.db import utils
+from src.db.utils import get_card_table, to_object_columns
+from src.context import build_context
+from src.tokens import estimate_tokens, token_counter
+from src.search import OUTPUT_FIELDS, normalize
+
+MODEL = "gpt-4.1-nano"
+
+
+def old_context(ranked):
+    header = '|'.join(OUTPUT_FIELDS + ['baseline_score']) + '\n'
+    return header + '\n'.join('|'.join([str(c) for c in normalize(metadata, just_values=True)] + [f'{score:.4f}']) for metadata, score in ranked)
+
+
+def sample_pool(df, size, rng):
+    rows = rng.choice(len(df), size, replace=False)
+    columns = to_object_columns(df.iloc[rows])
+    cards = [{field: value for field, value in zip(columns, values) if value is not None} for values in zip(*columns.values())]
+    return list(zip(cards, np.sort(rng.random(size))[::-1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pools', type=int, nargs='+', default=[50, 150, 300])
+    parser.add_argument('--budget', type=int, default=4000)
+    parser.add_argument('--trials', type=int, default=5)
+    parser.add_argument('--approx', action='store_true', help="count ~4 characters per token instead of loading tiktoken")
+    parser.add_argument('--path', help="AtomicCards.json to sample cards from")
+    args = parser.parse_args()
+
+    if args.path:
+        utils.JSON_PATH = Path(args.path)
+    count_tokens = estimate_tokens if args.approx else token_counter(MODEL)
+    df = get_card_table()
+    rng = np.random.default_rng(0)
+
+    rows = []
+    for size in args.pools:
+        for _ in range(args.trials):
+            ranked = sample_pool(df, size, rng)
+            compact, _ = build_context(ranked, count_tokens, budget=10 ** 9)
+            start = time.perf_counter()
+            budgeted, included = build_context(ranked, count_tokens, budget=args.budget)
+            elapsed = time.perf_counter() - start
+            rows.append({
+                'candidates': size, 'old_tokens': count_tokens(old_context(ranked)), 'compact_tokens': count_tokens(compact),
+                'budgeted_tokens': count_tokens(budgeted), 'rows_kept': included, 'build_ms': elapsed * 1000,
+            })
+    table = pd.DataFrame(rows).groupby('candidates').median().reset_index()
+    table['compact_saving'] = 1 - table.compact_tokens / table.old_tokens
+    print(table.round(2).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
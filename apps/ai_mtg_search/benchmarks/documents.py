@@ -0,0 +1,73 @@
+"""Time Document construction for the full card set: row-wise `iterrows` builder vs. column-wise batches.
+
+Checks both builders produce the same documents. Run from `apps/ai_mtg_search`:
+
+    python -m benchmarks.documents
+"""
+import sys
+import time
+import argparse
+
+import pandas as pd
+from langchain.schema import Document
+
+from src.constants import METADATA_FIELDS
+from src.db.utils import JSON_PATH, iter_card_chunks, compact_card_table, to_object_frame
+from src.db.vectorstore import iter_search_documents
+
+
+def reference_create_search_documents(df):
+    """Original row-wise implementation of create_search_documents, kept as the baseline."""
+    docs = []
+    for _, row in df.iterrows():
+        # Create metadata dict using only fields defined in METADATA_FIELDS
+        metadata = {
+            col: val for col, val in row.items()
+            # Pinecone requires metadata if it is present,
+            # `val is not None` is to avoid empty strings/fields
+            if col in METADATA_FIELDS and val is not None
+        }
+
+        name = row['faceName']
+        text = row['text'] if pd.notna(row['text']) else ''
+        page_content = f'{name}:{text}'
+        docs.append(Document(page_content=page_content, metadata=metadata))
+    return docs
+
+
+def document_key(doc):
+    """Comparable form of a Document, including value types."""
+    return doc.page_content, [(k, type(v), repr(v)) for k, v in doc.metadata.items()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default=str(JSON_PATH))
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    compact = compact_card_table(pd.concat(iter_card_chunks(args.path)))
+    plain = to_object_frame(compact)
+
+    start = time.perf_counter()
+    expected = reference_create_search_documents(plain)
+    reference_seconds = time.perf_counter() - start
+
+    # Consume batch by batch, as build_vectorstore does, keeping only counts
+    start = time.perf_counter()
+    total = sum(len(batch) for batch in iter_search_documents(compact, batch_size=args.batch_size))
+    batched_seconds = time.perf_counter() - start
+
+    actual = [doc for batch in iter_search_documents(compact, batch_size=args.batch_size) for doc in batch]
+    print(f"documents: {total}")
+    print(f"iterrows: {reference_seconds:.2f}s  column-wise: {batched_seconds:.2f}s  "
+          f"({reference_seconds / batched_seconds:.1f}x faster)")
+
+    mismatched = sum(document_key(a) != document_key(b) for a, b in zip(expected, actual))
+    if mismatched or len(expected) != len(actual):
+        print(f"FAIL: {mismatched} documents differ ({len(expected)} vs {len(actual)})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
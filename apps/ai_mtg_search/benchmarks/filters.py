@@ -0,0 +1,103 @@
+"""Filtered vector search: masking inside the local index vs over-fetching and filtering afterwards.
+
+Uses synthetic clustered vectors and random row masks at several selectivities, so it runs without the
+embedding API. "filled" is the fraction of queries that got all k results and "recall" is measured
+against exact masked search. Also times compiling sidebar selections when a card file is available.
+Run from `apps/ai_mtg_search`:
+
+    python -m benchmarks.filters --rows 35000 --path /path/to/AtomicCards.json
+"""
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.db import utils
+from src.db.local_index import normalize_rows
+from benchmarks.local_index import build, clustered_vectors, recall
+
+SELECTIONS = [
+    {'types': ['Creature']},
+    {'types': ['Creature'], 'subtypes': ['Elf', 'Goblin'], 'colorIdentity': ['G', 'R']},
+    {'types': ['Creature'], 'subtypes': ['Elf'], 'colorIdentity': ['G'], 'manaValue': '<=3', 'legalities.commander': 'Legal'},
+]
+
+
+def time_search(index, queries, k, **search_kwargs):
+    results, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append([row for row, _ in index.search(query, k=k, **search_kwargs)])
+        timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1000, results
+
+
+def post_filter(index, queries, k, mask, overfetch, **search_kwargs):
+    """The old approach: fetch k * overfetch unfiltered results, then drop the ones the filter rejects."""
+    results, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = index.search(query, k=k * overfetch, **search_kwargs)
+        results.append([row for row, _ in hits if mask[row]][:k])
+        timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1000, results
+
+
+def compile_selections():
+    from src.db.filters import get_filter_index
+
+    start = time.perf_counter()
+    filter_index = get_filter_index()
+    print(f"filter bitmaps: {time.perf_counter() - start:.2f}s for {filter_index.size} rows")
+    for selections in SELECTIONS:
+        timings = []
+        for _ in range(50):
+            start = time.perf_counter()
+            card_filter = filter_index.compile(selections)
+            timings.append(time.perf_counter() - start)
+        print(f"  {np.median(timings) * 1e3:.3f}ms -> {len(card_filter)} cards  {selections}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=35000)
+    parser.add_argument('--dimension', type=int, default=1536)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--overfetch', type=int, default=4)
+    parser.add_argument('--selectivity', type=float, nargs='+', default=[0.5, 0.1, 0.01])
+    parser.add_argument('--path', help="AtomicCards.json to compile sidebar selections against")
+    args = parser.parse_args()
+
+    if args.path:
+        utils.JSON_PATH = Path(args.path)
+        compile_selections()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(args.rows, args.dimension, 300, rng)
+    queries = normalize_rows(vectors[rng.choice(args.rows, args.queries)] + 0.02 * rng.standard_normal((args.queries, args.dimension)))
+    index = build(Path(tempfile.mkdtemp()), vectors, 'float32')
+    index.build_ivf()
+
+    rows = []
+    for selectivity in args.selectivity:
+        mask = rng.random(args.rows) < selectivity
+        _, expected = time_search(index, queries, args.k, mask=mask, exact=True)
+        runs = {
+            'mask exact': time_search(index, queries, args.k, mask=mask, exact=True),
+            'mask ivf': time_search(index, queries, args.k, mask=mask, exact=False),
+            f'post-filter x{args.overfetch} ivf': post_filter(index, queries, args.k, mask, args.overfetch, exact=False),
+        }
+        for name, (ms, results) in runs.items():
+            rows.append({
+                'selectivity': selectivity, 'mode': name, 'median_ms': ms,
+                'filled': np.mean([len(r) == args.k for r in results]), 'recall': recall(expected, results),
+            })
+    print(pd.DataFrame(rows).round(3).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Recall@K on gold.json for dense, lexical (BM25) and hybrid (RRF) retrieval at several K.
+
+Shows how small K can get in hybrid mode before recall drops below dense retrieval at K=50.
+Needs a built vector store (either backend) and the embedding API. Run from `apps/ai_mtg_search`:
+
+    python -m benchmarks.hybrid --ks 10 20 30 50
+"""
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from src.search import dense_search, lexical_search, hybrid_search
+from benchmarks.retrieval import GOLD_PATH
+
+RETRIEVERS = {'dense': dense_search, 'lexical': lexical_search, 'hybrid': hybrid_search}
+
+
+def found_names(results):
+    names = set()
+    for metadata, _ in results:
+        names.update(name.lower() for name in (metadata.get('cardName'), metadata.get('faceName')) if name)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--gold', default=str(GOLD_PATH))
+    parser.add_argument('--ks', type=int, nargs='+', default=[10, 20, 30, 50])
+    args = parser.parse_args()
+
+    with open(args.gold, "r") as f:
+        gold = [entry for entry in json.load(f) if entry.get('expected_cards')]
+
+    # Warm up lazy indexes so the first query isn't charged for loading them
+    hybrid_search(gold[0]['query'], 1)
+
+    rows = []
+    for name, retrieve in RETRIEVERS.items():
+        for k in args.ks:
+            recalls, timings = [], []
+            for entry in gold:
+                start = time.perf_counter()
+                results = retrieve(entry['query'], k)
+                timings.append(time.perf_counter() - start)
+                names = found_names(results)
+                recalls.append(np.mean([card.lower() in names for card in entry['expected_cards']]))
+            rows.append({'retriever': name, 'K': k, 'gold_recall': np.mean(recalls), 'median_ms': np.median(timings) * 1000})
+
+    table = pd.DataFrame(rows)
+    print(table.round(3).to_string(index=False))
+
+    dense_50 = table[(table.retriever == 'dense') & (table.K == max(args.ks))].gold_recall.iloc[0]
+    enough = table[(table.retriever == 'hybrid') & (table.gold_recall >= dense_50)]
+    if len(enough):
+        print(f"\nhybrid matches dense@{max(args.ks)} recall ({dense_50:.3f}) at K={enough.K.min()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Memory/time benchmark for AtomicCards ingestion: full `json.load` path vs. streaming chunks.
+
+Each mode runs in a fresh subprocess so peak RSS is measured independently.
+Run from `apps/ai_mtg_search`:
+
+    python -m benchmarks.ingest --chunk-size 2000
+"""
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+import pandas as pd
+
+from src.db.utils import JSON_PATH, CARD_CHUNK_SIZE, transform_card_data, iter_card_chunks
+
+MODES = ['in_memory', 'streaming']
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_mode(mode, path, chunk_size):
+    """Load the card table with one ingestion mode and return its timing/memory stats."""
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == 'in_memory':
+        with open(path, "r", encoding="utf-8") as f:
+            df = transform_card_data(json.load(f)["data"])
+    else:
+        df = pd.concat(iter_card_chunks(path, chunk_size=chunk_size))
+    elapsed = time.perf_counter() - start
+    return {
+        'mode': mode,
+        'rows': len(df),
+        'seconds': round(elapsed, 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'ingest_rss_mb': round(peak_rss_mb() - baseline, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default=str(JSON_PATH))
+    parser.add_argument('--chunk-size', type=int, default=CARD_CHUNK_SIZE)
+    parser.add_argument('--mode', choices=MODES, help='run a single mode in this process')
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.path, args.chunk_size)))
+        return
+
+    results = []
+    for mode in MODES:
+        out = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.ingest', '--mode', mode,
+             '--path', args.path, '--chunk-size', str(args.chunk_size)],
+            check=True, capture_output=True, text=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(pd.DataFrame(results).to_string(index=False))
+    in_memory, streaming = results
+    print(
+        f"\nstreaming: {in_memory['ingest_rss_mb'] / max(streaming['ingest_rss_mb'], 1):.1f}x less ingest memory, "
+        f"{in_memory['seconds'] / max(streaming['seconds'], 1e-9):.1f}x speedup"
+    )
+
+
+if __name__ == "__main__":
+    main()
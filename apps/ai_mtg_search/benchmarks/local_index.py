@@ -0,0 +1,86 @@
+"""Query latency and recall of the local vector index: exact float32, exact float16 and IVF.
+
+Uses synthetic clustered unit vectors (card-set sized by default) so it runs without the
+embedding API. Recall@k is measured against exact float32 search. Run from `apps/ai_mtg_search`:
+
+    python -m benchmarks.local_index --rows 35000 --queries 200
+"""
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.db.local_index import LocalVectorIndex, normalize_rows
+
+
+def clustered_vectors(rows, dimension, clusters, rng):
+    """Unit vectors scattered around random cluster centers, roughly like topic-grouped card text."""
+    centers = normalize_rows(rng.standard_normal((clusters, dimension)))
+    labels = rng.integers(0, clusters, rows)
+    return normalize_rows(centers[labels] + 0.6 * rng.standard_normal((rows, dimension)) / np.sqrt(dimension) * 4)
+
+
+def build(folder, vectors, dtype, batch_size=1000):
+    index = LocalVectorIndex("bench", folder=folder, dtype=dtype)
+    for start in range(0, len(vectors), batch_size):
+        index.upsert(vectors=[
+            {'id': str(start + i), 'values': vector, 'metadata': {'row': start + i}}
+            for i, vector in enumerate(vectors[start:start + batch_size])
+        ])
+    return index
+
+
+def time_queries(index, queries, k, **search_kwargs):
+    """Median per-query latency (ms) and the returned rows."""
+    results, timings = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append([row for row, _ in index.search(query, k=k, **search_kwargs)])
+        timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1000, results
+
+
+def recall(expected, actual):
+    return np.mean([len(set(e) & set(a)) / len(e) for e, a in zip(expected, actual)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=35000)
+    parser.add_argument('--dimension', type=int, default=1536)
+    parser.add_argument('--clusters', type=int, default=300)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--probes', type=int, nargs='+', default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(args.rows, args.dimension, args.clusters, rng)
+    # Queries are perturbed copies of stored vectors
+    queries = normalize_rows(vectors[rng.choice(args.rows, args.queries)] + 0.02 * rng.standard_normal((args.queries, args.dimension)))
+
+    folder = Path(tempfile.mkdtemp())
+    f32 = build(folder / "f32", vectors, 'float32')
+    f16 = build(folder / "f16", vectors, 'float16')
+
+    rows = []
+    exact_ms, exact = time_queries(f32, queries, args.k, exact=True)
+    rows.append({'mode': 'exact float32', 'median_ms': exact_ms, f'recall@{args.k}': 1.0})
+    ms, results = time_queries(f16, queries, args.k, exact=True)
+    rows.append({'mode': 'exact float16', 'median_ms': ms, f'recall@{args.k}': recall(exact, results)})
+
+    start = time.perf_counter()
+    f32.build_ivf()
+    print(f"IVF build: {time.perf_counter() - start:.1f}s, {len(f32.centroids)} lists")
+    for probes in args.probes:
+        ms, results = time_queries(f32, queries, args.k, exact=False, n_probe=probes)
+        rows.append({'mode': f'ivf n_probe={probes}', 'median_ms': ms, f'recall@{args.k}': recall(exact, results)})
+
+    print(pd.DataFrame(rows).round(3).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Regression benchmark for `preprocess_card_fields` on the full card set.
+
+Checks that the output is identical to the original column-by-column implementation
+(kept below as the reference) and exits non-zero if normalization takes more than
+`--max-ratio` of the reference's runtime. Run from `apps/ai_mtg_search`:
+
+    python -m benchmarks.normalize
+"""
+import sys
+import json
+import time
+import argparse
+import warnings
+
+import pandas as pd
+
+from src.constants import METADATA_FIELDS
+from src.db.utils import JSON_PATH, flatten_card_data, preprocess_card_fields
+
+
+def reference_preprocess_card_fields(df):
+    """Original per-column implementation of preprocess_card_fields, kept as the correctness/speed baseline."""
+    # First convert all NaN values to None
+    df = df.replace([pd.NA, pd.NaT, ''], None)
+    df = df.where(pd.notna(df), None)
+
+    # Process each field according to its type
+    for col, field_info in METADATA_FIELDS.items():
+
+        if col not in df.columns:
+            df[col] = None
+            continue
+
+        field_type = field_info['type']
+        if field_type == 'string_array':
+            if col in ['rulings', 'foreignData']:
+                df[col] = df[col].astype(str)
+            else:
+                # Convert lists to comma-separated strings, properly handling each array element
+                df[col] = df[col].apply(lambda x: ','.join(x) if isinstance(x, list) and x else None)
+        elif field_type == 'boolean':
+            # Convert nulls to False for boolean fields
+            df[col] = df[col].fillna(False)
+        elif field_type == 'number':
+            # Ensure numbers are numeric, convert NaN to None
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(object)
+            df[col] = df[col].where(df[col].notna(), None)
+
+        # handle strings specifically or do nothing
+        elif col.startswith('legalities.'):
+            df[col] = df[col].fillna('Not Legal')
+        elif col == 'faceName':
+            locs = df[col].isna()
+            df.loc[locs, 'faceName'] = df.loc[locs, 'name']
+
+
+    return df[list(METADATA_FIELDS.keys())]
+
+
+def frame_differences(expected, actual):
+    """List every column whose dtype, value types or value reprs differ (stricter than DataFrame.equals, which treats None == NaN)."""
+    if list(expected.columns) != list(actual.columns) or not expected.index.equals(actual.index):
+        return ['<columns or index>']
+    return [
+        col for col in expected.columns
+        if expected[col].dtype != actual[col].dtype
+        or [(type(v), repr(v)) for v in expected[col]] != [(type(v), repr(v)) for v in actual[col]]
+    ]
+
+
+def best_time(func, df, repeats):
+    """Best-of-`repeats` wall time for func(df), plus its last result."""
+    best = float('inf')
+    for _ in range(repeats):
+        # Both implementations must start from an untouched frame
+        frame = df.copy()
+        start = time.perf_counter()
+        result = func(frame)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default=str(JSON_PATH))
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--max-ratio', type=float, default=0.8,
+                        help='fail if new time / reference time exceeds this')
+    args = parser.parse_args()
+
+    with open(args.path, "r", encoding="utf-8") as f:
+        raw = flatten_card_data(json.load(f)["data"])
+
+    with warnings.catch_warnings():
+        # The reference relies on pandas' deprecated fillna downcasting
+        warnings.simplefilter('ignore', FutureWarning)
+        reference_time, expected = best_time(reference_preprocess_card_fields, raw, args.repeats)
+    new_time, actual = best_time(preprocess_card_fields, raw, args.repeats)
+
+    ratio = new_time / reference_time
+    print(f"rows: {len(raw)}, raw columns: {raw.shape[1]}")
+    print(f"reference: {reference_time:.3f}s  vectorized: {new_time:.3f}s  ratio: {ratio:.2f} (max {args.max_ratio})")
+
+    failures = []
+    diffs = frame_differences(expected, actual)
+    if diffs:
+        failures.append(f"output differs from reference in: {', '.join(diffs)}")
+    if ratio > args.max_ratio:
+        failures.append(f"normalization regressed: ratio {ratio:.2f} > {args.max_ratio}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
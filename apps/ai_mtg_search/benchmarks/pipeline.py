@@ -0,0 +1,147 @@
+"""Throughput benchmark for the embed + upsert ingest pipeline against local stand-ins.
+
+A fake embedder and index add fixed per-call latency (and an occasional 429) so the
+sequential and concurrent settings can be compared without OpenAI or Pinecone. A second
+run crashes partway through and is resumed from the checkpoint. Run from `apps/ai_mtg_search`:
+
+    OPENAI_API_KEY=... python -m benchmarks.pipeline --embed-latency 0.2 --upsert-latency 0.05
+"""
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from src.db import utils, vectorstore
+from src.db.ingest import UPSERT_CHUNK_SIZE
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+class LocalEmbedder:
+    """Deterministic embedder that sleeps `latency` per call and rate limits every `limit_every`th call."""
+
+    def __init__(self, latency, limit_every=0):
+        self.latency = latency
+        self.limit_every = limit_every
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        if self.limit_every and calls % self.limit_every == 0:
+            raise RateLimitError("429 Too Many Requests")
+        time.sleep(self.latency)
+        return [[float(hash(text) % 997)] * vectorstore.DIMENSION for text in texts]
+
+
+MAX_REQUEST_BYTES = 2 * 1024 * 1024  # Pinecone's upsert request limit
+
+
+class RequestTooLarge(Exception):
+    status_code = 400
+
+
+class LocalIndex:
+    """In-memory index with upsert latency that can be told to fail after `fail_after` upserts.
+
+    Like Pinecone, it rejects upsert requests larger than MAX_REQUEST_BYTES."""
+
+    def __init__(self, latency, fail_after=None):
+        self.latency = latency
+        self.fail_after = fail_after
+        self.vectors = {}
+        self.upserts = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors):
+        size = len(json.dumps(vectors))
+        if size > MAX_REQUEST_BYTES:
+            raise RequestTooLarge(f"upsert request of {size} bytes ({len(vectors)} vectors) exceeds {MAX_REQUEST_BYTES}")
+        with self._lock:
+            self.upserts += 1
+            if self.fail_after is not None and self.upserts > self.fail_after:
+                raise RuntimeError("simulated crash")
+        time.sleep(self.latency)
+        with self._lock:
+            self.vectors.update((vector['id'], vector) for vector in vectors)
+
+    def delete(self, ids):
+        with self._lock:
+            for vector_id in ids:
+                self.vectors.pop(vector_id, None)
+
+
+def word_count(text):
+    """Offline stand-in for the tiktoken counter."""
+    return len(text.split())
+
+
+def run(df, args, embed_workers, upsert_workers, index=None):
+    """One full ingest into a fresh (or given) local index with an empty embedding cache."""
+    index = index or LocalIndex(args.upsert_latency)
+    stats = vectorstore.ingest_cards(
+        df, index, LocalEmbedder(args.embed_latency, args.limit_every),
+        index_name=args.index_name,
+        batch_size=args.batch_size,
+        count_tokens=word_count,
+        embed_workers=embed_workers,
+        upsert_workers=upsert_workers,
+        retry_kwargs={'base_delay': 0.05},
+        # Every run starts cold, so cache hits don't hide the embedder latency
+        cache_folder=Path(tempfile.mkdtemp()),
+    )
+    return index, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default=str(utils.JSON_PATH))
+    parser.add_argument('--rows', type=int, default=10000, help='cards to ingest (0 for all)')
+    parser.add_argument('--batch-size', type=int, default=250)
+    parser.add_argument('--embed-latency', type=float, default=0.2)
+    parser.add_argument('--upsert-latency', type=float, default=0.05)
+    parser.add_argument('--limit-every', type=int, default=10, help='rate limit every Nth embed call')
+    parser.add_argument('--index-name', default='benchmark-local')
+    args = parser.parse_args()
+
+    # Keep manifests and checkpoints out of the real data folder
+    utils.DATA_FOLDER = vectorstore.DATA_FOLDER = Path(tempfile.mkdtemp())
+    utils.JSON_PATH = Path(args.path)
+    df = utils.load_card_table()
+    if args.rows:
+        df = df.iloc[:args.rows]
+
+    results = []
+    for name, embed_workers, upsert_workers in [('sequential', 1, 1), ('concurrent', 4, 2), ('concurrent-8', 8, 4)]:
+        index, stats = run(df, args, embed_workers, upsert_workers)
+        results.append({'mode': name, 'vectors': len(index.vectors), **stats.summary()})
+    print(pd.DataFrame(results).to_string(index=False))
+
+    # Crash halfway, then resume: only the uncommitted batches should be redone
+    index = LocalIndex(args.upsert_latency, fail_after=len(df) // UPSERT_CHUNK_SIZE // 2)
+    try:
+        run(df, args, 4, 2, index=index)
+    except RuntimeError:
+        pass
+    index.fail_after = None
+    index, stats = run(df, args, 4, 2, index=index)
+    print(f"\nresume: {stats.summary()['resumed_cards']} cards skipped, {stats.cards} re-ingested, "
+          f"{len(index.vectors)}/{len(df)} vectors")
+
+    ok = len(index.vectors) == len(df) and all(result['vectors'] == len(df) for result in results)
+    if not ok:
+        print("FAIL: index is missing vectors")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Query embedding cache: hit rate and per-query latency on a skewed replay of gold.json queries.
+
+Popular queries repeat (Zipf-distributed, with case/whitespace variants), as seed cards and common effect
+phrases do in real traffic. Uses a stand-in embedder with `--latency` per API call, so it runs offline.
+Run from `apps/ai_mtg_search`:
+
+    python -m benchmarks.query_cache --queries 1000 --sizes 0 64 256 4096
+"""
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.db.embeddings import QueryEmbeddingCache
+
+GOLD_PATH = Path(__file__).resolve().parent.parent / "gold.json"
+
+EFFECT_PHRASES = ['draw a card', 'create a token', 'destroy target creature', 'counter target spell', 'add one mana of any color']
+
+
+class LocalEmbedder:
+    """Deterministic stand-in that sleeps `latency` per call, like one API round trip."""
+
+    def __init__(self, latency, dimension):
+        self.latency = latency
+        self.dimension = dimension
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        time.sleep(self.latency)
+        return [np.random.default_rng(abs(hash(text))).standard_normal(self.dimension).tolist() for text in texts]
+
+
+def query_stream(queries, count, rng, skew=1.1):
+    """Zipf-skewed replay of `queries`, some with changed case or spacing (same cache key)."""
+    ranks = np.minimum(rng.zipf(skew, count), len(queries)) - 1
+    variants = [str.lower, str.upper, lambda q: '  ' + q.replace(' ', '  '), lambda q: q]
+    return [variants[rng.integers(len(variants))](queries[r]) for r in ranks]
+
+
+def replay(cache, stream):
+    timings = []
+    for query in stream:
+        start = time.perf_counter()
+        cache.embed_query(query)
+        timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--gold', default=str(GOLD_PATH))
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--dimension', type=int, default=1536)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[0, 16, 64, 4096])
+    args = parser.parse_args()
+
+    with open(args.gold, "r") as f:
+        queries = EFFECT_PHRASES + [entry['query'] for entry in json.load(f)]
+    stream = query_stream(queries, args.queries, np.random.default_rng(0))
+
+    rows = []
+    for size in args.sizes:
+        embedder = LocalEmbedder(args.latency, args.dimension)
+        cache = QueryEmbeddingCache(embedder, "bench", args.dimension, max_size=size)
+        timings = replay(cache, stream)
+        stats = cache.stats()
+        rows.append({
+            'max_size': size, 'hit_rate': stats['hit_rate'], 'api_calls': embedder.calls, 'evictions': stats['evictions'],
+            'mean_ms': timings.mean(), 'p50_ms': np.median(timings), 'p95_ms': np.percentile(timings, 95),
+        })
+    print(pd.DataFrame(rows).round(3).to_string(index=False))
+
+    # Restart: a fresh cache loads the snapshot and serves the same stream without the API
+    path = Path(tempfile.mkdtemp()) / "queries.npz"
+    cache = QueryEmbeddingCache(LocalEmbedder(args.latency, args.dimension), "bench", args.dimension, path=path)
+    replay(cache, stream)
+    cache.save()
+    embedder = LocalEmbedder(args.latency, args.dimension)
+    restarted = QueryEmbeddingCache(embedder, "bench", args.dimension, path=path)
+    replay(restarted, stream)
+    print(f"\nafter restart: {len(restarted)} cached queries loaded, hit rate {restarted.stats()['hit_rate']:.1%}, {embedder.calls} API calls")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Local feature reranker: latency on seed-card sized pools, and gold.json recall of the top-N it keeps.
+
+Latency uses random card table rows (a random card as the seed), so it runs offline. Recall retrieves a
+`--pool` sized candidate list per gold query with `--mode` and compares the expected cards found in the
+first N by retrieval order vs by rerank order. Dense and hybrid modes need a built vector store and the
+embedding API; lexical runs offline. Run from `apps/ai_mtg_search`:
+
+    python -m benchmarks.rerank --pools 150 300 600 --mode hybrid --pool 150 --top 10 20 30
+"""
+import json
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.db import utils
+from src.rerank import FeatureReranker
+from benchmarks.context import sample_pool
+from benchmarks.hybrid import RETRIEVERS, found_names
+from benchmarks.retrieval import GOLD_PATH
+
+
+def time_rerank(reranker, df, sizes, trials, rng):
+    rows = []
+    for size in sizes:
+        for _ in range(trials):
+            pool = sample_pool(df, size + 1, rng)
+            seed, candidates = pool[0][0], pool[1:]
+            start = time.perf_counter()
+            reranker.rerank(candidates, seed=seed)
+            rows.append({'candidates': size, 'rerank_ms': (time.perf_counter() - start) * 1000})
+    print(pd.DataFrame(rows).groupby('candidates').median().round(2).to_string())
+
+
+def gold_recall(reranker, gold, mode, pool_size, tops):
+    rows = []
+    for entry in gold:
+        expected = {name.lower() for name in entry['expected_cards']}
+        candidates = RETRIEVERS[mode](entry['query'], pool_size)
+        reranked = reranker.rerank(candidates, query=entry['query'], top_n=max(tops))
+        for top in tops:
+            rows.append({
+                'top': top,
+                'retrieval_recall': len(expected & found_names(candidates[:top])) / len(expected),
+                'rerank_recall': len(expected & found_names(reranked[:top])) / len(expected),
+            })
+    print(pd.DataFrame(rows).groupby('top').mean().round(3).to_string())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pools', type=int, nargs='+', default=[150, 300, 600])
+    parser.add_argument('--trials', type=int, default=20)
+    parser.add_argument('--mode', choices=list(RETRIEVERS), help="retriever for the gold.json recall run (skipped if unset)")
+    parser.add_argument('--pool', type=int, default=150)
+    parser.add_argument('--top', type=int, nargs='+', default=[10, 20, 30])
+    parser.add_argument('--gold', default=str(GOLD_PATH))
+    parser.add_argument('--path', help="AtomicCards.json to sample cards from")
+    args = parser.parse_args()
+
+    if args.path:
+        utils.JSON_PATH = Path(args.path)
+    reranker = FeatureReranker()
+    time_rerank(reranker, utils.get_card_table(), args.pools, args.trials, np.random.default_rng(0))
+
+    if args.mode:
+        with open(args.gold, "r") as f:
+            gold = [entry for entry in json.load(f) if entry.get('expected_cards')]
+        gold_recall(reranker, gold, args.mode, args.pool, args.top)
+
+
+if __name__ == "__main__":
+    main()
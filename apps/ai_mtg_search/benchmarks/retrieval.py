@@ -0,0 +1,125 @@
+"""Recall@k on the gold.json queries for the local index search modes, with memory and latency.
+
+Modes cover exact search, int8 codes, IVF and Matryoshka two-stage retrieval (truncated
+first stage at each `--dims`, then a full-dimension rerank).
+
+Needs the card index built with the local backend (`VECTOR_BACKEND=local`) and the embedding
+API for the queries. The index is copied to a temp folder so building IVF lists / int8 codes
+for the comparison never changes the live index. Run from `apps/ai_mtg_search`:
+
+    VECTOR_BACKEND=local python -m benchmarks.retrieval --k 50
+"""
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.db.local_index import INDEX_FOLDER, LocalVectorIndex
+from src.db.vectorstore import get_embeddings, LOCAL_INDEX_DTYPE, PINECONE_INDEX_NAME
+
+GOLD_PATH = Path(__file__).resolve().parent.parent / "gold.json"
+
+# name -> (LocalVectorIndex.search kwargs, arrays the first pass keeps resident)
+MODES = {
+    'exact': ({'exact': True, 'quantized': False}, ['vectors']),
+    'int8': ({'exact': True, 'quantized': True, 'rescore': 0}, ['codes']),
+    'int8 + rescore': ({'exact': True, 'quantized': True}, ['codes']),
+    'ivf': ({'exact': False, 'quantized': False}, ['vectors', 'centroids']),
+    'ivf + int8 + rescore': ({'exact': False, 'quantized': True}, ['codes', 'centroids']),
+}
+TRUNCATED_MODES = {
+    'truncated (no rerank)': ({'exact': True, 'truncated': True, 'rescore': 0}, ['prefix']),
+    'truncated + rerank': ({'exact': True, 'truncated': True}, ['prefix']),
+    'ivf + truncated + rerank': ({'exact': False, 'truncated': True}, ['prefix', 'centroids']),
+}
+
+
+def card_names(index, rows):
+    """Card and face names of the returned rows, lower-cased for matching against gold names."""
+    names = set()
+    for row in rows:
+        metadata = index.metadata[row]
+        names.update(name.lower() for name in (metadata.get('cardName'), metadata.get('faceName')) if name)
+    return names
+
+
+def gold_recall(index, gold, results):
+    """Mean fraction of each query's expected cards found in its results."""
+    recalls = []
+    for entry, rows in zip(gold, results):
+        found = card_names(index, rows)
+        recalls.append(np.mean([name.lower() in found for name in entry['expected_cards']]))
+    return float(np.mean(recalls))
+
+
+def overlap(expected, actual):
+    """Mean overlap of each result list with the exact search results."""
+    return float(np.mean([len(set(e) & set(a)) / max(len(e), 1) for e, a in zip(expected, actual)]))
+
+
+def run_mode(index, query_vectors, k, search_kwargs):
+    """Median latency (ms) and the row lists for one search mode."""
+    results, timings = [], []
+    for vector in query_vectors:
+        start = time.perf_counter()
+        results.append([row for row, _ in index.search(vector, k=k, **search_kwargs)])
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000), results
+
+
+def evaluate(index, gold, query_vectors, k, modes=MODES, exact=None):
+    """One row per mode: gold recall@k, overlap with exact search, resident first-pass MB and latency.
+
+    The first mode is the exact reference unless `exact` results are passed in."""
+    rows = []
+    for name, (search_kwargs, resident) in modes.items():
+        latency_ms, results = run_mode(index, query_vectors, k, search_kwargs)
+        exact = exact or results
+        rows.append({
+            'mode': name,
+            f'gold_recall@{k}': gold_recall(index, gold, results),
+            f'exact_overlap@{k}': overlap(exact, results),
+            'resident_mb': sum(getattr(index, attr).nbytes for attr in resident) / (1024 * 1024),
+            'median_ms': latency_ms,
+        })
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--index-name', default=PINECONE_INDEX_NAME)
+    parser.add_argument('--gold', default=str(GOLD_PATH))
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--dims', type=int, nargs='+', default=[256, 512], help='Matryoshka first-stage dimensions')
+    args = parser.parse_args()
+
+    with open(args.gold, "r") as f:
+        gold = [entry for entry in json.load(f) if entry.get('expected_cards')]
+    query_vectors = np.asarray(get_embeddings().embed_documents([entry['query'] for entry in gold]), dtype=np.float32)
+
+    folder = Path(tempfile.mkdtemp())
+    shutil.copytree(INDEX_FOLDER / args.index_name, folder / args.index_name)
+    index = LocalVectorIndex(args.index_name, folder=folder, dtype=LOCAL_INDEX_DTYPE)
+    if index.codes is None:
+        index.quantize()
+    if index.centroids is None:
+        index.build_ivf()
+
+    print(f"{len(gold)} gold queries, {len(index)} vectors")
+    _, exact = run_mode(index, query_vectors, args.k, MODES['exact'][0])
+    results = [evaluate(index, gold, query_vectors, args.k)]
+    for dimension in args.dims:
+        index.truncate(dimension)
+        modes = {f'{name} {dimension}d': mode for name, mode in TRUNCATED_MODES.items()}
+        results.append(evaluate(index, gold, query_vectors, args.k, modes=modes, exact=exact))
+    print(pd.concat(results).round(3).to_string(index=False))
+    shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Fast-path query router on gold.json: share of queries routed locally, routing accuracy and latency.
+
+A gold query's expected route is seed_card when its sub_intent includes "similarity", else text_search.
+OFF_TOPIC_QUERIES (chit-chat that happens to contain card type or subtype words) must be left to the
+planner, which answers them as "unsupported". Runs offline against the card table; `--planner` also sends the deferred queries to the LLM planner
+(needs the OpenAI API) to report end-to-end accuracy. Run from `apps/ai_mtg_search`:
+
+    python -m benchmarks.router --verbose
+"""
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.db import utils
+from src.router import get_router
+
+GOLD_PATH = Path(__file__).resolve().parent.parent / "gold.json"
+OFF_TOPIC_QUERIES = [
+    "What time is it?", "Tell me a joke about a dog", "Who will win the election", "Write me a poem about the moon",
+    "Best pizza in town", "What is the meaning of life", "Draft an email to my landlord", "Is it going to rain tomorrow?",
+    "Recommend a good fantasy novel", "Translate hello into French", "How many legs does a spider have",
+    "Give me a recipe for chicken soup", "Who is the king of England", "Plan a trip to the mountains",
+]
+
+
+def expected_route(entry):
+    sub_intent = entry.get('sub_intent') or []
+    sub_intent = [sub_intent] if isinstance(sub_intent, str) else sub_intent
+    return 'seed_card' if 'similarity' in sub_intent else 'text_search'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--gold', default=str(GOLD_PATH))
+    parser.add_argument('--planner', action='store_true', help="send deferred queries to the LLM planner")
+    parser.add_argument('--verbose', action='store_true', help="print the route of every query")
+    parser.add_argument('--path', help="AtomicCards.json to resolve card names against")
+    args = parser.parse_args()
+
+    if args.path:
+        utils.JSON_PATH = Path(args.path)
+    with open(args.gold, "r") as f:
+        gold = json.load(f)
+
+    start = time.perf_counter()
+    router = get_router()
+    print(f"router build: {time.perf_counter() - start:.2f}s")
+
+    queries = [(entry['query'], expected_route(entry)) for entry in gold]
+    queries += [(query, 'unsupported') for query in OFF_TOPIC_QUERIES]
+    rows = []
+    for query, expected in queries:
+        start = time.perf_counter()
+        plan = router.route(query)
+        elapsed = time.perf_counter() - start
+        rows.append({
+            'query': query, 'expected': expected, 'fast_path': plan is not None,
+            'route': plan['query_type'] if plan else None, 'target': plan and (plan['card_name'] or plan['search_text']),
+            'route_ms': elapsed * 1000,
+        })
+    table = pd.DataFrame(rows)
+
+    if args.planner:
+        from src.llm import query_planner
+
+        async def plan_deferred(queries):
+            return await asyncio.gather(*(query_planner(query) for query in queries))
+
+        deferred = ~table.fast_path
+        plans = asyncio.run(plan_deferred(table.loc[deferred, 'query'].tolist()))
+        table.loc[deferred, 'route'] = [plan['query_type'] for plan in plans]
+
+    if args.verbose:
+        print(table.drop(columns='route_ms').to_string(index=False))
+    fast = table[table.fast_path]
+    print(f"\nfast path: {len(fast)}/{len(table)} queries ({len(fast) / len(table):.0%}), "
+          f"median {np.median(fast.route_ms) if len(fast) else 0:.2f}ms")
+    print(f"fast path accuracy: {(fast.route == fast.expected).mean() if len(fast) else 0:.1%}")
+    off_topic = table[table.expected == 'unsupported']
+    print(f"off-topic left to the planner: {(~off_topic.fast_path).sum()}/{len(off_topic)}")
+    print(table[table.fast_path].groupby('expected').size().rename('fast_path').to_frame()
+          .join(table.groupby('expected').size().rename('queries')).to_string())
+    if args.planner:
+        print(f"overall accuracy (router + planner): {(table.route == table.expected).mean():.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Seed-card retrieval latency: one retrieve_by_text call per card text line vs a single retrieve_by_texts batch.
+
+Needs a built vector store (either backend) and the embedding API. Run from `apps/ai_mtg_search`:
+
+    python -m benchmarks.seed_retrieval --cards "Rhystic Study" "Chatterfang" --repeat 3
+"""
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from src.search import retrieve_by_name, retrieve_by_text, retrieve_by_texts
+
+DEFAULT_CARDS = ['Rhystic Study', 'Chatterfang, Squirrel General', 'Delver of Secrets', 'Smothering Tithe']
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cards', nargs='+', default=DEFAULT_CARDS)
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rows = []
+    for name in args.cards:
+        card = retrieve_by_name(name)
+        if card is None:
+            print(f"skipping unknown card {name!r}")
+            continue
+        lines = [line for line in card['text'].split('\t') if line.strip()]
+        for _ in range(args.repeat):
+            sequential, expected = timed(lambda: [retrieve_by_text(line, K=args.k) for line in lines])
+            batched, results = timed(retrieve_by_texts, lines, K=args.k)
+            rows.append({
+                'card': card['faceName'], 'lines': len(lines), 'sequential_ms': sequential * 1000,
+                'batched_ms': batched * 1000, 'same_results': results == expected,
+            })
+
+    table = pd.DataFrame(rows).groupby(['card', 'lines']).agg(
+        sequential_ms=('sequential_ms', 'median'), batched_ms=('batched_ms', 'median'), same_results=('same_results', 'all'),
+    ).reset_index()
+    table['speedup'] = table.sequential_ms / table.batched_ms
+    print(table.round(1).to_string(index=False))
+    print(f"\nmedian speedup: {np.median(table.speedup):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import os
+import re
+
+# Ranker context size (tokens) for the candidate rows; rows past it are left out, lowest scores first
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "4000"))
+CONTEXT_TEXT_CHARS = 400  # rules text kept per card, so one wordy card can't crowd out the rest
+
+# Ranker columns, in order. side is implied by faceName and manaValue by manaCost, so neither is sent
+CONTEXT_FIELDS = ['cardName', 'faceName', 'type', 'manaCost', 'colorIdentity', 'text', 'power', 'toughness', 'layout', 'legalities.commander']
+CONTEXT_HEADER = '|'.join(CONTEXT_FIELDS + ['baseline_score']) + '\n'
+CONTEXT_LEGEND = (
+    "Encoding: manaCost 2GG = {2}{G}{G}; colorIdentity UG = U,G; legalities.commander L=Legal N=Not Legal "
+    "B=Banned R=Restricted; empty layout = normal; empty faceName = same as cardName; ~ in text = the card's own name.\n"
+)
+
+LEGALITY_CODES = {'Legal': 'L', 'Not Legal': 'N', 'Banned': 'B', 'Restricted': 'R'}
+_SIMPLE_SYMBOL = re.compile(r'\{(\d+|[A-Z])\}')  # {2}, {G}, {X}; hybrid/phyrexian symbols keep their braces
+
+
+def compact_mana(cost):
+    """{2}{G}{G} -> 2GG (multi-part symbols like {G/U} stay as they are)."""
+    return _SIMPLE_SYMBOL.sub(r'\1', cost)
+
+
+def compact_text(text, name=None, limit=CONTEXT_TEXT_CHARS):
+    """One-line rules text with the card's own name as ~, cut at a word boundary past `limit` characters."""
+    text = '; '.join(line.strip() for line in str(text).replace('\t', '\n').splitlines() if line.strip())
+    if name:
+        text = text.replace(name, '~')
+    if len(text) > limit:
+        text = text[:limit].rsplit(' ', 1)[0] + '…'
+    return text
+
+
+def encode_card(metadata, score=None):
+    """One compact pipe-joined context row (CONTEXT_FIELDS, plus the score if given)."""
+    values = {field: metadata.get(field, '') for field in CONTEXT_FIELDS}
+    values = {field: '' if value is None else value for field, value in values.items()}
+    if values['faceName'] == values['cardName']:
+        values['faceName'] = ''
+    values['manaCost'] = compact_mana(str(values['manaCost']))
+    values['colorIdentity'] = str(values['colorIdentity']).replace(',', '')
+    values['text'] = compact_text(values['text'], values['faceName'] or values['cardName'])
+    if values['layout'] == 'normal':
+        values['layout'] = ''
+    legality = values['legalities.commander']
+    values['legalities.commander'] = LEGALITY_CODES.get(legality, legality)
+    row = [str(value).replace('|', '/') for value in values.values()]
+    if score is not None:
+        row.append(f'{score:.4f}')
+    return '|'.join(row)
+
+
+def build_context(ranked, count_tokens, budget=CONTEXT_TOKEN_BUDGET):
+    """Ranker context for [(metadata, score)] candidates, best first, within `budget` tokens.
+
+    Rows are added in score order until the next one would pass the budget. Returns (context, rows included)."""
+    context = [CONTEXT_LEGEND + CONTEXT_HEADER]
+    used = count_tokens(context[0])
+    for metadata, score in ranked:
+        row = encode_card(metadata, score) + '\n'
+        tokens = count_tokens(row)
+        if used + tokens > budget:
+            break
+        context.append(row)
+        used += tokens
+    return ''.join(context).rstrip('\n'), len(context) - 1
@@ -0,0 +1,99 @@
+import hashlib
+
+from src.db.utils import CACHE_FOLDER, CardTableCache, to_object_columns
+from src.db.lexical import BM25Index
+
+CARD_LEXICAL_PREFIX = "cards-bm25-"
+CARD_LEXICAL_FIELDS = ['faceName', 'type', 'text']
+LEXICAL_BATCH_SIZE = 5000
+
+
+def card_lexical_texts(df, batch_size=LEXICAL_BATCH_SIZE):
+    """Yield the indexed text of every card row: face name, type line and rules text."""
+    for start in range(0, len(df), batch_size):
+        columns = to_object_columns(df.iloc[start:start + batch_size], fields=CARD_LEXICAL_FIELDS)
+        for values in zip(*columns.values()):
+            yield ' '.join(value for value in values if value)
+
+
+def card_lexical_key(texts):
+    """Content hash of the indexed card texts, in row order: a saved index is only reused for the very same rows."""
+    digest = hashlib.blake2b(digest_size=8)
+    for text in texts:
+        digest.update(text.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def card_lexical_path(key):
+    return CACHE_FOLDER / f"{CARD_LEXICAL_PREFIX}{key}.npz"
+
+
+class CardLexicalIndex:
+    """BM25 over the card table (one document per card face), returning the same metadata the vector store holds."""
+
+    def __init__(self, bm25, df):
+        self.bm25 = bm25
+        self.df = df
+
+    def __len__(self):
+        return len(self.bm25)
+
+    @classmethod
+    def build(cls, df, texts=None, save=True):
+        """Index the card table (`texts`: its card_lexical_texts, if already computed) and, with `save`,
+        persist it under the texts' content key."""
+        texts = list(card_lexical_texts(df)) if texts is None else texts
+        index = cls(BM25Index.build(texts), df)
+        if save:
+            index.save(card_lexical_key(texts))
+        return index
+
+    def save(self, key):
+        path = card_lexical_path(key)
+        self.bm25.save(path)
+        # Drop indexes built for older card snapshots
+        for stale in CACHE_FOLDER.glob(f"{CARD_LEXICAL_PREFIX}*.npz"):
+            if stale != path:
+                stale.unlink(missing_ok=True)
+
+    def metadata(self, rows):
+        """Vector-store style metadata dicts (None fields dropped) for card table rows."""
+        columns = to_object_columns(self.df.iloc[list(rows)])
+        fields = list(columns)
+        return [
+            {field: value for field, value in zip(fields, values) if value is not None}
+            for values in zip(*columns.values())
+        ]
+
+    def search(self, query, k=50, mask=None):
+        """Return [(metadata, bm25 score)] for the k best matching card faces (`mask`: boolean card table row filter)."""
+        hits = self.bm25.search(query, k=k, mask=mask)
+        return list(zip(self.metadata(row for row, _ in hits), (score for _, score in hits)))
+
+
+def load_card_lexical_index(df):
+    """Load the persisted card BM25 index for exactly these card rows, building (and saving) it if there is none yet.
+
+    The index is keyed on the indexed text itself, not the source file, so a table published by a sync
+    (or changed in place with the same row count) never picks up an index of other rows."""
+    texts = list(card_lexical_texts(df))
+    path = card_lexical_path(card_lexical_key(texts))
+    if path.exists():
+        return CardLexicalIndex(BM25Index.load(path), df)
+    return CardLexicalIndex.build(df, texts=texts)
+
+
+_CARD_LEXICAL_INDEX = CardTableCache(load_card_lexical_index)
+
+
+def build_card_lexical_index(df):
+    """Build and persist the card BM25 index for the card snapshot `df` (called at ingest time)."""
+    index = CardLexicalIndex.build(df)
+    _CARD_LEXICAL_INDEX.set(df, index)
+    return index
+
+
+def get_card_lexical_index(df=None):
+    """Lazily load the card BM25 index of the shared card table (reloaded when the table changes)."""
+    return _CARD_LEXICAL_INDEX.get(df)
@@ -0,0 +1,230 @@
+import atexit
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.db.utils import CACHE_FOLDER
+
+EMBEDDINGS_FOLDER = CACHE_FOLDER / "embeddings"
+DIGEST_SIZE = 16  # bytes per cache key
+QUERY_CACHE_SIZE = 4096  # query vectors kept in memory (~25MB at 1536-d float32)
+QUERY_CACHE_SAVE_EVERY = 100  # new query embeddings between snapshots to disk
+
+
+
+def text_digest(text, model, dimension):
+    """Content address of an embedding: hash of (embedding model, dimension, text)."""
+    return hashlib.blake2b(f"{model}\x00{dimension}\x00{text}".encode(), digest_size=DIGEST_SIZE).digest()
+
+
+def normalize_query(text):
+    """Cache form of a query: case-folded with runs of whitespace collapsed."""
+    return ' '.join(text.split()).casefold()
+
+
+class EmbeddingStore:
+    """Append-only on-disk store of float32 vectors addressed by text digest.
+
+    Each (model, dimension) pair gets two files: `<model>-<dim>.keys` holding fixed-size digests
+    and `<model>-<dim>.f32` holding the matching raw float32 rows, memory-mapped for reads."""
+
+    def __init__(self, model, dimension, folder=EMBEDDINGS_FOLDER):
+        self.dimension = dimension
+        self.keys_path = folder / f"{model}-{dimension}.keys"
+        self.vectors_path = folder / f"{model}-{dimension}.f32"
+        self.rows = {}
+        self.vectors = np.empty((0, dimension), dtype=np.float32)
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """Read the key index and map the vector file, ignoring any half-written trailing row."""
+        if not (self.keys_path.exists() and self.vectors_path.exists()):
+            return
+        keys = self.keys_path.read_bytes()
+        row_bytes = self.dimension * np.dtype(np.float32).itemsize
+        count = min(len(keys) // DIGEST_SIZE, self.vectors_path.stat().st_size // row_bytes)
+        # Vectors are swapped in before rows so concurrent readers never see a row past the end of the map
+        if count:
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(count, self.dimension))
+        self.rows = {keys[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE]: i for i in range(count)}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def get(self, keys):
+        """Return the stored vectors for `keys` as a (len(keys), dimension) array."""
+        rows = [self.rows[key] for key in keys]
+        return self.vectors[rows]
+
+    def add(self, keys, vectors):
+        """Append new vectors to the store; keys already present are skipped."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        with self._lock:
+            new = {}
+            for i, key in enumerate(keys):
+                if key not in self.rows and key not in new:
+                    new[key] = i
+            if not new:
+                return
+            self.keys_path.parent.mkdir(parents=True, exist_ok=True)
+            row_bytes = self.dimension * np.dtype(np.float32).itemsize
+            start = self.keys_path.stat().st_size // DIGEST_SIZE if self.keys_path.exists() else 0
+            # Vectors are written before keys, so a crash can only leave an unindexed row (or half a key)
+            # behind; both are cut off here so the new rows line up with their keys
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(start * row_bytes)
+                f.write(vectors[list(new.values())].tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.truncate(start * DIGEST_SIZE)
+                f.write(b"".join(new))
+            # Extend the index in place instead of re-reading the key file: remap first, then publish the rows
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(start + len(new), self.dimension))
+            self.rows.update((key, start + j) for j, key in enumerate(new))
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only calls the underlying model for texts missing from the local cache.
+
+    Identical texts are embedded once, whether they repeat within a batch or across builds."""
+
+    def __init__(self, embeddings, model, dimension, folder=EMBEDDINGS_FOLDER):
+        self.embeddings = embeddings
+        self.model = model
+        self.dimension = dimension
+        self.store = EmbeddingStore(model, dimension, folder=folder)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()  # the ingest pipeline embeds from several workers at once
+
+    def embed_documents(self, texts):
+        """Embed texts, serving cached vectors and embedding each distinct new text exactly once."""
+        keys = [text_digest(text, self.model, self.dimension) for text in texts]
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in self.store and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            self.store.add(list(missing), vectors)
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        return self.store.get(keys).tolist()
+
+    def embed_query(self, text):
+        """Queries are not cached here; delegate to the underlying model."""
+        return self.embeddings.embed_query(text)
+
+    def stats(self):
+        """Short hit/miss summary for progress reporting."""
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"{self.hits} cached, {self.misses} embedded ({rate:.0%} hit rate)"
+
+
+class QueryEmbeddingCache(Embeddings):
+    """Process-wide LRU cache of query embeddings keyed by (model, normalized query text).
+
+    Holds at most `max_size` vectors, evicting the least recently used. With a `path`, the cache is
+    loaded at startup and snapshotted every QUERY_CACHE_SAVE_EVERY new embeddings and at exit."""
+
+    def __init__(self, embeddings, model, dimension, max_size=QUERY_CACHE_SIZE, path=None):
+        self.embeddings = embeddings
+        self.model = model
+        self.dimension = dimension
+        self.max_size = max_size
+        self.path = path
+        self.entries = OrderedDict()  # digest -> float32 vector, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        if path is not None:
+            self.load()
+            atexit.register(self.save)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _key(self, text):
+        return text_digest(normalize_query(text), self.model, self.dimension)
+
+    def _insert(self, key, vector):
+        self.entries[key] = vector
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def embed_queries(self, texts):
+        """Embed queries, serving cached vectors and embedding every distinct new query in one call."""
+        keys = [self._key(text) for text in texts]
+        vectors, missing = {}, {}
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    vectors[key] = self.entries[key]
+                elif key not in missing:
+                    missing[key] = text
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        if missing:
+            # The API call happens outside the lock so concurrent cache hits aren't held up
+            embedded = np.asarray(self.embeddings.embed_documents(list(missing.values())), dtype=np.float32)
+            with self._lock:
+                for key, vector in zip(missing, embedded):
+                    self._insert(key, vector)
+                    vectors[key] = vector
+                self._unsaved += len(missing)
+                save = self.path is not None and self._unsaved >= QUERY_CACHE_SAVE_EVERY
+            if save:
+                self.save()
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_query(self, text):
+        return self.embed_queries([text])[0]
+
+    def embed_documents(self, texts):
+        """Documents are not queries; delegate to the underlying model uncached."""
+        return self.embeddings.embed_documents(texts)
+
+    def stats(self):
+        """Hit/miss counters since startup."""
+        total = self.hits + self.misses
+        return {
+            'size': len(self.entries), 'hits': self.hits, 'misses': self.misses,
+            'evictions': self.evictions, 'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def save(self):
+        """Snapshot the cache (in LRU order) to `path`."""
+        if self.path is None:
+            return
+        with self._lock:
+            keys = b"".join(self.entries)
+            vectors = np.stack(list(self.entries.values())) if self.entries else np.empty((0, self.dimension), np.float32)
+            self._unsaved = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.stem + ".tmp.npz")
+        np.savez(tmp_path, keys=np.frombuffer(keys, dtype=np.uint8), vectors=vectors)
+        tmp_path.replace(self.path)
+
+    def load(self):
+        if not self.path.exists():
+            return
+        data = np.load(self.path)
+        keys, vectors = data['keys'].tobytes(), data['vectors']
+        if vectors.shape[1:] != (self.dimension,):
+            return  # snapshot from another embedding dimension
+        with self._lock:
+            for i, vector in enumerate(vectors):
+                self._insert(keys[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE], vector)
@@ -0,0 +1,211 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from src.db.utils import BOOLEAN_FIELDS, JOINED_FIELDS, CardTableCache, to_object_columns
+
+# Sidebar filters and how a multi-value selection matches a card:
+# 'all' selected values, 'any' of them, or 'within' (every value of the card is selected; colorless always passes)
+FILTER_MODES = {
+    'types': 'all',
+    'subtypes': 'any',
+    'supertypes': 'all',
+    'colorIdentity': 'within',
+    'layout': 'any',
+    'legalities.commander': 'any',
+    'leadershipSkills.commander': 'any',
+    'manaValue': 'range',
+}
+ARRAY_CONTAINER_RATIO = 32  # values on fewer than size / 32 rows keep sorted row ids (4 bytes/row) instead of a bitmap
+FILTER_BATCH_SIZE = 5000
+
+# "3", "<=2", "> 4", "2-4", "2..4"
+_RANGE = re.compile(r'^\s*(?:(<=|>=|<|>|=)?\s*(\d+(?:\.\d+)?)|(\d+(?:\.\d+)?)\s*(?:-|\.\.)\s*(\d+(?:\.\d+)?))\s*$')
+
+
+def parse_range(text):
+    """Parse a number filter ("3", "<=2", ">4", "2-4") into an inclusive (low, high) pair; None bounds are open."""
+    match = _RANGE.match(str(text))
+    if not match:
+        raise ValueError(f"Can't read '{text}' as a number filter, use e.g. 3, <=2, >4 or 2-4")
+    op, value, low, high = match.groups()
+    if low is not None:
+        return float(low), float(high)
+    value = float(value)
+    # Mana values are whole numbers (half-mana cards aside), so strict bounds step by a tiny epsilon
+    return {
+        None: (value, value), '=': (value, value), '<=': (None, value), '>=': (value, None),
+        '<': (None, float(np.nextafter(value, -np.inf))), '>': (float(np.nextafter(value, np.inf)), None),
+    }[op]
+
+
+def active_selections(selections, modes=FILTER_MODES):
+    """The selections that actually filter: known fields, minus empty values and "Any"."""
+    return {
+        field: selected for field, selected in (selections or {}).items()
+        if field in modes and selected not in (None, '', 'Any')
+        and not (isinstance(selected, (list, tuple, set)) and not selected)
+    }
+
+
+def filters_key(selections):
+    """Hashable canonical form of the selections (order-insensitive), for cache keys."""
+    return tuple(sorted(
+        (field, tuple(sorted(selected)) if isinstance(selected, (list, set)) else selected)
+        for field, selected in active_selections(selections).items()
+    ))
+
+
+def _container(rows, size):
+    """Roaring-style container for a set of row ids: a sorted uint32 array when sparse, else a packed bitmap."""
+    rows = np.asarray(rows, dtype=np.uint32)
+    if len(rows) * ARRAY_CONTAINER_RATIO < size:
+        return np.sort(rows)
+    bits = np.zeros(size, dtype=bool)
+    bits[rows] = True
+    return np.packbits(bits)
+
+
+def _to_mask(container, size):
+    if container.dtype == np.uint32:
+        mask = np.zeros(size, dtype=bool)
+        mask[container] = True
+        return mask
+    return np.unpackbits(container, count=size).view(bool)
+
+
+class CardFilter:
+    """Compiled sidebar filter: a boolean mask over card table rows and the equivalent Pinecone metadata filter.
+
+    `table` is the card table the mask was built over; searches look up their row indexes for that same table."""
+
+    def __init__(self, mask, native, table=None):
+        self.mask = mask
+        self.native = native
+        self.table = table
+
+    def __len__(self):
+        return int(self.mask.sum())
+
+
+class FilterIndex:
+    """Per-value bitmaps over the card table for the filterable sidebar fields.
+
+    Every distinct value of a field (each element for comma-joined array fields such as `types`) maps to the
+    rows holding it, so a selection compiles to a few bitmap ORs/ANDs instead of a scan of the table. The
+    distinct stored values are kept as well, to translate the same selection into a Pinecone `$in` filter."""
+
+    def __init__(self, df, modes=FILTER_MODES):
+        self.df = df
+        self.size = len(df)
+        self.modes = modes
+        self.bitmaps = {}  # field -> {value (None for missing): container}
+        self.stored = {}  # array field -> {stored comma-joined value: frozenset of its elements}
+        columns = {field: [] for field in modes}
+        for start in range(0, len(df), FILTER_BATCH_SIZE):
+            for field, values in to_object_columns(df.iloc[start:start + FILTER_BATCH_SIZE], fields=list(modes)).items():
+                columns[field].extend(values)
+        for field, values in columns.items():
+            self._index_field(field, values)
+
+    def _index_field(self, field, values):
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=True)
+        order = np.argsort(codes, kind='stable')
+        # Rows of unique i are order[offsets[i + 1]:offsets[i + 2]]; missing values (code -1) come first
+        offsets = np.searchsorted(codes[order], np.arange(-1, len(uniques) + 1))
+        groups = {None: order[offsets[0]:offsets[1]]}
+        if field in JOINED_FIELDS:
+            self.stored[field] = {value: frozenset(value.split(',')) for value in uniques}
+            elements = {}
+            for i, value in enumerate(uniques):
+                for element in self.stored[field][value]:
+                    elements.setdefault(element, []).append(order[offsets[i + 1]:offsets[i + 2]])
+            groups.update({element: np.concatenate(parts) for element, parts in elements.items()})
+        else:
+            groups.update({value: order[offsets[i + 1]:offsets[i + 2]] for i, value in enumerate(uniques)})
+        self.bitmaps[field] = {value: _container(rows, self.size) for value, rows in groups.items()}
+
+    def values(self, field):
+        """Distinct values (array elements) seen for a field."""
+        return sorted(value for value in self.bitmaps[field] if value is not None)
+
+    def _union(self, field, values):
+        mask = np.zeros(self.size, dtype=bool)
+        for value in values:
+            if value in self.bitmaps[field]:
+                mask |= _to_mask(self.bitmaps[field][value], self.size)
+        return mask
+
+    def _compile_field(self, field, selected):
+        """(row mask, Pinecone clause) for one field's selection."""
+        mode = self.modes[field]
+        if mode == 'range':
+            low, high = parse_range(selected) if isinstance(selected, str) else selected
+            values = [
+                value for value in self.bitmaps[field]
+                if value is not None and (low is None or value >= low) and (high is None or value <= high)
+            ]
+            bounds = {**({'$gte': low} if low is not None else {}), **({'$lte': high} if high is not None else {})}
+            return self._union(field, values), {field: bounds}
+        if field in BOOLEAN_FIELDS:
+            return self._union(field, [bool(selected)]), {field: {'$eq': bool(selected)}}
+
+        selected = [selected] if isinstance(selected, str) else list(selected)
+        if field not in JOINED_FIELDS:
+            return self._union(field, selected), {field: {'$in': selected}}
+
+        wanted = set(selected)
+        if mode == 'all':
+            mask = np.ones(self.size, dtype=bool)
+            for value in wanted:
+                mask &= self._union(field, [value])
+            stored = [value for value, elements in self.stored[field].items() if wanted <= elements]
+        elif mode == 'any':
+            mask = self._union(field, wanted)
+            stored = [value for value, elements in self.stored[field].items() if wanted & elements]
+        else:
+            # within: drop every row holding an unselected value
+            mask = ~self._union(field, [value for value in self.bitmaps[field] if value is not None and value not in wanted])
+            stored = [value for value, elements in self.stored[field].items() if elements <= wanted]
+        # Stored values are the comma-joined arrays, so array membership becomes `$in` over the matching strings
+        clause = {field: {'$in': sorted(stored)}}
+        if mode == 'within':
+            # Colorless cards have no colorIdentity metadata at all
+            clause = {'$or': [clause, {field: {'$exists': False}}]}
+        return mask, clause
+
+    def compile(self, selections):
+        """Compile {field: selection} into a CardFilter (None if nothing is selected).
+
+        Selections are lists for multi-value fields, a bool for boolean fields and a range string or
+        (low, high) pair for numbers; empty selections and "Any" are ignored."""
+        mask, clauses = np.ones(self.size, dtype=bool), []
+        for field, selected in active_selections(selections, self.modes).items():
+            field_mask, clause = self._compile_field(field, selected)
+            mask &= field_mask
+            clauses.append(clause)
+        if not clauses:
+            return None
+        return CardFilter(mask, clauses[0] if len(clauses) == 1 else {'$and': clauses}, table=self.df)
+
+
+_FILTER_INDEX = CardTableCache(FilterIndex)
+
+
+def get_filter_index(df=None):
+    """Lazily build the filter bitmaps from the shared card table (rebuilt when the table changes)."""
+    return _FILTER_INDEX.get(df)
+
+
+def compile_filters(selections):
+    """CardFilter for the sidebar selections, or None when no filter is set."""
+    if not selections:
+        return None
+    return get_filter_index().compile(selections)
+
+
+if __name__ == "__main__":
+    card_filter = compile_filters({'types': ['Creature'], 'subtypes': ['Elf', 'Goblin'], 'colorIdentity': ['G', 'R'], 'manaValue': '<=3'})
+    print(len(card_filter), 'cards')
+    print(card_filter.native)
@@ -0,0 +1,248 @@
+import json
+import time
+import queue
+import random
+import threading
+
+EMBED_WORKERS = 4
+UPSERT_WORKERS = 2
+MAX_PENDING_BATCHES = 8  # batches buffered between stages (bounds memory)
+UPSERT_CHUNK_SIZE = 100  # vectors per upsert request (Pinecone caps requests at 2MB)
+MAX_RETRIES = 6
+BASE_DELAY = 1.0  # seconds, doubled on every retry
+MAX_DELAY = 60.0
+
+_DONE = object()  # end-of-stream marker passed between stages
+
+
+def is_rate_limited(exc):
+    """True for HTTP 429 / rate limit errors from the OpenAI or Pinecone clients."""
+    status = getattr(exc, 'status_code', None) or getattr(exc, 'status', None)
+    if status is None and getattr(exc, 'response', None) is not None:
+        status = getattr(exc.response, 'status_code', None)
+    return status == 429 or 'RateLimit' in type(exc).__name__
+
+
+def with_backoff(func, *args, retries=MAX_RETRIES, base_delay=BASE_DELAY, max_delay=MAX_DELAY, on_retry=None, **kwargs):
+    """Call func, retrying rate limited calls with jittered exponential backoff."""
+    for attempt in range(retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except Exception as exc:
+            if attempt == retries or not is_rate_limited(exc):
+                raise
+            if on_retry:
+                on_retry()
+            delay = min(base_delay * 2 ** attempt, max_delay)
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+
+class IngestStats:
+    """Thread-safe throughput counters for an ingestion run."""
+
+    def __init__(self):
+        self.cards = 0
+        self.tokens = 0
+        self.batches = 0
+        self.resumed = 0  # cards skipped because a checkpoint already had them
+        self.retries = 0
+        self.start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def summary(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return {
+            'cards': self.cards,
+            'batches': self.batches,
+            'resumed_cards': self.resumed,
+            'retries': self.retries,
+            'seconds': round(elapsed, 2),
+            'cards_per_sec': round(self.cards / elapsed, 1),
+            'tokens_per_sec': round(self.tokens / elapsed, 1),
+        }
+
+    def __str__(self):
+        stats = self.summary()
+        return f"{stats['cards_per_sec']} cards/s, {stats['tokens_per_sec']} tokens/s, {stats['retries']} retries"
+
+
+class Checkpoint:
+    """Append-only JSONL log of committed batches, so an interrupted build can resume.
+
+    The first line identifies the run (card table key, index and batch size); every following
+    line is one committed batch with its {vector id: fingerprint} entries. A log written for a
+    different run is discarded."""
+
+    def __init__(self, path, run_key):
+        self.path = path
+        self.run_key = run_key
+        self.done = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        with open(self.path, "r") as f:
+            content = f.read()
+        lines = content.splitlines()
+        try:
+            header = json.loads(lines[0]) if lines else None
+        except json.JSONDecodeError:
+            header = None  # header cut short by a crash: nothing was committed
+        if header != {'run': self.run_key}:
+            self.path.unlink()
+            return
+        committed = 1
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                break  # half-written last line from a crash
+            self.done[entry['batch']] = entry['manifest']
+            committed += 1
+        valid = ''.join(line + "\n" for line in lines[:committed])
+        if content != valid:
+            # Drop the half-written tail, or the next commit would be appended onto it
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(valid)
+            tmp_path.replace(self.path)
+
+    def is_done(self, batch_id):
+        return batch_id in self.done
+
+    def commit(self, batch_id, manifest):
+        """Record a batch whose vectors are safely in the index."""
+        with self._lock:
+            new_file = not self.path.exists()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                if new_file:
+                    f.write(json.dumps({'run': self.run_key}) + "\n")
+                f.write(json.dumps({'batch': batch_id, 'manifest': manifest}) + "\n")
+                f.flush()
+            self.done[batch_id] = manifest
+
+    def manifest(self):
+        """Merged manifest of every committed batch."""
+        merged = {}
+        for manifest in self.done.values():
+            merged.update(manifest)
+        return merged
+
+    def clear(self):
+        with self._lock:
+            self.path.unlink(missing_ok=True)
+            self.done = {}
+
+
+def run_ingest_pipeline(batches, embedder, index, count_tokens=None, checkpoint=None, text_key="content",
+                        embed_workers=EMBED_WORKERS, upsert_workers=UPSERT_WORKERS,
+                        max_pending=MAX_PENDING_BATCHES, upsert_chunk_size=UPSERT_CHUNK_SIZE, retry_kwargs=None,
+                        show_progress=None, total=None):
+    """Embed and upsert document batches with a bounded producer/consumer pipeline.
+
+    `batches` yields (batch_id, docs, ids, fingerprints). `embedder` needs `embed_documents(texts)`
+    and `index` needs `upsert(vectors=[{'id', 'values', 'metadata'}])` (a Pinecone Index or a local
+    stand-in); each batch is upserted `upsert_chunk_size` vectors per request. Batches already
+    committed in `checkpoint` are skipped. `count_tokens(text)` (e.g. src.tokens.token_counter) counts
+    one text, for the tokens/s figure. Each `show_progress` line also carries `embedder.stats()` when the
+    embedder has one (e.g. CachedEmbeddings' hit/miss counts). Returns the IngestStats."""
+    stats = IngestStats()
+    retry_kwargs = {**(retry_kwargs or {}), 'on_retry': lambda: stats.add(retries=1)}
+    embed_queue = queue.Queue(maxsize=max_pending)
+    upsert_queue = queue.Queue(maxsize=max_pending)
+    failed = threading.Event()
+    errors = []
+
+    def put(q, item):
+        # Don't block forever on a full queue once another stage has failed
+        while not failed.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def stage(source, sink, work):
+        while True:
+            item = source.get()
+            if item is _DONE:
+                return
+            if failed.is_set():
+                continue  # drain so the producer is never stuck
+            try:
+                result = work(item)
+            except Exception as exc:
+                errors.append(exc)
+                failed.set()
+                continue
+            if sink is not None:
+                put(sink, result)
+
+    def embed(item):
+        batch_id, docs, ids, fingerprints = item
+        texts = [doc.page_content for doc in docs]
+        vectors = with_backoff(embedder.embed_documents, texts, **retry_kwargs)
+        if count_tokens:
+            stats.add(tokens=sum(count_tokens(text) for text in texts))
+        return batch_id, docs, ids, fingerprints, vectors
+
+    def upsert(item):
+        batch_id, docs, ids, fingerprints, vectors = item
+        records = [
+            {'id': vector_id, 'values': list(vector), 'metadata': {**doc.metadata, text_key: doc.page_content}}
+            for vector_id, doc, vector in zip(ids, docs, vectors)
+        ]
+        # A batch is committed only once every chunk is in; re-upserting a chunk after a retry is harmless
+        for start in range(0, len(records), upsert_chunk_size):
+            with_backoff(index.upsert, vectors=records[start:start + upsert_chunk_size], **retry_kwargs)
+        if checkpoint:
+            checkpoint.commit(batch_id, dict(zip(ids, fingerprints)))
+        stats.add(cards=len(docs), batches=1)
+
+    def report():
+        # Progress callbacks (e.g. Streamlit widgets) must run on the calling thread, not in the workers
+        if show_progress and total:
+            text = f"Ingest: {stats}"
+            if hasattr(embedder, 'stats'):
+                # e.g. CachedEmbeddings' hit/miss counts
+                text += f" | Embeddings: {embedder.stats()}"
+            show_progress(min((stats.cards + stats.resumed) / total, 1.0), text)
+
+    embedders = [threading.Thread(target=stage, args=(embed_queue, upsert_queue, embed), daemon=True)
+                 for _ in range(embed_workers)]
+    upserters = [threading.Thread(target=stage, args=(upsert_queue, None, upsert), daemon=True)
+                 for _ in range(upsert_workers)]
+    for thread in embedders + upserters:
+        thread.start()
+
+    try:
+        for item in batches:
+            if checkpoint and checkpoint.is_done(item[0]):
+                stats.add(resumed=len(item[1]))
+                continue
+            if not put(embed_queue, item):
+                break
+            report()
+    finally:
+        # Shut the stages down in order: all embeds finish before the upserters are told to stop
+        for _ in embedders:
+            embed_queue.put(_DONE)
+        for thread in embedders:
+            thread.join()
+        for _ in upserters:
+            upsert_queue.put(_DONE)
+        for thread in upserters:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    report()
+    return stats
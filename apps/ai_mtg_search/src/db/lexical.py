@@ -0,0 +1,125 @@
+import re
+import json
+import unicodedata
+
+import numpy as np
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[+/'][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by can card cards do does for from get has have how i if in is it its me "
+    "mean means my of on or that the their them then this to what when which with you your".split()
+)
+
+
+def fold(text):
+    """Lower-case and strip accents (e.g. 'Séance' -> 'seance')."""
+    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode().lower()
+
+
+def tokenize(text, stopwords=STOPWORDS):
+    """Accent-folded word tokens with trailing plural 's' stripped; keeps '+1/+1' and "can't" style tokens whole."""
+    tokens = []
+    for token in _TOKEN.findall(fold(text)):
+        if token in stopwords:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed document list, stored as CSR postings (term -> doc ids, term frequencies).
+
+    Scoring a query touches only the postings of its terms, so lookups stay sub-millisecond for
+    rule- and card-sized corpora."""
+
+    def __init__(self, vocabulary, offsets, doc_ids, term_freqs, doc_lengths, k1=BM25_K1, b=BM25_B):
+        self.vocabulary = vocabulary  # term -> term id
+        self.offsets = offsets  # postings of term t are [offsets[t], offsets[t + 1])
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self._prepare()
+
+    def _prepare(self):
+        count = len(self.doc_lengths)
+        doc_freqs = np.diff(self.offsets)
+        self.idf = np.log1p((count - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+        average = self.doc_lengths.mean() if count else 1.0
+        # Per-posting BM25 weight, precomputed so a query is just gathers and adds
+        norms = self.k1 * (1 - self.b + self.b * self.doc_lengths[self.doc_ids] / average)
+        self.weights = (self.term_freqs * (self.k1 + 1) / (self.term_freqs + norms)).astype(np.float32)
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    @classmethod
+    def build(cls, texts, tokenizer=tokenize, **kwargs):
+        """Index an iterable of document strings (document i gets id i)."""
+        vocabulary, postings, doc_lengths = {}, [], []
+        for doc_id, text in enumerate(texts):
+            tokens = tokenizer(text or "")
+            doc_lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                term_id = vocabulary.setdefault(token, len(vocabulary))
+                postings.append((term_id, doc_id, count))
+        postings = np.array(postings, dtype=np.int64).reshape(-1, 3)
+        postings = postings[np.lexsort((postings[:, 1], postings[:, 0]))]
+        offsets = np.searchsorted(postings[:, 0], np.arange(len(vocabulary) + 1))
+        return cls(
+            vocabulary, offsets,
+            postings[:, 1].astype(np.int32), postings[:, 2].astype(np.float32),
+            np.array(doc_lengths, dtype=np.float32), **kwargs
+        )
+
+    def scores(self, query, tokenizer=tokenize):
+        """BM25 score of every document for the query (zeros where no term matches)."""
+        scores = np.zeros(len(self.doc_lengths), dtype=np.float32)
+        for token in set(tokenizer(query)):
+            term_id = self.vocabulary.get(token)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            scores[self.doc_ids[start:end]] += self.idf[term_id] * self.weights[start:end]
+        return scores
+
+    def search(self, query, k=10, mask=None, tokenizer=tokenize):
+        """Return [(doc id, score)] for the k best matching documents, best first; `mask` is an optional boolean doc filter."""
+        scores = self.scores(query, tokenizer=tokenizer)
+        if mask is not None:
+            scores[~mask] = 0
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind='stable')]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in matched]
+
+    def save(self, path):
+        """Persist to `path` (.npz arrays with the vocabulary as JSON)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.stem + ".tmp.npz")
+        np.savez(
+            tmp_path,
+            vocabulary=np.frombuffer(json.dumps(self.vocabulary).encode(), dtype=np.uint8),
+            offsets=self.offsets, doc_ids=self.doc_ids, term_freqs=self.term_freqs,
+            doc_lengths=self.doc_lengths, params=np.array([self.k1, self.b]),
+        )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        k1, b = data['params']
+        return cls(
+            json.loads(data['vocabulary'].tobytes()), data['offsets'], data['doc_ids'],
+            data['term_freqs'], data['doc_lengths'], k1=float(k1), b=float(b)
+        )
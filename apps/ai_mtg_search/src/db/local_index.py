@@ -0,0 +1,425 @@
+import json
+import shutil
+import threading
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from src.db.utils import DATA_FOLDER
+
+INDEX_FOLDER = DATA_FOLDER / "index"
+DTYPES = {'float32': np.float32, 'float16': np.float16}
+SEARCH_CHUNK_ROWS = 8192  # memory-mapped rows read per matmul / training step
+IVF_ITERATIONS = 10
+IVF_SAMPLE_SIZE = 20000  # rows used to train the IVF centroids
+IVF_PROBES = 8
+DOT_CHUNK_ROWS = 256  # non-float32 rows are upcast through a buffer this size (stays in cache)
+RESCORE_FACTOR = 4  # quantized search rescores the best k * RESCORE_FACTOR candidates
+RESCORE_MIN = 100
+PREFIX_RERANK = 300  # full-dimension rows reranked after a truncated (Matryoshka) first stage
+MASK_GATHER_FRACTION = 0.25  # masks allowing fewer rows than this are scored row by row, looser ones scan everything
+
+
+def normalize_rows(vectors):
+    """Scale rows to unit length so a dot product is the cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def top_k(scores, k):
+    """Indices of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype=np.int64)
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best], kind='stable')]
+
+
+def chunked_dot(matrix, query):
+    """matrix @ query in float32; float16/int8 (and memory-mapped) rows are upcast chunk by chunk."""
+    if matrix.dtype == np.float32 and not isinstance(matrix, np.memmap):
+        return matrix @ query
+    scores = np.empty(len(matrix), dtype=np.float32)
+    if matrix.dtype == np.float32:
+        for i in range(0, len(matrix), SEARCH_CHUNK_ROWS):
+            np.dot(matrix[i:i + SEARCH_CHUNK_ROWS], query, out=scores[i:i + SEARCH_CHUNK_ROWS])
+        return scores
+    buffer = np.empty((DOT_CHUNK_ROWS, matrix.shape[1]), dtype=np.float32)
+    for i in range(0, len(matrix), DOT_CHUNK_ROWS):
+        chunk = buffer[:len(matrix) - i] if len(matrix) - i < DOT_CHUNK_ROWS else buffer
+        np.copyto(chunk, matrix[i:i + DOT_CHUNK_ROWS])
+        np.dot(chunk, query, out=scores[i:i + len(chunk)])
+    return scores
+
+
+class LocalVectorIndex:
+    """On-disk cosine index with the subset of the Pinecone Index API the app uses (upsert/delete/query/stats).
+
+    Vectors are appended, unit-normalized, to `vectors.<dtype>` and memory-mapped for search; each upsert
+    or delete is appended to `records.jsonl` ({id, row, metadata} or {id, deleted}), so the last record for
+    an ID wins. Search is exact by default; `build_ivf()` adds an inverted-file (IVF) coarse quantizer for
+    approximate search, with rows added after training scanned exactly. `quantize()` (int8 codes) and
+    `truncate()` (low-dimension prefix) add a compressed first pass that is rescored at full precision."""
+
+    def __init__(self, name, folder=INDEX_FOLDER, dtype='float32', dimension=None):
+        self.name = name
+        self.folder = folder / name
+        self.dtype = np.dtype(DTYPES[dtype])
+        self.dimension = dimension
+        self.vectors_path = self.folder / f"vectors.{dtype}"
+        self.records_path = self.folder / "records.jsonl"
+        self.ivf_path = self.folder / "ivf.npz"
+        self.codes_path = self.folder / "codes.int8"
+        self.scales_path = self.folder / "scales.npy"
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """Replay the record log and map the vector file."""
+        self.rows = {}  # vector id -> live row
+        self.ids = []  # row -> vector id
+        self.metadata = []  # row -> metadata
+        if self.records_path.exists():
+            with open(self.records_path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break  # half-written last line from a crash
+                    self._apply(record)
+        self._map_vectors()
+        self._load_ivf()
+        self._load_codes()
+        self._load_prefix()
+
+    def _apply(self, record):
+        if record.get('deleted'):
+            self.rows.pop(record['id'], None)
+            return
+        row = record['row']
+        # Rows are appended in order, so a record always refers to the next row
+        self.ids.append(record['id'])
+        self.metadata.append(record['metadata'])
+        self.rows[record['id']] = row
+
+    def _map_vectors(self):
+        count = len(self.ids)
+        if count and self.dimension is None:
+            self.dimension = self.vectors_path.stat().st_size // (count * self.dtype.itemsize)
+        if count:
+            self.vectors = np.memmap(self.vectors_path, dtype=self.dtype, mode='r', shape=(count, self.dimension))
+        else:
+            self.vectors = np.empty((0, self.dimension or 0), dtype=self.dtype)
+        self.live = np.zeros(count, dtype=bool)
+        self.live[list(self.rows.values())] = True
+
+    def _load_ivf(self):
+        self.centroids = None
+        if self.ivf_path.exists():
+            ivf = np.load(self.ivf_path)
+            self.centroids = ivf['centroids']
+            self.assignments = ivf['assignments']
+            # Rows grouped by list, so probing a list is a slice rather than a scan of all assignments
+            self.list_rows = np.argsort(self.assignments, kind='stable')
+            self.list_offsets = np.searchsorted(self.assignments[self.list_rows], np.arange(len(self.centroids) + 1))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def describe_index_stats(self):
+        return {'total_vector_count': len(self.rows), 'dimension': self.dimension}
+
+    def upsert(self, vectors):
+        """Insert or overwrite vectors given as [{'id', 'values', 'metadata'}] (Pinecone's upsert format)."""
+        if not vectors:
+            return
+        values = normalize_rows([vector['values'] for vector in vectors]).astype(self.dtype)
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = values.shape[1]
+            self.folder.mkdir(parents=True, exist_ok=True)
+            start = len(self.ids)
+            # Vectors are written before records, so a crash can only leave an unreferenced row behind
+            with open(self.vectors_path, "r+b" if self.vectors_path.exists() else "wb") as f:
+                f.seek(start * self.dimension * self.dtype.itemsize)
+                f.write(values.tobytes())
+                f.truncate()
+            records = [
+                {'id': vector['id'], 'row': start + i, 'metadata': vector.get('metadata', {})}
+                for i, vector in enumerate(vectors)
+            ]
+            with open(self.records_path, "a") as f:
+                f.write("".join(json.dumps(record) + "\n" for record in records))
+            for record in records:
+                self._apply(record)
+            self._map_vectors()
+
+    def delete(self, ids=None, delete_all=False):
+        """Delete vectors by ID, or clear the whole index."""
+        if delete_all:
+            self.clear()
+            return
+        with self._lock:
+            records = [{'id': vector_id, 'deleted': True} for vector_id in ids if vector_id in self.rows]
+            if not records:
+                return
+            with open(self.records_path, "a") as f:
+                f.write("".join(json.dumps(record) + "\n" for record in records))
+            for record in records:
+                self._apply(record)
+            self.live[:] = False
+            self.live[list(self.rows.values())] = True
+
+    def clear(self):
+        """Remove every vector and the files backing them."""
+        with self._lock:
+            shutil.rmtree(self.folder, ignore_errors=True)
+            self.dimension = None
+            self._load()
+
+    def compact(self):
+        """Rewrite the files keeping only live rows (drops overwritten and deleted vectors)."""
+        with self._lock:
+            live_rows = np.flatnonzero(self.live)
+            vectors = np.array(self.vectors[live_rows])
+            records = [
+                {'id': self.ids[row], 'row': i, 'metadata': self.metadata[row]}
+                for i, row in enumerate(live_rows)
+            ]
+            tmp_vectors, tmp_records = self.vectors_path.with_suffix(".tmp"), self.records_path.with_suffix(".tmp")
+            tmp_vectors.write_bytes(vectors.tobytes())
+            with open(tmp_records, "w") as f:
+                f.write("".join(json.dumps(record) + "\n" for record in records))
+            tmp_vectors.replace(self.vectors_path)
+            tmp_records.replace(self.records_path)
+            # Row numbers changed, so the IVF lists and codes are stale
+            self.ivf_path.unlink(missing_ok=True)
+            self.codes_path.unlink(missing_ok=True)
+            for path in self.folder.glob("prefix-*.f32"):
+                path.unlink()
+            self._load()
+
+    def build_ivf(self, n_lists=None, iterations=IVF_ITERATIONS, sample_size=IVF_SAMPLE_SIZE, seed=0):
+        """Train a k-means coarse quantizer (spherical, ~sqrt(N) lists) and assign every row to a list."""
+        count = len(self.ids)
+        if count == 0:
+            return
+        n_lists = n_lists or max(1, int(np.sqrt(count)))
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(self.vectors[np.sort(rng.choice(count, min(sample_size, count), replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+        for _ in range(iterations):
+            nearest = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, nearest, sample)
+            # Empty lists keep their previous centroid
+            filled = np.bincount(nearest, minlength=n_lists) > 0
+            centroids[filled] = normalize_rows(sums[filled])
+        assignments = np.concatenate([
+            np.argmax(np.asarray(self.vectors[i:i + SEARCH_CHUNK_ROWS], dtype=np.float32) @ centroids.T, axis=1)
+            for i in range(0, count, SEARCH_CHUNK_ROWS)
+        ]).astype(np.int32)
+        tmp_path = self.folder / "ivf.tmp.npz"
+        np.savez(tmp_path, centroids=centroids, assignments=assignments)
+        tmp_path.replace(self.ivf_path)
+        self._load_ivf()
+
+    def quantize(self):
+        """Build int8 scalar-quantized codes (symmetric, per-dimension scale) for the first search pass.
+
+        The codes are held in memory at a quarter of the float32 size; full-precision rows stay
+        memory-mapped and are only read to rescore the shortlist."""
+        count = len(self.ids)
+        if count == 0:
+            return
+        scales = np.zeros(self.dimension, dtype=np.float32)
+        for i in range(0, count, SEARCH_CHUNK_ROWS):
+            chunk = np.abs(np.asarray(self.vectors[i:i + SEARCH_CHUNK_ROWS], dtype=np.float32))
+            scales = np.maximum(scales, chunk.max(axis=0))
+        scales = np.where(scales == 0, 1, scales) / 127
+        tmp_path = self.codes_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            for i in range(0, count, SEARCH_CHUNK_ROWS):
+                chunk = np.asarray(self.vectors[i:i + SEARCH_CHUNK_ROWS], dtype=np.float32) / scales
+                f.write(np.clip(np.rint(chunk), -127, 127).astype(np.int8).tobytes())
+        np.save(self.scales_path, scales)
+        tmp_path.replace(self.codes_path)
+        self._load_codes()
+
+    def _load_codes(self):
+        self.codes = None
+        if self.codes_path.exists() and self.scales_path.exists():
+            self.scales = np.load(self.scales_path)
+            codes = np.fromfile(self.codes_path, dtype=np.int8)
+            self.codes = codes.reshape(-1, len(self.scales))
+
+    def _score_rows(self, query, rows=None):
+        """Full-precision cosine scores of the query against `rows` (all rows if None)."""
+        if rows is None:
+            return chunked_dot(self.vectors, query)
+        return chunked_dot(self.vectors[rows], query)
+
+    def truncate(self, dimension):
+        """Build a Matryoshka first stage: the leading `dimension` components of every row, renormalized.
+
+        text-embedding-3 vectors keep most of their ranking quality when shortened this way, so a
+        256/512-d scan plus a full-dimension rerank of a few hundred rows replaces the full scan."""
+        count = len(self.ids)
+        if count == 0:
+            return
+        tmp_path = self.folder / "prefix.tmp"
+        with open(tmp_path, "wb") as f:
+            for i in range(0, count, SEARCH_CHUNK_ROWS):
+                f.write(normalize_rows(np.asarray(self.vectors[i:i + SEARCH_CHUNK_ROWS, :dimension])).tobytes())
+        for path in self.folder.glob("prefix-*.f32"):
+            path.unlink()
+        tmp_path.replace(self.folder / f"prefix-{dimension}.f32")
+        self._load_prefix()
+
+    def _load_prefix(self):
+        self.prefix = None
+        paths = sorted(self.folder.glob("prefix-*.f32"))
+        if paths:
+            dimension = int(paths[0].stem.split("-")[1])
+            self.prefix = np.fromfile(paths[0], dtype=np.float32).reshape(-1, dimension)
+
+    def _score_stage(self, matrix, stage_query, query, rows=None):
+        """First-pass scores from `matrix` (codes or prefix), which covers the rows present when it was built.
+
+        Rows upserted after that are scored at full precision."""
+        covered = len(matrix)
+        if rows is None:
+            return np.concatenate([chunked_dot(matrix, stage_query), chunked_dot(self.vectors[covered:], query)])
+        in_stage = rows < covered
+        scores = np.empty(len(rows), dtype=np.float32)
+        scores[in_stage] = chunked_dot(matrix[rows[in_stage]], stage_query)
+        scores[~in_stage] = chunked_dot(self.vectors[rows[~in_stage]], query)
+        return scores
+
+    def _ivf_candidates(self, query, n_probe):
+        if self.centroids is None:
+            raise ValueError(f"Index '{self.name}' has no IVF lists, call build_ivf() first")
+        probes = top_k(self.centroids @ query, n_probe)
+        candidates = np.concatenate([self.list_rows[self.list_offsets[p]:self.list_offsets[p + 1]] for p in probes])
+        candidates.sort()  # sequential memmap reads
+        # Rows upserted after training are not in any list; scan them exactly
+        return np.concatenate([candidates, np.arange(len(self.assignments), len(self.ids))])
+
+    def search(self, vector, k=10, mask=None, n_probe=IVF_PROBES, exact=None, quantized=None, truncated=None,
+               rescore=RESCORE_FACTOR):
+        """Return [(row, score)] for the k nearest live rows; `mask` is an optional boolean row filter.
+
+        Uses the IVF lists (probing the `n_probe` closest) and the truncated prefix or int8 codes when they
+        exist, unless `exact` is True. A compressed first pass is followed by a full-precision rescore of
+        its best `rescore * k` candidates (at least RESCORE_MIN, or PREFIX_RERANK for the prefix). A mask widens
+        the IVF probe in proportion to the rows it removes, or, when that would probe every list, scores
+        the allowed rows directly."""
+        query = normalize_rows(vector).astype(np.float32)
+        allowed = self.live if mask is None else self.live & mask[:len(self.live)]
+        use_ivf = exact is False or (exact is None and self.centroids is not None)
+        use_prefix = truncated or (truncated is None and not exact and self.prefix is not None)
+        use_codes = not use_prefix and (quantized or (quantized is None and not exact and self.codes is not None))
+        if use_prefix and self.prefix is None:
+            raise ValueError(f"Index '{self.name}' has no truncated prefix, call truncate() first")
+        if use_codes and self.codes is None:
+            raise ValueError(f"Index '{self.name}' has no quantized codes, call quantize() first")
+        
+        candidates = None
+        if mask is not None:
+            allowed_rows = np.flatnonzero(allowed)
+            if use_ivf and self.centroids is not None:
+                # Probe more lists as the mask tightens, so about as many allowed rows get scored as unfiltered
+                n_probe = int(np.ceil(n_probe * len(self.ids) / max(len(allowed_rows), 1)))
+                use_ivf = n_probe < len(self.centroids)
+            if not use_ivf and len(allowed_rows) <= len(self.ids) * MASK_GATHER_FRACTION:
+                # Tight mask: score just the allowed rows; shortlists this small skip the compressed pass too
+                candidates = allowed_rows
+                if len(candidates) <= max(k * (rescore or 1), PREFIX_RERANK if use_prefix else RESCORE_MIN):
+                    use_prefix = use_codes = False
+        if use_ivf:
+            candidates = self._ivf_candidates(query, n_probe)
+            if mask is not None:
+                candidates = candidates[allowed[candidates]]
+        if use_prefix:
+            stage_query = normalize_rows(query[:self.prefix.shape[1]])
+            scores = self._score_stage(self.prefix, stage_query, query, candidates)
+        elif use_codes:
+            scores = self._score_stage(self.codes, query * self.scales, query, candidates)
+        else:
+            scores = self._score_rows(query, candidates)
+        if candidates is None:
+            candidates = np.arange(len(scores))
+        keep = allowed[candidates]
+        candidates, scores = candidates[keep], scores[keep]
+        
+        if (use_prefix or use_codes) and rescore:
+            # Rescore the shortlist against the full-precision rows
+            shortlist = top_k(scores, max(k * rescore, PREFIX_RERANK if use_prefix else RESCORE_MIN))
+            candidates = np.sort(candidates[shortlist])
+            scores = self._score_rows(query, candidates)
+        best = top_k(scores, k)
+        return [(int(candidates[i]), float(scores[i])) for i in best]
+
+    def query(self, vector, top_k=10, include_metadata=True, **kwargs):
+        """Pinecone-style query: {'matches': [{'id', 'score', 'metadata'}]}."""
+        matches = [
+            {'id': self.ids[row], 'score': score, **({'metadata': self.metadata[row]} if include_metadata else {})}
+            for row, score in self.search(vector, k=top_k, **kwargs)
+        ]
+        return {'matches': matches}
+
+
+class LocalVectorStore(VectorStore):
+    """Langchain VectorStore over a LocalVectorIndex, a drop-in for PineconeVectorStore (same text_key layout)."""
+
+    def __init__(self, index, embedding, text_key="content"):
+        self.index = index
+        self._embedding = embedding
+        self._text_key = text_key
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    def _to_document(self, row):
+        metadata = dict(self.index.metadata[row])
+        page_content = metadata.pop(self._text_key, "")
+        return Document(id=self.index.ids[row], page_content=page_content, metadata=metadata)
+
+    def add_texts(self, texts, metadatas=None, *, ids=None, **kwargs):
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(hash(text)) for text in texts]
+        vectors = self._embedding.embed_documents(texts)
+        self.index.upsert(vectors=[
+            {'id': vector_id, 'values': vector, 'metadata': {**metadata, self._text_key: text}}
+            for vector_id, vector, text, metadata in zip(ids, vectors, texts, metadatas)
+        ])
+        return ids
+
+    def delete(self, ids=None, **kwargs):
+        self.index.delete(ids=ids, **kwargs)
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, **kwargs):
+        return [(self._to_document(row), score) for row, score in self.index.search(embedding, k=k, **kwargs)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k=k, **kwargs)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities
+        return lambda score: score
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, *, ids=None, index_name="local", text_key="content", **kwargs):
+        store = cls(LocalVectorIndex(index_name, **kwargs), embedding, text_key=text_key)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
@@ -0,0 +1,86 @@
+import bisect
+
+from rapidfuzz import fuzz, process
+
+from src.db.utils import CardTableCache, to_object_columns
+from src.db.lexical import fold
+
+NAME_FIELDS = ['name', 'faceName', 'asciiName']
+FUZZY_CUTOFF = 70  # minimum rapidfuzz QRatio for a fuzzy match
+NAME_BATCH_SIZE = 5000
+
+
+class NameIndex:
+    """In-memory card name resolver over `name`, `faceName` and `asciiName`, no network needed.
+
+    Matching runs in order of cost: exact, accent/case-folded, folded prefix (e.g. "Chatterfang"),
+    then rapidfuzz QRatio (typos; ~15x cheaper than WRatio) over every distinct folded name. Results are (row, score, matched name, how)."""
+
+    def __init__(self, df):
+        self.df = df
+        self.exact = {}  # name as printed -> rows
+        self.folded = {}  # folded name -> rows
+        for start in range(0, len(df), NAME_BATCH_SIZE):
+            columns = to_object_columns(df.iloc[start:start + NAME_BATCH_SIZE], fields=NAME_FIELDS)
+            for row, names in enumerate(zip(*columns.values()), start=start):
+                for name in set(filter(None, names)):
+                    self.exact.setdefault(name, []).append(row)
+                    self.folded.setdefault(fold(name), []).append(row)
+        # Sorted folded names for prefix lookups; the same list is the rapidfuzz choice set
+        self.choices = sorted(self.folded)
+
+    def __len__(self):
+        return len(self.choices)
+
+    def _prefix(self, folded, limit):
+        start = bisect.bisect_left(self.choices, folded)
+        matches = []
+        for name in self.choices[start:]:
+            if not name.startswith(folded) or len(matches) >= limit:
+                break
+            matches.append(name)
+        return matches
+
+    def resolve(self, name, limit=5, fuzzy=True):
+        """Return up to `limit` [(row, score, matched name, how)] candidates, best first (one row per card).
+        
+        With `fuzzy` off, names that only match with typos return no candidates."""
+        if name in self.exact:
+            return self._rows([(name, 100.0)], 'exact', self.exact, limit)
+        folded = fold(name).strip()
+        if folded in self.folded:
+            return self._rows([(folded, 100.0)], 'normalized', self.folded, limit)
+        prefixed = self._prefix(folded, limit) if folded else []
+        if prefixed:
+            # Shorter completions first: "chatterfang" -> "chatterfang, squirrel general"
+            prefixed.sort(key=len)
+            return self._rows([(match, 100.0 * len(folded) / len(match)) for match in prefixed], 'prefix', self.folded, limit)
+        if not fuzzy:
+            return []
+        matches = process.extract(folded, self.choices, scorer=fuzz.QRatio, limit=limit, score_cutoff=FUZZY_CUTOFF)
+        return self._rows([(match, score) for match, score, _ in matches], 'fuzzy', self.folded, limit)
+
+    def _rows(self, matches, how, names, limit):
+        results, seen = [], set()
+        for matched, score in matches:
+            for row in names[matched]:
+                card = self.df['cardName'].iat[row]
+                # Several faces share a card name; keep the first (front) face the name matched
+                if card in seen:
+                    continue
+                seen.add(card)
+                results.append((row, float(score), matched, how))
+        return results[:limit]
+
+    def metadata(self, row):
+        """Vector-store style metadata dict (None fields dropped) for one card table row."""
+        columns = to_object_columns(self.df.iloc[[row]])
+        return {field: values[0] for field, values in columns.items() if values[0] is not None}
+
+
+_NAME_INDEX = CardTableCache(NameIndex)
+
+
+def get_name_index(df=None):
+    """Lazily build the name index from the shared card table (rebuilt when the table changes)."""
+    return _NAME_INDEX.get(df)
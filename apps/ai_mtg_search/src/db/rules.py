@@ -0,0 +1,218 @@
+import re
+import json
+import hashlib
+import threading
+
+from src.db.utils import CACHE_FOLDER, TXT_PATH, file_sha256, load_txt_file
+from src.db.lexical import BM25Index, fold, tokenize
+
+RULES_PREFIX = "rules-"
+RULES_INDEX_VERSION = 1  # bump when the parsed layout changes
+MAX_TERM_WORDS = 4  # longest glossary term / rule title matched inside a query
+
+# "100. General", "100.1. These Magic rules ...", "702.19b If an attacking creature with trample ..."
+_RULE_LINE = re.compile(r'^(\d{3}(?:\.\d+[a-z]?)?)\.?\s+(.*)$')
+_RULE_NUMBER = re.compile(r'\b(\d{3}(?:\.\d+[a-z]?)?)\b')
+_RULE_REFERENCE = re.compile(r'\brules? (\d{3}(?:\.\d+[a-z]?)?)')
+_WORD = re.compile(r"[a-z0-9+/']+")
+
+
+def _last_line(lines, value):
+    """Index of the last line equal to `value` (the table of contents repeats section headings), or None."""
+    for i in range(len(lines) - 1, -1, -1):
+        if lines[i].strip() == value:
+            return i
+    return None
+
+
+def _rule_title(number, text):
+    """Section headings and keyword rules ("702.19. Trample") are short and have no closing period."""
+    if number[-1].isalpha() or text.endswith('.') or len(text.split()) > 6:
+        return None
+    return text
+
+
+def parse_rules(text):
+    """Parse the comprehensive rules text into (rules, glossary).
+
+    rules: [{number, parent, title, text}] in document order, where parent is the enclosing rule
+    ("702.19" for "702.19b", "702" for "702.19"). glossary: [{term, text, rules}] with the rule
+    numbers each definition refers to."""
+    lines = text.lstrip('﻿').replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    start = _last_line(lines, '1. Game Concepts') or 0
+    glossary_start = _last_line(lines, 'Glossary')
+    credits_start = _last_line(lines, 'Credits')
+    rules_end = glossary_start if glossary_start and glossary_start > start else len(lines)
+
+    rules = []
+    for line in lines[start:rules_end]:
+        line = line.strip()
+        if not line:
+            continue
+        match = _RULE_LINE.match(line)
+        if match:
+            number, body = match.groups()
+            if '.' in number:
+                parent = number.rstrip('abcdefghijklmnopqrstuvwxyz') if number[-1].isalpha() else number.split('.')[0]
+            else:
+                parent = None
+            rules.append({'number': number, 'parent': parent, 'title': _rule_title(number, body), 'text': body})
+        elif rules and not re.match(r'^\d+\. ', line):
+            # Examples and wrapped lines belong to the rule above
+            rules[-1]['text'] += '\n' + line
+
+    glossary = []
+    if rules_end < len(lines):
+        block = []
+        glossary_end = credits_start if credits_start and credits_start > rules_end else len(lines)
+        for line in lines[rules_end + 1:glossary_end] + ['']:
+            if line.strip():
+                block.append(line.strip())
+                continue
+            if block:
+                definition = ' '.join(block[1:])
+                glossary.append({'term': block[0], 'text': definition, 'rules': _RULE_REFERENCE.findall(definition)})
+                block = []
+    return rules, glossary
+
+
+class RulesIndex:
+    """Comprehensive rules with an exact rule-number index, a term index (glossary and keyword titles)
+    and a BM25 index over the rule bodies."""
+
+    def __init__(self, rules, glossary, bm25):
+        self.rules = rules
+        self.glossary = glossary
+        self.bm25 = bm25
+        self.by_number = {rule['number']: i for i, rule in enumerate(rules)}
+        self.children = {}
+        for i, rule in enumerate(rules):
+            self.children.setdefault(rule['parent'], []).append(i)
+        # folded term -> ('glossary', entry index) / ('rule', rule index); glossary definitions win
+        self.terms = {}
+        for i, rule in enumerate(rules):
+            if rule['title'] and '.' in rule['number']:
+                self.terms.setdefault(fold(rule['title']), ('rule', i))
+        for i, entry in enumerate(glossary):
+            # "Double Strike" and "Active Player, Nonactive Player Order" style entries
+            self.terms[fold(entry['term'])] = ('glossary', i)
+
+    @classmethod
+    def build(cls, text):
+        rules, glossary = parse_rules(text)
+        bm25 = BM25Index.build(f"{rule['title'] or ''} {rule['text']}" for rule in rules)
+        return cls(rules, glossary, bm25)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def rule(self, number, subrules=True):
+        """Exact lookup: the rule numbered `number`, followed by its subrules (e.g. 702.19 -> 702.19a-e)."""
+        index = self.by_number.get(number.rstrip('.'))
+        if index is None:
+            return []
+        results = [self.rules[index]]
+        if subrules:
+            results += [self.rules[i] for i in self.children.get(self.rules[index]['number'], [])]
+        return results
+
+    def define(self, term):
+        """Glossary (or keyword rule) entry for `term`, case- and accent-insensitive; None if unknown."""
+        found = self.terms.get(fold(term).strip())
+        if found is None:
+            return None
+        kind, index = found
+        if kind == 'glossary':
+            return {'source': 'glossary', **self.glossary[index]}
+        return {'source': 'rule', **self.rules[index]}
+
+    def search(self, query, k=5):
+        """BM25 search over rule bodies: [{source, score, **rule}]."""
+        return [{'source': 'rule', 'score': score, **self.rules[i]} for i, score in self.bm25.search(query, k=k)]
+
+    def lookup(self, query, k=5):
+        """Resolve a rules question locally: rule numbers, then known terms ("what does trample mean"), then BM25."""
+        numbers = [number for number in _RULE_NUMBER.findall(query) if number in self.by_number]
+        if numbers:
+            return [{'source': 'rule', **rule} for number in numbers for rule in self.rule(number)][:k]
+
+        words = _WORD.findall(fold(query))
+        for size in range(min(MAX_TERM_WORDS, len(words)), 0, -1):
+            for i in range(len(words) - size + 1):
+                phrase = ' '.join(words[i:i + size])
+                # Plural queries ("what do tokens do") still hit singular terms
+                entry = self.define(phrase) or (phrase.endswith('s') and self.define(phrase[:-1]))
+                if entry and not (size == 1 and tokenize(phrase) == []):
+                    return self._with_rules(entry)
+        return self.search(query, k=k)
+
+    def _with_rules(self, entry):
+        """A term entry followed by the full rule it points at (keyword rule or first glossary reference)."""
+        if entry['source'] == 'rule':
+            return [entry] + [{'source': 'rule', **rule} for rule in self.rule(entry['number'])[1:]]
+        referenced = [{'source': 'rule', **rule} for number in entry['rules'][:1] for rule in self.rule(number)]
+        return [entry] + referenced
+
+    def save(self, key):
+        path = rules_index_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({'rules': self.rules, 'glossary': self.glossary}, f)
+        self.bm25.save(path.with_suffix(".npz"))
+        tmp_path.replace(path)
+        # Drop indexes of older rules files
+        for stale in CACHE_FOLDER.glob(f"{RULES_PREFIX}*"):
+            if stale.stem != path.stem:
+                stale.unlink(missing_ok=True)
+
+    @classmethod
+    def load(cls, key):
+        path = rules_index_path(key)
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls(data['rules'], data['glossary'], BM25Index.load(path.with_suffix(".npz")))
+
+
+def rules_index_key(path=TXT_PATH):
+    """Cache key for the parsed rules: hash of the rules file plus the index version."""
+    digest = hashlib.sha256(file_sha256(path).encode())
+    digest.update(str(RULES_INDEX_VERSION).encode())
+    return digest.hexdigest()[:16]
+
+
+def rules_index_path(key):
+    return CACHE_FOLDER / f"{RULES_PREFIX}{key}.json"
+
+
+_RULES_INDEX = None
+_RULES_LOCK = threading.Lock()
+
+
+def get_rules_index():
+    """Lazily load the rules index, parsing (and downloading) the rules text only when it isn't cached yet."""
+    global _RULES_INDEX
+    if _RULES_INDEX is None:
+        with _RULES_LOCK:
+            if _RULES_INDEX is None:
+                if not TXT_PATH.exists():
+                    load_txt_file()  # downloads the rules
+                key = rules_index_key(TXT_PATH)
+                path = rules_index_path(key)
+                if path.exists() and path.with_suffix(".npz").exists():
+                    _RULES_INDEX = RulesIndex.load(key)
+                else:
+                    index = RulesIndex.build(TXT_PATH.read_text())
+                    index.save(key)
+                    _RULES_INDEX = index
+    return _RULES_INDEX
+
+
+def lookup_rules(query, k=5):
+    """Answer a rules lookup ("702.19b", "what does trample mean", "damage assignment order") from the local index."""
+    return get_rules_index().lookup(query, k=k)
+
+
+if __name__ == "__main__":
+    for query in ['702.19b', 'what does trample mean', 'first strike', 'can I respond to a triggered ability']:
+        print(query, '->', [(entry.get('number') or entry.get('term')) for entry in lookup_rules(query)])
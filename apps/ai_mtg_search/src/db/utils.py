@@ -1,7 +1,15 @@
 
+import re
 import json
+import uuid
+import hashlib
+import threading
 import requests
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
 import streamlit as st
 
 from pathlib import Path
@@ -15,6 +23,36 @@ CARDS_FILE = "AtomicCards.json"
 RULES_FILE = "MagicCompRules_21031101.txt"
 JSON_PATH = DATA_FOLDER / CARDS_FILE
 TXT_PATH = DATA_FOLDER / RULES_FILE
+CACHE_FOLDER = DATA_FOLDER / "cache"
+CARD_TABLE_PREFIX = "cards-"
+CARD_TABLE_VERSION = 2  # bump when the on-disk card table layout changes
+CARD_INDEX_NAME = "mtg-cards"  # vector index the shared card table (and its in-memory indexes) back
+
+# Streaming ingestion settings
+CARD_CHUNK_SIZE = 2000  # normalized rows per emitted chunk
+READ_BLOCK_SIZE = 1 << 20  # bytes read from disk at a time
+
+# Field groups for preprocess_card_fields, resolved once from METADATA_FIELDS
+REPR_FIELDS = ['rulings', 'foreignData']  # nested records, kept as their string repr
+LEGALITY_FIELDS = [col for col in METADATA_FIELDS if col.startswith('legalities.')]
+STRING_FIELDS = [
+    col for col, field_info in METADATA_FIELDS.items() 
+    if field_info['type'] == 'string' and col not in LEGALITY_FIELDS
+]
+JOINED_FIELDS = [
+    col for col, field_info in METADATA_FIELDS.items() 
+    if field_info['type'] == 'string_array' and col not in REPR_FIELDS
+]
+BOOLEAN_FIELDS = [col for col, field_info in METADATA_FIELDS.items() if field_info['type'] == 'boolean']
+NUMBER_FIELDS = [col for col, field_info in METADATA_FIELDS.items() if field_info['type'] == 'number']
+
+# Compact card table layout (see compact_card_table)
+CATEGORY_FIELDS = LEGALITY_FIELDS + ['layout']
+FLAGS_COLUMN = 'flags'  # bit i holds BOOLEAN_FIELDS[i]
+STRING_DTYPE = pd.ArrowDtype(pa.string())
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r'\s*')
 
 
 
@@ -46,76 +84,453 @@ def fetch_mtgjson_data():
     """Download the latest MTG card data and save locally as JSON."""
     url = "https://mtgjson.com/api/v5/AtomicCards.json"
     print(f"Fetching data from {url}...")
-    response = requests.get(url)
-    response.raise_for_status()
-    data = response.json()
-    JSON_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(JSON_PATH, "w") as f:
-        json.dump(data, f)
+    # Stream straight to disk so the download never holds the whole file in memory
+    with requests.get(url, stream=True) as response:
+        response.raise_for_status()
+        JSON_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(JSON_PATH, "wb") as f:
+            for block in response.iter_content(chunk_size=READ_BLOCK_SIZE):
+                f.write(block)
+
+
+def _field_block(df, fields):
+    """Return the fields present in `df` and their values as a 2D object array (one column per field)."""
+    fields = [col for col in fields if col in df.columns]
+    return fields, df[fields].to_numpy(dtype=object)
 
 
 def preprocess_card_fields(df):
-    """Normalize card data fields and types according to METADATA_FIELDS."""
-    # First convert all NaN values to None
-    df = df.replace([pd.NA, pd.NaT, ''], None)
-    df = df.where(pd.notna(df), None)
-    
-    # Process each field according to its type
-    for col, field_info in METADATA_FIELDS.items():
-        
-        if col not in df.columns:
-            df[col] = None
-            continue
-            
-        field_type = field_info['type']
-        if field_type == 'string_array':
-            if col in ['rulings', 'foreignData']:
-                df[col] = df[col].astype(str)
-            else:
-                # Convert lists to comma-separated strings, properly handling each array element
-                df[col] = df[col].apply(lambda x: ','.join(x) if isinstance(x, list) and x else None)
-        elif field_type == 'boolean':
-            # Convert nulls to False for boolean fields
-            df[col] = df[col].fillna(False)
-        elif field_type == 'number':
-            # Ensure numbers are numeric, convert NaN to None
-            df[col] = pd.to_numeric(df[col], errors='coerce').astype(object)
-            df[col] = df[col].where(df[col].notna(), None)
-            
-        # handle strings specifically or do nothing 
-        elif col.startswith('legalities.'):
-            df[col] = df[col].fillna('Not Legal')
-        elif col == 'faceName':
-            locs = df[col].isna()
-            df.loc[locs, 'faceName'] = df.loc[locs, 'name']
-        
-    
-    return df[list(METADATA_FIELDS.keys())]
+    """Normalize card data fields and types according to METADATA_FIELDS.
+    
+    Each field type is normalized in one bulk operation over all of its columns; only schema columns are touched."""
+    columns = {}
+    
+    # Strings: NaN and empty strings become None
+    fields, values = _field_block(df, STRING_FIELDS)
+    values[pd.isna(values) | (values == '')] = None
+    columns.update(zip(fields, values.T))
+    
+    # Legalities: anything missing is 'Not Legal'
+    fields, values = _field_block(df, LEGALITY_FIELDS)
+    values[pd.isna(values) | (values == '')] = 'Not Legal'
+    columns.update(zip(fields, values.T))
+    
+    # String arrays: comma-join every column at once in Arrow; empty or missing lists become None
+    fields, values = _field_block(df, JOINED_FIELDS)
+    if fields:
+        lists = pa.array(values.T.ravel(), type=pa.list_(pa.string()), from_pandas=True)
+        joined = pc.binary_join(lists, ',')
+        joined = pc.if_else(pc.equal(joined, ''), None, joined)
+        columns.update(zip(fields, joined.to_numpy(zero_copy_only=False).reshape(len(fields), len(df))))
+    
+    # Nested records (rulings, foreignData) are kept as their string repr, with missing values as 'None'
+    fields, values = _field_block(df, REPR_FIELDS)
+    values[pd.isna(values) | (values == '')] = None
+    columns.update(zip(fields, pd.DataFrame(values).astype(str).to_numpy().T))
+    
+    # Booleans: only an explicit True is True
+    fields, values = _field_block(df, BOOLEAN_FIELDS)
+    columns.update(zip(fields, (values == True).T))
+    
+    # Numbers: coerce to numeric, missing values as None
+    fields = [col for col in NUMBER_FIELDS if col in df.columns]
+    values = df[fields].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=object)
+    values[pd.isna(values)] = None
+    columns.update(zip(fields, values.T))
+    
+    # Single-faced cards use the card name as their face name
+    if 'faceName' in columns and 'name' in columns:
+        face_names = columns['faceName']
+        locs = pd.isna(face_names)
+        face_names[locs] = columns['name'][locs]
+    
+    # Fields missing from the source entirely are left as None
+    for col in METADATA_FIELDS:
+        if col not in columns:
+            columns[col] = np.full(len(df), None, dtype=object)
+    
+    return pd.DataFrame(columns, index=df.index, columns=list(METADATA_FIELDS))
 
 
-def transform_card_data(data):
-    """Convert raw MTG card data into a normalized pandas DataFrame."""
+def flatten_card_data(data):
+    """Flatten raw MTG card data into one row per card face, with nested fields as dotted columns."""
     # Convert nested card data into a flat DataFrame
     df = pd.json_normalize(data)
     # Expand card variants into separate rows
     df = df.transpose().explode(0).reset_index().rename(columns={'index': 'cardName'})
     # Normalize the card data into columns
-    df = pd.concat([
+    return pd.concat([
         df['cardName'], 
         pd.json_normalize(df[0]) 
     ], axis=1) 
+
+
+def transform_card_data(data):
+    """Convert raw MTG card data into a normalized pandas DataFrame."""
+    return preprocess_card_fields(flatten_card_data(data))
+
+
+class _JSONStream:
+    """Incremental JSON reader that decodes one value at a time from an open text file."""
+
+    def __init__(self, f, block_size=READ_BLOCK_SIZE):
+        self.f = f
+        self.block_size = block_size
+        self.buf = ''
+        self.pos = 0
+
+    def _fill(self):
+        """Append the next block of the file to the buffer. Returns False at end of file."""
+        block = self.f.read(self.block_size)
+        if not block:
+            return False
+        # Drop everything already consumed so the buffer never grows past ~one value + one block
+        self.buf = self.buf[self.pos:] + block
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON input")
+
+    def expect(self, char):
+        """Consume the next non-whitespace character, which must be `char`."""
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos} of the JSON buffer")
+        self.pos += 1
+
+    def skip_comma(self):
+        """Consume a separating comma if one comes next."""
+        if self.peek() == ',':
+            self.pos += 1
+
+    def value(self):
+        """Decode and consume the next complete JSON value, reading more of the file as needed."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Value straddles the end of the buffer; read more and retry
+                if not self._fill():
+                    raise
+                continue
+            self.pos = end
+            return value
+
+
+def iter_card_faces(path=JSON_PATH):
+    """Yield (cardName, face) pairs from AtomicCards.json one card at a time, without loading the whole file."""
+    with open(path, "r", encoding="utf-8") as f:
+        stream = _JSONStream(f)
+        stream.expect('{')
+        while stream.peek() != '}':
+            key = stream.value()
+            stream.expect(':')
+            if key != 'data':
+                # `meta` and any other top-level entries are small; decode and discard
+                stream.value()
+            else:
+                stream.expect('{')
+                while stream.peek() != '}':
+                    card_name = stream.value()
+                    stream.expect(':')
+                    for face in stream.value():
+                        yield card_name, face
+                    stream.skip_comma()
+                stream.expect('}')
+            stream.skip_comma()
+
+
+def flatten_card_face(card_name, face):
+    """Flatten one card face into a METADATA_FIELDS row, using the same dotted keys as pd.json_normalize."""
+    row = {'cardName': card_name}
+    for key, value in face.items():
+        if isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                field = f'{key}.{sub_key}'
+                if field in METADATA_FIELDS:
+                    row[field] = sub_value
+        elif key in METADATA_FIELDS:
+            row[key] = value
+    return row
+
+
+def _rows_to_frame(rows):
+    """Build a normalized DataFrame from flattened card rows."""
+    df = pd.DataFrame.from_records(rows, columns=list(METADATA_FIELDS)).astype(object)
+    # Match the float columns pd.json_normalize infers for the whole file, even if a chunk happens to be all ints
+    for col in NUMBER_FIELDS:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype(float)
+    return preprocess_card_fields(df)
+
+
+def iter_card_chunks(path=JSON_PATH, chunk_size=CARD_CHUNK_SIZE):
+    """Stream AtomicCards.json and yield normalized DataFrames of at most `chunk_size` rows each.
     
-    # Reorder columns to match output_cols
-    return preprocess_card_fields(df) 
+    Together the chunks equal `transform_card_data` of the whole file, except for a field no card in
+    the file has at all: a chunk can't know that, so it is filled (False, 'Not Legal') instead of None."""
+    rows = []
+    start = 0
+    for card_name, face in iter_card_faces(path):
+        rows.append(flatten_card_face(card_name, face))
+        if len(rows) == chunk_size:
+            chunk = _rows_to_frame(rows)
+            chunk.index = pd.RangeIndex(start, start + len(chunk))
+            start += len(chunk)
+            rows = []
+            yield chunk
+    if rows:
+        chunk = _rows_to_frame(rows)
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        yield chunk
 
 
-def load_json_file():
-    """Load or fetch MTG card data and return as a normalized DataFrame."""
+def load_json_file(chunk_size=CARD_CHUNK_SIZE):
+    """Load or fetch MTG card data and return as a normalized DataFrame.
+    
+    Cards are streamed in `chunk_size` batches so the raw JSON is never held in memory at once;
+    `chunk_size=None` parses the whole file at once (the original in-memory path). `load_card_table`
+    compacts the chunks as they stream instead, which is what keeps its peak memory low."""
     if JSON_PATH.exists():
-        with open(JSON_PATH, "r") as f:
+        if chunk_size:
+            return pd.concat(iter_card_chunks(JSON_PATH, chunk_size=chunk_size))
+        with open(JSON_PATH, "r", encoding="utf-8") as f:
             data = json.load(f)["data"]
         return transform_card_data(data)
     else:
         with st.spinner(f"{CARDS_FILE} not found in {DATA_FOLDER}. Downloading..."):
             fetch_mtgjson_data()
-        return load_json_file()
\ No newline at end of file
+        return load_json_file(chunk_size=chunk_size)
+
+
+def _compact_number_column(series):
+    """Store a number column in the smallest dtype that holds every value exactly: nullable int8/16/32, float32, else float64."""
+    values = series.to_numpy(dtype='float64', na_value=np.nan)
+    present = values[~np.isnan(values)]
+    if np.array_equal(present, np.trunc(present)):
+        for dtype in ('int8', 'int16', 'int32'):
+            info = np.iinfo(dtype)
+            if present.size == 0 or (present.min() >= info.min and present.max() <= info.max):
+                return pd.Series(values, index=series.index).astype(dtype.capitalize())
+    if np.array_equal(present.astype(np.float32).astype(np.float64), present):
+        return pd.Series(values.astype(np.float32), index=series.index)
+    return pd.Series(values, index=series.index)
+
+
+def compact_card_table(df):
+    """Convert a normalized card table to its compact in-memory form.
+    
+    Legalities and layouts become categoricals, boolean fields are bit-packed into a single `flags`
+    column, numbers use the smallest exact dtype and every other field is an Arrow-backed string."""
+    columns = {}
+    flags = np.zeros(len(df), dtype=np.min_scalar_type(2 ** len(BOOLEAN_FIELDS) - 1))
+    for col in METADATA_FIELDS:
+        if col in BOOLEAN_FIELDS and df[col].dtype == bool:
+            flags |= df[col].to_numpy().astype(flags.dtype) << BOOLEAN_FIELDS.index(col)
+        elif col in BOOLEAN_FIELDS:
+            # Field was missing from the source (all None); keep it as-is so the round trip stays exact
+            columns[col] = df[col]
+        elif col in NUMBER_FIELDS:
+            columns[col] = _compact_number_column(df[col])
+        elif col in CATEGORY_FIELDS:
+            columns[col] = df[col].astype('category')
+        else:
+            columns[col] = df[col].astype(STRING_DTYPE)
+    columns[FLAGS_COLUMN] = flags
+    return pd.DataFrame(columns, index=df.index)
+
+
+def compact_card_chunks(chunks):
+    """Compact card table built from normalized chunks, compacting each one before they are joined.
+    
+    Only one plain-object chunk is alive at a time. Categories are unified and number columns re-narrowed
+    after the join, so the result is the same as compacting the whole table at once."""
+    parts = [compact_card_table(chunk) for chunk in chunks]
+    for col in CATEGORY_FIELDS:
+        # Chunks with different categories would concatenate to object columns
+        categories = sorted(set().union(*(part[col].cat.categories for part in parts)))
+        for part in parts:
+            part[col] = part[col].cat.set_categories(categories)
+    for part in parts:
+        # Chunks narrow numbers independently (an all-missing chunk is Int8); join them as float64
+        for col in NUMBER_FIELDS:
+            part[col] = part[col].astype('float64')
+    df = pd.concat(parts)
+    del parts
+    for col in NUMBER_FIELDS:
+        df[col] = _compact_number_column(df[col])
+    return df
+
+
+def _object_column(df, col):
+    """Plain-object values of one METADATA field from a compact card table."""
+    if col in BOOLEAN_FIELDS and col not in df.columns:
+        return (df[FLAGS_COLUMN].to_numpy() >> BOOLEAN_FIELDS.index(col)) & 1 == 1
+    if col in NUMBER_FIELDS:
+        values = df[col].to_numpy(dtype='float64', na_value=np.nan)
+        column = values.astype(object)
+        column[np.isnan(values)] = None
+        return column
+    return df[col].to_numpy(dtype=object, na_value=None)
+
+
+def to_object_columns(df, fields=None):
+    """Return {field: list of plain Python values} for every METADATA field (or just `fields`) of a compact or plain card table."""
+    if FLAGS_COLUMN not in df.columns:
+        return {col: df[col].tolist() for col in (fields or df.columns) if col in METADATA_FIELDS}
+    return {col: _object_column(df, col).tolist() for col in (fields or METADATA_FIELDS)}
+
+
+def to_object_frame(df):
+    """Convert a compact card table back to the plain-object form produced by preprocess_card_fields."""
+    if FLAGS_COLUMN not in df.columns:
+        return df
+    columns = {col: _object_column(df, col) for col in METADATA_FIELDS}
+    return pd.DataFrame(columns, index=df.index, columns=list(METADATA_FIELDS))
+
+
+def file_sha256(path, block_size=READ_BLOCK_SIZE):
+    """Return the hex SHA-256 digest of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def card_table_key(path=None):
+    """Cache key for the normalized card table: hash of the source file (JSON_PATH by default) plus the METADATA_FIELDS schema."""
+    digest = hashlib.sha256()
+    digest.update(file_sha256(path or JSON_PATH).encode())
+    digest.update(json.dumps(METADATA_FIELDS, sort_keys=True).encode())
+    digest.update(str(CARD_TABLE_VERSION).encode())
+    return digest.hexdigest()[:16]
+
+
+def card_table_path(key):
+    """Location of the cached card table for a given cache key."""
+    return CACHE_FOLDER / f"{CARD_TABLE_PREFIX}{key}.arrow"
+
+
+def save_card_table(df, key):
+    """Write the card table as uncompressed Arrow IPC and drop cache files for any other key."""
+    path = card_table_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temp file first so a crash never leaves a truncated cache behind
+    tmp_path = path.with_suffix(".tmp")
+    feather.write_feather(df.reset_index(drop=True), tmp_path, compression="uncompressed")
+    tmp_path.replace(path)
+    for stale in CACHE_FOLDER.glob(f"{CARD_TABLE_PREFIX}*.arrow"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return path
+
+
+def read_card_table(path):
+    """Memory-map a cached (compact) card table.
+    
+    String columns stay Arrow arrays over the mapped file (no copy) with the same STRING_DTYPE a freshly
+    built table has; only the small categorical, number and flags columns are copied into pandas."""
+    table = feather.read_table(path, memory_map=True)
+    return table.to_pandas(types_mapper={pa.string(): STRING_DTYPE}.get)
+
+
+def load_card_table(chunk_size=CARD_CHUNK_SIZE):
+    """Return the compact card table, reusing the on-disk cache while the source file and schema are unchanged.
+    
+    Use `to_object_frame` on the result where the plain-object form is needed."""
+    if not JSON_PATH.exists():
+        with st.spinner(f"{CARDS_FILE} not found in {DATA_FOLDER}. Downloading..."):
+            fetch_mtgjson_data()
+    
+    key = card_table_key(JSON_PATH)
+    path = card_table_path(key)
+    if path.exists():
+        return read_card_table(path)
+    
+    if chunk_size:
+        df = compact_card_chunks(iter_card_chunks(JSON_PATH, chunk_size=chunk_size))
+    else:
+        df = compact_card_table(load_json_file(chunk_size=None))
+    save_card_table(df, key)
+    return df
+
+def version_path(index_name=CARD_INDEX_NAME):
+    """Location of the index version token, which changes whenever the index contents do."""
+    return DATA_FOLDER / f"{index_name}-version"
+
+
+def index_version(index_name=CARD_INDEX_NAME):
+    """Current index version token ("0" before the first build); caches key on it to drop stale answers."""
+    path = version_path(index_name)
+    return path.read_text() if path.exists() else "0"
+
+
+def bump_index_version(index_name=CARD_INDEX_NAME):
+    """Mark the index contents as changed (after a build, a sync with changes or a reset)."""
+    path = version_path(index_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(uuid.uuid4().hex)
+    tmp_path.replace(path)
+
+
+_CARD_TABLE = None  # (index version it was loaded at, compact card table)
+_CARD_TABLE_LOCK = threading.Lock()
+
+
+def get_card_table():
+    """Process-wide shared compact card table for the in-memory search indexes.
+    
+    Reloaded when the index version changes (a rebuild, sync or reset, possibly by another process), the
+    same check that reopens the vector store, so both always serve the same card snapshot."""
+    global _CARD_TABLE
+    version = index_version()
+    cached = _CARD_TABLE
+    if cached is None or cached[0] != version:
+        with _CARD_TABLE_LOCK:
+            cached = _CARD_TABLE
+            if cached is None or cached[0] != version:
+                cached = _CARD_TABLE = (version, load_card_table())
+    return cached[1]
+
+
+def set_card_table(df):
+    """Share `df` as the card table of the current index version (after a build or sync indexed it)."""
+    global _CARD_TABLE
+    with _CARD_TABLE_LOCK:
+        _CARD_TABLE = (index_version(), df)
+
+
+class CardTableCache:
+    """One object built from the shared card table, rebuilt whenever that table is replaced.
+    
+    Every in-memory index (filters, names, router, BM25) goes through one of these, so they are always
+    built from the very same card table and their row numbers line up."""
+
+    def __init__(self, build):
+        self.build = build
+        self._cached = None  # (card table it was built from, object)
+        self._lock = threading.Lock()
+
+    def get(self, df=None):
+        """The object for card table `df` (default: the current shared table), building it if needed."""
+        df = get_card_table() if df is None else df
+        cached = self._cached
+        if cached is None or cached[0] is not df:
+            with self._lock:
+                cached = self._cached
+                if cached is None or cached[0] is not df:
+                    cached = self._cached = (df, self.build(df))
+        return cached[1]
+
+    def set(self, df, value):
+        """Use an already built `value` for card table `df`."""
+        with self._lock:
+            self._cached = (df, value)
@@ -1,8 +1,10 @@
 import os
+import json
+import hashlib
+import threading
 from dotenv import load_dotenv
 load_dotenv()
 
-import pandas as pd
 import numpy as np
 import streamlit as st
 from langchain_pinecone import PineconeVectorStore
@@ -10,38 +12,140 @@ from pinecone import Pinecone, ServerlessSpec
 from langchain_openai import OpenAIEmbeddings
 from langchain.schema import Document
 
-from src.constants import METADATA_FIELDS
-from src.db.utils import load_json_file, load_txt_file 
+from src.db.utils import (
+    CARD_INDEX_NAME, DATA_FOLDER, bump_index_version, card_table_key, fetch_mtgjson_data, get_card_table,
+    index_version, load_card_table, set_card_table, to_object_columns
+)
+from src.db.embeddings import EMBEDDINGS_FOLDER, CachedEmbeddings, QueryEmbeddingCache
+from src.db.ingest import Checkpoint, run_ingest_pipeline, with_backoff
+from src.db.local_index import LocalVectorIndex, LocalVectorStore
+from src.db.card_lexical import build_card_lexical_index
+from src.tokens import token_counter
 
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
-PINECONE_INDEX_NAME = "mtg-cards"
+PINECONE_INDEX_NAME = CARD_INDEX_NAME
 PINECONE_ENVIRONMENT = "us-east-1-aws"  # Update with your preferred environment
 EMBEDDING_MODEL = "text-embedding-3-small"
 DIMENSION = 1536  # Dimension for text-embedding-3-small
+DELETE_BATCH_SIZE = 1000  # Pinecone's limit on IDs per delete request
+ID_FIELDS = ['identifiers.scryfallOracleId', 'cardName', 'side']  # fields card_vector_id reads
+DOCUMENT_BLOCK_SIZE = 5000  # card table rows converted to plain values at a time when building Documents
+
+# "pinecone" or "local" (in-process NumPy index under data/index, no vector service needed)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+LOCAL_INDEX_DTYPE = os.getenv("LOCAL_INDEX_DTYPE", "float32")  # "float32" or "float16"
+LOCAL_INDEX_MODE = os.getenv("LOCAL_INDEX_MODE", "exact")  # "exact" or "ivf" (approximate)
+LOCAL_INDEX_QUANTIZATION = os.getenv("LOCAL_INDEX_QUANTIZATION", "none")  # "none" or "int8" (rescored)
+# Matryoshka first stage: search a truncated 256/512-d copy, rerank the top few hundred at full DIMENSION (0 = off)
+LOCAL_INDEX_FIRST_STAGE_DIM = int(os.getenv("LOCAL_INDEX_FIRST_STAGE_DIM", "0"))
+# Keep the query embedding cache across restarts (snapshot under data/cache/embeddings)
+QUERY_CACHE_PERSIST = os.getenv("QUERY_CACHE_PERSIST", "true").lower() == "true"
+QUERY_CACHE_PATH = EMBEDDINGS_FOLDER / f"queries-{EMBEDDING_MODEL}-{DIMENSION}.npz"
+
+# Process-wide handles, created on first use so importing this module has no side effects
+_LOCK = threading.RLock()
+_EMBEDDINGS = None
+_QUERY_EMBEDDINGS = None
+_INDEXES = {}  # (backend, index name) -> opened index
+_VECTOR_STORE = None  # (index version it was opened at, vector store)
+_INDEX_STATS = {}  # index name -> (index version, describe_index_stats())
+
+
+def get_embeddings():
+    """The OpenAI embedding model, created on first use."""
+    global _EMBEDDINGS
+    if _EMBEDDINGS is None:
+        with _LOCK:
+            if _EMBEDDINGS is None:
+                _EMBEDDINGS = OpenAIEmbeddings(
+                    model=EMBEDDING_MODEL,
+                    show_progress_bar=False
+                )
+    return _EMBEDDINGS
+
+
+def get_query_embeddings():
+    """Query embedding cache every search embeds through, so repeated queries skip the API."""
+    global _QUERY_EMBEDDINGS
+    if _QUERY_EMBEDDINGS is None:
+        with _LOCK:
+            if _QUERY_EMBEDDINGS is None:
+                _QUERY_EMBEDDINGS = QueryEmbeddingCache(
+                    get_embeddings(), EMBEDDING_MODEL, DIMENSION, path=QUERY_CACHE_PATH if QUERY_CACHE_PERSIST else None
+                )
+    return _QUERY_EMBEDDINGS
+
+
+def iter_search_documents(df, batch_size=500):
+    """Yield Langchain Document batches for vector storage, building each batch of `batch_size` cards column-wise.
+    
+    Accepts either the compact or plain-object card table. Rows are converted to plain values
+    DOCUMENT_BLOCK_SIZE (or `batch_size`) at a time, so only one block is materialized at once."""
+    block_size = max(batch_size, DOCUMENT_BLOCK_SIZE // batch_size * batch_size)
+    for block_start in range(0, len(df), block_size):
+        columns = to_object_columns(df.iloc[block_start:block_start + block_size])
+        contents = [
+            f'{name}:{text if text is not None else ""}' 
+            for name, text in zip(columns['faceName'], columns['text'])
+        ]
+        # Fields that are empty for the whole block (e.g. `defense`, `hand`) never reach the per-card loop
+        columns = {col: values for col, values in columns.items() if any(val is not None for val in values)}
+        fields = list(columns)
+        rows = list(zip(*columns.values()))
+        del columns
+        for start in range(0, len(rows), batch_size):
+            # Page content and metadata are plain strings and dicts built here, so pydantic validation is skipped
+            yield [
+                Document.model_construct(
+                    page_content=page_content,
+                    # Pinecone requires metadata if it is present, 
+                    # `val is not None` is to avoid empty strings/fields
+                    metadata={col: val for col, val in zip(fields, values) if val is not None},
+                )
+                for page_content, values in zip(contents[start:start + batch_size], rows[start:start + batch_size])
+            ]
 
-EMBEDDINGS = OpenAIEmbeddings(
-        model=EMBEDDING_MODEL,
-        show_progress_bar=False
-    )
+
+def card_vector_id(metadata):
+    """Stable vector ID for a card face: its Scryfall oracle ID plus side (falls back to the card name)."""
+    card_id = metadata.get('identifiers.scryfallOracleId') or metadata['cardName']
+    side = metadata.get('side')
+    return f"{card_id}-{side}" if side else card_id
+
+
+def document_fingerprint(doc):
+    """Short hash of everything a card contributes to the index (page content and metadata)."""
+    payload = json.dumps([doc.page_content, doc.metadata], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=8).hexdigest()
+
+
+def manifest_path(index_name=PINECONE_INDEX_NAME):
+    """Location of the snapshot manifest ({vector id: fingerprint}) of what is currently in the index."""
+    return DATA_FOLDER / f"{index_name}-manifest.json"
+
+
+def load_manifest(index_name=PINECONE_INDEX_NAME):
+    """Return the manifest of the last indexed snapshot, or None if the index has never been synced."""
+    path = manifest_path(index_name)
+    if not path.exists():
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, index_name=PINECONE_INDEX_NAME):
+    """Atomically write the manifest of the snapshot that is now in the index."""
+    path = manifest_path(index_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    tmp_path.replace(path)
 
 
 def create_search_documents(df):
     """Convert card DataFrame rows into Langchain Document objects for vector storage."""
-    docs = []
-    for _, row in df.iterrows():
-        # Create metadata dict using only fields defined in METADATA_FIELDS
-        metadata = {
-            col: val for col, val in row.items() 
-            # Pinecone requires metadata if it is present, 
-            # `val is not None` is to avoid empty strings/fields
-            if col in METADATA_FIELDS and val is not None 
-        }
-        
-        name = row['faceName']
-        text = row['text'] if pd.notna(row['text']) else ''
-        page_content = f'{name}:{text}'
-        docs.append(Document(page_content=page_content, metadata=metadata))
-    return docs
+    return [doc for batch in iter_search_documents(df) for doc in batch]
 
 
 def initialize_pinecone():
@@ -62,77 +166,278 @@ def initialize_pinecone():
     return pc
 
 
-def build_vectorstore(df, index_name=PINECONE_INDEX_NAME, batch_size=500, show_progress=None):
-    """Create or load a Pinecone vector store from card data."""
-    # Initialize Pinecone
-    pc = initialize_pinecone()
+def get_index(index_name=PINECONE_INDEX_NAME, backend=None):
+    """Open the raw vector index (Pinecone Index or LocalVectorIndex) for the configured backend.
+    
+    Opened indexes are shared process-wide, so builds, syncs and searches all see the same local index."""
+    key = (backend or VECTOR_BACKEND, index_name)
+    with _LOCK:
+        if key not in _INDEXES:
+            if key[0] == "local":
+                _INDEXES[key] = LocalVectorIndex(index_name, dtype=LOCAL_INDEX_DTYPE, dimension=DIMENSION)
+            else:
+                _INDEXES[key] = initialize_pinecone().Index(index_name)
+        return _INDEXES[key]
+
+
+def get_index_stats(index_name=PINECONE_INDEX_NAME):
+    """describe_index_stats() of the index, cached until the index version changes."""
+    version = index_version(index_name)
+    cached = _INDEX_STATS.get(index_name)
+    if cached is None or cached[0] != version:
+        cached = _INDEX_STATS[index_name] = (version, get_index(index_name).describe_index_stats())
+    return cached[1]
+
+
+def release_index(index_name=PINECONE_INDEX_NAME):
+    """Forget the shared handles to an index so the next use reopens it (after it changed in another process)."""
+    global _VECTOR_STORE
+    with _LOCK:
+        for key in [key for key in _INDEXES if key[1] == index_name]:
+            del _INDEXES[key]
+        _INDEX_STATS.pop(index_name, None)
+        _VECTOR_STORE = None
+
+
+def prepare_local_index(index):
+    """Build the configured IVF lists / int8 codes / truncated first stage after the local index contents change."""
+    if LOCAL_INDEX_MODE == "ivf":
+        index.build_ivf()
+    if LOCAL_INDEX_QUANTIZATION == "int8":
+        index.quantize()
+    if LOCAL_INDEX_FIRST_STAGE_DIM:
+        index.truncate(LOCAL_INDEX_FIRST_STAGE_DIM)
+
+
+def make_vector_store(index):
+    """Wrap a raw index in the matching Langchain vector store."""
+    if isinstance(index, LocalVectorIndex):
+        return LocalVectorStore(index=index, embedding=get_query_embeddings(), text_key="content")
+    return PineconeVectorStore(index=index, embedding=get_query_embeddings(), text_key="content")
+
+
+_INDEX_ROWS = None  # (index, row count, live count, card table, card table row -> local index row)
+
+
+def card_index_rows(index, df, batch_size=5000):
+    """Local index row of every card table row (-1 where the card isn't indexed), cached until the index or table changes."""
+    global _INDEX_ROWS
+    cached = _INDEX_ROWS
+    if cached is None or cached[0] is not index or cached[1:3] != (len(index.ids), len(index.rows)) or cached[3] is not df:
+        rows = np.full(len(df), -1, dtype=np.int64)
+        for start in range(0, len(df), batch_size):
+            columns = to_object_columns(df.iloc[start:start + batch_size], fields=ID_FIELDS)
+            for i, values in enumerate(zip(*columns.values()), start=start):
+                rows[i] = index.rows.get(card_vector_id(dict(zip(ID_FIELDS, values))), -1)
+        cached = _INDEX_ROWS = (index, len(index.ids), len(index.rows), df, rows)
+    return cached[4]
+
+
+def filter_search_kwargs(vector_store, card_filter):
+    """similarity_search kwargs applying a compiled CardFilter inside the search.
+
+    The local index gets a row mask; Pinecone gets the equivalent metadata filter."""
+    if card_filter is None:
+        return {}
+    if isinstance(vector_store, LocalVectorStore):
+        index = vector_store.index
+        # Row numbers of the table the filter was compiled over, even if a sync replaced it since
+        table = card_filter.table if card_filter.table is not None else get_card_table()
+        rows = card_index_rows(index, table)[card_filter.mask]
+        mask = np.zeros(len(index.ids), dtype=bool)
+        mask[rows[rows >= 0]] = True
+        return {'mask': mask}
+    return {'filter': card_filter.native}
+
+
+def publish_card_table(df, index_name=PINECONE_INDEX_NAME):
+    """Make `df` the card table searches use after it was indexed, with the BM25 index built from it.
+    
+    The other in-memory indexes (filters, names, router) rebuild from it on first use. Call after the
+    index version bump, so other processes reload the card table too."""
+    if index_name != PINECONE_INDEX_NAME:
+        return  # only the app's index backs the shared card table
+    set_card_table(df)
+    build_card_lexical_index(df)
+
+
+def checkpoint_path(index_name=PINECONE_INDEX_NAME):
+    """Location of the resume log of an in-progress build."""
+    return DATA_FOLDER / f"{index_name}-checkpoint.jsonl"
+
+
+def iter_ingest_batches(df, batch_size=500):
+    """Yield (batch start, documents, vector ids, fingerprints) batches for the ingest pipeline."""
+    for start, batch in zip(range(0, len(df), batch_size), iter_search_documents(df, batch_size=batch_size)):
+        yield (
+            start,
+            batch,
+            [card_vector_id(doc.metadata) for doc in batch],
+            [document_fingerprint(doc) for doc in batch],
+        )
+
+
+def ingest_cards(df, index, embedder, index_name=PINECONE_INDEX_NAME, batch_size=500, resume=True,
+                 count_tokens=None, show_progress=None, cache_folder=EMBEDDINGS_FOLDER, **pipeline_kwargs):
+    """Embed and upsert every card into `index`, resuming from the checkpoint of an interrupted run.
     
-    # Create document objects
-    documents = create_search_documents(df)
-    total_docs = len(documents)
+    `index` only needs `upsert(vectors=...)` and `embedder` only `embed_documents(texts)`, so local
+    stand-ins can replace Pinecone and OpenAI. Writes the snapshot manifest and returns the IngestStats."""
+    # Only new or changed card text is sent to the embedding model
+    embeddings = CachedEmbeddings(embedder, EMBEDDING_MODEL, DIMENSION, folder=cache_folder)
+    run_key = {'index': index_name, 'batch_size': batch_size, 'cards': card_table_key(), 'rows': len(df)}
+    checkpoint = Checkpoint(checkpoint_path(index_name), run_key)
+    if not resume:
+        checkpoint.clear()
     
     if show_progress:
         show_progress(0)
     
-    # Process in batches to show progress
-    vectorstore = None
-    for i in range(0, total_docs, batch_size):
-        batch = documents[i:i+batch_size]
-        
-        if vectorstore is None:
-            vectorstore = PineconeVectorStore.from_documents(
-                documents=batch,
-                embedding=EMBEDDINGS,
-                index_name=index_name,
-                text_key="content"
-            )
-        else:
-            vectorstore.add_documents(batch)
-        
-        if show_progress:
-            progress = min((i + batch_size) / total_docs, 1.0)
-            show_progress(progress)
+    stats = run_ingest_pipeline(
+        iter_ingest_batches(df, batch_size=batch_size),
+        embeddings,
+        index,
+        count_tokens=count_tokens,
+        checkpoint=checkpoint,
+        show_progress=show_progress,
+        total=len(df),
+        **pipeline_kwargs
+    )
+    
+    # Only a complete build becomes the snapshot later syncs diff against
+    save_manifest(checkpoint.manifest(), index_name=index_name)
+    checkpoint.clear()
+    bump_index_version(index_name)
+    # Keep the card table and the indexes built from it in step with the vectors
+    publish_card_table(df, index_name)
+    return stats
+
+
+def build_vectorstore(df, index_name=PINECONE_INDEX_NAME, batch_size=500, show_progress=None, resume=True, backend=None):
+    """Create or load a vector store (Pinecone or local) from card data."""
+    index = get_index(index_name, backend=backend)
+    
+    ingest_cards(
+        df,
+        index,
+        get_embeddings(),
+        index_name=index_name,
+        batch_size=batch_size,
+        resume=resume,
+        count_tokens=token_counter(EMBEDDING_MODEL),
+        show_progress=show_progress
+    )
+    if isinstance(index, LocalVectorIndex):
+        prepare_local_index(index)
+    return make_vector_store(index)
+
+
+def sync_cards(df, index, embedder, index_name=PINECONE_INDEX_NAME, batch_size=500, count_tokens=None,
+               show_progress=None, cache_folder=EMBEDDINGS_FOLDER, **pipeline_kwargs):
+    """Upsert only new or changed cards into `index` and delete removed ones, relative to the saved manifest.
+    
+    Returns a summary of the changes, or None if there is no manifest to diff against."""
+    manifest = load_manifest(index_name)
+    if manifest is None:
+        return None
+    
+    embeddings = CachedEmbeddings(embedder, EMBEDDING_MODEL, DIMENSION, folder=cache_folder)
+    summary = {'added': 0, 'updated': 0, 'deleted': 0, 'unchanged': 0, 'rebuilt': False}
+    current = {}
+    
+    def delta_batches():
+        # Only the delta is ever held in memory, grouped into full upsert batches
+        pending = []
+        for start, docs, ids, fingerprints in iter_ingest_batches(df, batch_size=batch_size):
+            for doc, vector_id, fingerprint in zip(docs, ids, fingerprints):
+                current[vector_id] = fingerprint
+                previous = manifest.get(vector_id)
+                if previous == fingerprint:
+                    summary['unchanged'] += 1
+                    continue
+                summary['added' if previous is None else 'updated'] += 1
+                pending.append((doc, vector_id, fingerprint))
+            if len(pending) >= batch_size or (pending and start + batch_size >= len(df)):
+                yield (start, *map(list, zip(*pending)))
+                pending = []
+    
+    stats = run_ingest_pipeline(delta_batches(), embeddings, index, count_tokens=count_tokens, **pipeline_kwargs)
+    
+    removed = [vector_id for vector_id in manifest if vector_id not in current]
+    for i in range(0, len(removed), DELETE_BATCH_SIZE):
+        with_backoff(index.delete, ids=removed[i:i + DELETE_BATCH_SIZE])
+    summary['deleted'] = len(removed)
+    summary['ingest'] = stats.summary()
     
     if show_progress:
-        show_progress(1.0)
+        show_progress(1.0, f"Ingest: {stats} | Embeddings: {embeddings.stats()}")
     
-    return vectorstore
+    save_manifest(current, index_name=index_name)
+    if summary['added'] or summary['updated'] or summary['deleted']:
+        bump_index_version(index_name)
+    publish_card_table(df, index_name)
+    return summary
 
 
-def get_vector_store():
-    """Get or create the Pinecone vectorstore for card embeddings."""
-    # Initialize Pinecone
-    pc = initialize_pinecone()
-    index = pc.Index(PINECONE_INDEX_NAME)
+def sync_vector_store(index_name=PINECONE_INDEX_NAME, fetch=False, batch_size=500, show_progress=None):
+    """Incrementally bring the index up to date with the current AtomicCards snapshot.
+    
+    Cards are matched to the last indexed snapshot by oracle ID and side: new or changed cards are upserted,
+    removed cards are deleted and unchanged vectors are left alone. Returns a summary of the changes."""
+    if fetch:
+        # Pull the latest MTGJSON release over the local snapshot
+        fetch_mtgjson_data()
+    
+    card_df = load_card_table()
+    index = get_index(index_name)
+    summary = sync_cards(
+        card_df,
+        index,
+        get_embeddings(),
+        index_name=index_name,
+        batch_size=batch_size,
+        count_tokens=token_counter(EMBEDDING_MODEL),
+        show_progress=show_progress
+    )
+    if summary is None:
+        # Nothing to diff against (e.g. an index built with random IDs); rebuild once to get a manifest
+        reset_vector_store(index_name)
+        build_vectorstore(card_df, index_name=index_name, batch_size=batch_size, show_progress=show_progress)
+        summary = {'added': len(card_df), 'updated': 0, 'deleted': 0, 'unchanged': 0, 'rebuilt': True}
+    elif isinstance(index, LocalVectorIndex):
+        # Drop overwritten/deleted rows and rebuild the IVF lists / codes on the new snapshot
+        index.compact()
+        prepare_local_index(index)
+    return summary
+
+
+def open_vector_store(index_name=PINECONE_INDEX_NAME):
+    """Open the vector store on the configured backend, building the index first if it is empty."""
+    index = get_index(index_name)
     
     # Check if index has vectors
     try:
-        index_stats = index.describe_index_stats()
-        if index_stats['total_vector_count'] > 0:
-            # Index exists and has data, return existing vectorstore
-            return PineconeVectorStore(
-                index=index,
-                embedding=EMBEDDINGS,
-                text_key="content"
-            )
+        index_stats = get_index_stats(index_name)
+        if index_stats['total_vector_count'] > 0 and not checkpoint_path(index_name).exists():
+            # Index exists and has data (and no interrupted build to resume), return existing vectorstore
+            return make_vector_store(index)
     except Exception:
         pass  # Index might not exist yet
     
-    # If index is empty, build it from scratch
-    rules = load_txt_file()
-    card_df = load_json_file()
+    # If index is empty, build it from scratch (or finish an interrupted build)
+    card_df = load_card_table()
     
     # Use Streamlit progress bar for feedback
     progress_text = st.empty()
     progress_text.text("Building vectorstore...")
     progress_bar = st.progress(0)
     
-    def show_progress(val):
-        progress_bar.progress(val)
+    def show_progress(val, text=None):
+        progress_bar.progress(val, text=text)
         
     vectorstore = build_vectorstore(
         card_df, 
-        index_name=PINECONE_INDEX_NAME,
+        index_name=index_name,
         batch_size=500, 
         show_progress=show_progress 
     )
@@ -144,9 +449,35 @@ def get_vector_store():
     return vectorstore
 
 
+def get_vector_store():
+    """Process-wide vector store handle: opened (and warmed up) on first use, then returned as is.
+    
+    Only a change of index version (a rebuild, sync or reset, possibly by another process) reopens it."""
+    global _VECTOR_STORE
+    version = index_version()
+    if _VECTOR_STORE is None or _VECTOR_STORE[0] != version:
+        with _LOCK:
+            if _VECTOR_STORE is not None and _VECTOR_STORE[0] != version:
+                release_index(PINECONE_INDEX_NAME)
+            if _VECTOR_STORE is None:
+                vectorstore = open_vector_store(PINECONE_INDEX_NAME)
+                # A build bumps the version, so record it afterwards
+                _VECTOR_STORE = (index_version(), vectorstore)
+    return _VECTOR_STORE[1]
+
+
 # Alternative function if you want to clear/reset the index
 def reset_vector_store(index_name=PINECONE_INDEX_NAME):
-    """Delete and recreate the Pinecone index."""
+    """Delete and recreate the Pinecone index (or clear the local one)."""
+    # The index no longer matches any previous snapshot or partial build
+    manifest_path(index_name).unlink(missing_ok=True)
+    checkpoint_path(index_name).unlink(missing_ok=True)
+    bump_index_version(index_name)
+    
+    if VECTOR_BACKEND == "local":
+        get_index(index_name).clear()
+        return
+    
     pc = Pinecone(api_key=PINECONE_API_KEY)
     
     # Delete existing index
@@ -163,7 +494,9 @@ def reset_vector_store(index_name=PINECONE_INDEX_NAME):
             region=PINECONE_ENVIRONMENT
         )
     )
-    
+    release_index(index_name)
+
 if __name__ == "__main__":
     #reset_vector_store(index_name=PINECONE_INDEX_NAME)
+    #print(sync_vector_store(index_name=PINECONE_INDEX_NAME, fetch=True))
     get_vector_store()
\ No newline at end of file
@@ -1,16 +1,23 @@
+import os
+import sys
 import asyncio
 from pathlib import Path
-from typing import Dict
 import json
-
-from langchain.agents import AgentExecutor, create_react_agent
-from langchain_openai import OpenAI, ChatOpenAI
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 from dotenv import load_dotenv
 
-from src.search import retrieve_by_name, retrieve_by_text, HEADER
+from shared.llm import get_chat_model, load_prompt_template
+
+from src.search import OUTPUT_FIELDS, CandidatePool, retrieve_by_name, asearch_by_texts
+from src.cache import TTLCache
+from src.context import CONTEXT_FIELDS, build_context, encode_card
+from src.tokens import token_counter
+from src.rerank import RERANK_TOP_N, SEED_FIELDS, FeatureReranker
+from src.router import route_query
+from src.db.embeddings import normalize_query
+from src.db.filters import filters_key
+from src.db.vectorstore import index_version
 load_dotenv() 
 
 SCRIPT_DIR = Path(__file__).parent.resolve()
@@ -19,103 +26,146 @@ PLANNER_PATH = PROMPTS_DIR / "planner.md"
 RANKER_PATH = PROMPTS_DIR / "ranker.md"
 
 MODEL = "gpt-4.1-nano" # "gpt-4.1-mini", "gpt-3.5-turbo"
+RETRIEVAL_K = 50  # hits per sub-query (more if the sidebar asks for more results)
 
-
-
-def load_prompt(filepath):
-    """Loads the content of a Markdown file as plain text."""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return content
-    except FileNotFoundError:
-        print(f"Error: The file '{filepath}' was not found.")
-        return None
-    except Exception as e:
-        print(f"An error occurred while reading the file: {e}")
-        return None
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))  # seconds
+# Level 1: (normalized query, index version) -> planner JSON
+PLANNER_CACHE = TTLCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+# Level 2: (query_type, canonical card name / search text, filters, number of results, index version) -> ranked answer
+RESPONSE_CACHE = TTLCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
 
 
 async def query_planner(user_input: str) -> dict:
-    llm = ChatOpenAI(
-        model=MODEL, 
-        temperature=0.1, 
-    )
-    agent_prompt = PromptTemplate(
-        input_variables=['query'], 
-        template=load_prompt(PLANNER_PATH) 
-    )
+    # Shared pooled, rate limited client; the prompt file is parsed once until it changes
+    llm = get_chat_model(MODEL, temperature=0.1)
+    agent_prompt = load_prompt_template(PLANNER_PATH, ['query'])
     chain = agent_prompt | llm
     output = await chain.ainvoke({'query':user_input})
     return json.loads(output.content)
 
 
+def ranker_chain():
+    llm = get_chat_model(MODEL, temperature=0.1)
+    agent_prompt = load_prompt_template(RANKER_PATH, ['query', 'context'])
+    return agent_prompt | llm
+
+
 async def rank_and_explainer(user_input: str, context: str) -> str:
-    llm = ChatOpenAI(
-        model=MODEL, 
-        temperature=0.1, 
-    )
-    agent_prompt = PromptTemplate(
-        input_variables=['query', 'context'], 
-        template=load_prompt(RANKER_PATH) 
-    )
-    chain = agent_prompt | llm
-    output = await chain.ainvoke({'query':user_input, 'context':context})
+    output = await ranker_chain().ainvoke({'query':user_input, 'context':context})
     return output.content
 
 
-async def pipeline(input_query: str) -> str:
-    """ """
+async def rank_and_explainer_stream(user_input: str, context: str):
+    """Yield the ranker's answer in chunks as the model generates it."""
+    async for chunk in ranker_chain().astream({'query':user_input, 'context':context}):
+        if chunk.content:
+            yield chunk.content
+
+
+async def pipeline_stream(input_query: str, filters: dict = None, k: int = RERANK_TOP_N):
+    """Streaming pipeline: yields (kind, value) events as each stage finishes.
     
-    planner_output = await query_planner(input_query)
+    `k` (the sidebar's Number of Results) is how many reranked candidates go to the LLM ranker, within the
+    context token budget; retrieval fetches at least that many per sub-query.
+    
+    "status" (str) while planning and retrieving, "candidates" (int, cards passed to the ranker), then
+    "token" (str) chunks of the ranked answer as they're generated. Cached answers and messages that
+    end the search early (unknown card, unsupported query, no matches) come whole as one "answer" event."""
+    yield "status", "Understanding your query..."
+    version = index_version()
+    plan_key = (normalize_query(input_query), version)
+    planner_output = PLANNER_CACHE.get(plan_key)
+    if planner_output is None:
+        # Card names, "similar to X" and plain effect phrases are routed locally; the LLM planner only sees the rest
+        planner_output = route_query(input_query) or await query_planner(input_query)
+        PLANNER_CACHE.set(plan_key, planner_output)
     
     target_card_text = None
-    candidates = []
+    seed_card, search_text = None, None
+    # Hits from every sub-query merge here, keyed by (cardName, side) with their scores aggregated
+    candidates = CandidatePool()
     
     if planner_output["query_type"] == "seed_card":
         #print('Seed Card was reached')
         
-        target_card_text = retrieve_by_name(planner_output["card_name"])
-        for t in target_card_text['text'].split('\t'):
-            cards = retrieve_by_text(t)
-            for c in cards:
-                if c not in candidates:
-                    candidates.append(c)
+        seed_card = retrieve_by_name(planner_output["card_name"], output_fields=OUTPUT_FIELDS + SEED_FIELDS)
+        if seed_card is None:
+            yield "answer", (
+                f"We couldn't find a card named `{planner_output['card_name']}`.\nCheck the spelling, or describe the card's text instead."
+            )
+            return
+        # Misspelled and differently worded requests for the same card share one answer
+        response_key = ("seed_card", seed_card['cardName'], filters_key(filters), k, version)
+        if (cached := RESPONSE_CACHE.get(response_key)) is not None:
+            yield "answer", cached
+            return
+        yield "status", f"Searching for cards like {seed_card['cardName']}..."
+        # Every line of the seed card is embedded in one call and searched concurrently
+        lines = [t for t in seed_card['text'].split('\t') if t.strip()]
+        for results in await asearch_by_texts(lines, K=max(RETRIEVAL_K, k), filters=filters):
+            candidates.add(results)
                     
         target_card_text = (
             "\n\nTarget Card Context:\n" 
-            + HEADER 
-            + '|'.join([str(c) for c in target_card_text])
+            + '|'.join(CONTEXT_FIELDS) + '\n'
+            + encode_card(seed_card)
         )
         
     elif planner_output["query_type"] == "text_search":
-        cards = retrieve_by_text(planner_output["search_text"])
-        for c in cards:
-            if c not in candidates:
-                candidates.append(c)
+        response_key = ("text_search", normalize_query(planner_output["search_text"]), filters_key(filters), k, version)
+        if (cached := RESPONSE_CACHE.get(response_key)) is not None:
+            yield "answer", cached
+            return
+        search_text = planner_output["search_text"]
+        yield "status", f"Searching for \"{search_text}\"..."
+        for results in await asearch_by_texts([search_text], K=max(RETRIEVAL_K, k), filters=filters):
+            candidates.add(results)
         
         
     elif planner_output["query_type"] == "unsupported":
-        return ( 
+        yield "answer", ( 
             f"`{input_query}` is unsupported, so we cannot generated meaningful recommendations for you.\nTry searching for a card by its textual description or by a card name you want to find."
         )
+        return
     
     
     else:
-        return ( 
+        yield "answer", ( 
             f"`{input_query}` an unknown error occured, please try again so we can generate meaningful recommendations.\nTry searching for a card by its textual description or by a card name you want to find."
         )
+        return
     
-    if candidates:
-        if target_card_text:
-            input_query += target_card_text
-        context = '\n'.join(['|'.join([str(c) for c in candidate]) for candidate in candidates])
-        context = HEADER + context
-        ranker_output = await rank_and_explainer(
-            user_input=input_query, 
-            context=context
+    # Local feature rerank of the whole pool (the seed card itself left out); only its top-N reach the LLM
+    reranked = FeatureReranker(top_n=k).rerank(candidates.ranked(), seed=seed_card, query=search_text)
+    if not reranked:
+        yield "answer", (
+            f"No cards matched `{input_query}` with the current filters.\nTry loosening the sidebar filters."
         )
-        return ranker_output
+        return
+    if target_card_text:
+        input_query += target_card_text
+    # Combined rerank score as the ranker's baseline_score, compactly encoded and cut off at the token budget
+    context, included = build_context(reranked, token_counter(MODEL))
+    yield "candidates", included
+    chunks = []
+    async for chunk in rank_and_explainer_stream(user_input=input_query, context=context):
+        chunks.append(chunk)
+        yield "token", chunk
+    # Only complete answers are cached; an abandoned stream never gets here
+    RESPONSE_CACHE.set(response_key, ''.join(chunks))
+
+
+async def pipeline(input_query: str, filters: dict = None, k: int = RERANK_TOP_N) -> str:
+    """Plan, retrieve (restricted to the sidebar `filters`) and rank up to `k` cards for a query.
+    
+    Planner output and ranked answers are cached; keys carry the index version, so a rebuild or sync
+    with changes invalidates both. pipeline_stream yields the same answer incrementally."""
+    chunks = []
+    async for kind, value in pipeline_stream(input_query, filters=filters, k=k):
+        if kind in ("token", "answer"):
+            chunks.append(value)
+    return ''.join(chunks)
 
 
 if __name__ == "__main__":
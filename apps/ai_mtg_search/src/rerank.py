@@ -0,0 +1,136 @@
+import os
+
+import numpy as np
+
+from src.db.lexical import tokenize
+
+# Feature weights; override with e.g. RERANK_WEIGHTS="retrieval=1,keywords=2,type=0.5,color=0.5,mana=0"
+DEFAULT_WEIGHTS = {'retrieval': 1.0, 'keywords': 1.0, 'type': 0.5, 'color': 0.5, 'mana': 0.3}
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "30"))  # candidates passed on to the LLM ranker
+KEYWORD_WEIGHT = 2.0  # a shared keyword ability (Flying, Landfall) counts as much as two shared text terms
+MANA_SCALE = 2.0  # mana value difference at which the mana feature drops to 1/e
+COLOR_BITS = {color: 1 << bit for bit, color in enumerate('WUBRG')}
+SEED_FIELDS = ['keywords', 'types', 'subtypes']  # fields beyond OUTPUT_FIELDS the seed card needs for reranking
+
+
+def parse_weights(text):
+    """"retrieval=1,keywords=2" -> DEFAULT_WEIGHTS with those entries replaced."""
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in filter(None, (part.strip() for part in (text or '').split(','))):
+        name, _, value = item.partition('=')
+        if name.strip() not in weights:
+            raise ValueError(f"Unknown rerank feature '{name.strip()}', use one of {', '.join(weights)}")
+        weights[name.strip()] = float(value)
+    return weights
+
+
+RERANK_WEIGHTS = parse_weights(os.getenv("RERANK_WEIGHTS"))
+
+
+def _split(value):
+    """Comma-joined array metadata ("Creature,Artifact") -> list; empty/missing -> []."""
+    return [part for part in str(value).split(',') if part] if value else []
+
+
+def _color_mask(identity):
+    mask = 0
+    for color in _split(identity):
+        mask |= COLOR_BITS.get(color, 0)
+    return mask
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _overlap(term_lists, seed_weights):
+    """Weighted share of the seed's terms each candidate has: (term membership matrix) @ weights / total."""
+    vocabulary = {term: column for column, term in enumerate(seed_weights)}
+    if not vocabulary:
+        return np.zeros(len(term_lists))
+    rows, columns = [], []
+    for row, terms in enumerate(term_lists):
+        hits = {vocabulary[term] for term in terms if term in vocabulary}
+        rows.extend([row] * len(hits))
+        columns.extend(hits)
+    membership = np.zeros((len(term_lists), len(vocabulary)), dtype=np.float32)
+    membership[rows, columns] = 1.0
+    weights = np.fromiter(seed_weights.values(), dtype=np.float32, count=len(seed_weights))
+    return membership @ weights / weights.sum()
+
+
+def _text_terms(metadata):
+    """(rules text tokens, keyword abilities) of a card."""
+    return tokenize(str(metadata.get('text') or '')), [keyword.lower() for keyword in _split(metadata.get('keywords'))]
+
+
+def _type_terms(metadata):
+    return tokenize(' '.join(_split(metadata.get('types')) + _split(metadata.get('subtypes'))))
+
+
+class FeatureReranker:
+    """Reranks a candidate pool on cheap card features, computed for the whole pool at once with NumPy.
+
+    Features, each in [0, 1]: the min-max scaled retrieval score, shared mechanics (rules text terms and
+    keyword abilities) with the seed card or query, shared types/subtypes, color identity fit (share of the
+    candidate's colors inside the seed's identity) and closeness in mana value. Without a seed card only
+    retrieval, mechanics and type terms of the query vary; the rest are constant and don't change the order."""
+
+    FEATURES = ['retrieval', 'keywords', 'type', 'color', 'mana']
+
+    def __init__(self, weights=None, top_n=RERANK_TOP_N):
+        self.weights = dict(RERANK_WEIGHTS if weights is None else weights)
+        self.top_n = top_n
+
+    def features(self, candidates, seed=None, query=None):
+        """(n candidates x len(FEATURES)) feature matrix for [(metadata, score)] candidates."""
+        n = len(candidates)
+        cards = [metadata for metadata, _ in candidates]
+        features = np.zeros((n, len(self.FEATURES)), dtype=np.float32)
+        if not n:
+            return features
+
+        scores = np.array([score for _, score in candidates], dtype=np.float32)
+        spread = scores.max() - scores.min()
+        features[:, 0] = (scores - scores.min()) / spread if spread > 0 else 1.0
+
+        # Seed terms: the seed card's text, keywords and type line, or just the query's words
+        if seed is not None:
+            seed_text, seed_keywords = _text_terms(seed)
+            seed_types = _type_terms(seed)
+        else:
+            seed_text, seed_keywords = tokenize(query or ''), []
+            seed_types = seed_text
+        mechanic_weights = {term: 1.0 for term in seed_text}
+        mechanic_weights.update({keyword: KEYWORD_WEIGHT for keyword in seed_keywords})
+        card_terms = [_text_terms(card) for card in cards]
+        features[:, 1] = _overlap([text + keywords for text, keywords in card_terms], mechanic_weights)
+        features[:, 2] = _overlap([_type_terms(card) for card in cards], dict.fromkeys(seed_types, 1.0))
+
+        if seed is not None:
+            masks = np.array([_color_mask(card.get('colorIdentity')) for card in cards], dtype=np.uint8)
+            inside = np.unpackbits((masks & _color_mask(seed.get('colorIdentity')))[:, None], axis=1).sum(axis=1)
+            total = np.unpackbits(masks[:, None], axis=1).sum(axis=1)
+            # Colorless cards fit any deck
+            features[:, 3] = np.where(total > 0, inside / np.maximum(total, 1), 1.0)
+
+            mana_values = np.array([_number(card.get('manaValue')) for card in cards], dtype=np.float32)
+            seed_mana = _number(seed.get('manaValue'))
+            if not np.isnan(seed_mana):
+                features[:, 4] = np.nan_to_num(np.exp(-np.abs(mana_values - seed_mana) / MANA_SCALE))
+        return features
+
+    def rerank(self, candidates, seed=None, query=None, top_n=None):
+        """[(metadata, combined score)] for the best `top_n` candidates, best first. The seed card itself is left out."""
+        if seed is not None:
+            candidates = [(metadata, score) for metadata, score in candidates if metadata.get('cardName') != seed.get('cardName')]
+        if not candidates:
+            return []
+        weights = np.array([self.weights.get(name, 0.0) for name in self.FEATURES], dtype=np.float32)
+        combined = self.features(candidates, seed=seed, query=query) @ weights
+        # Stable sort, so ties keep the retrieval order
+        order = np.argsort(-combined, kind='stable')[:top_n or self.top_n]
+        return [(candidates[i][0], float(combined[i])) for i in order]
@@ -0,0 +1,141 @@
+import os
+import re
+
+from src.db.utils import CardTableCache, to_object_columns
+from src.db.lexical import fold, tokenize
+from src.db.names import get_name_index
+
+# Set QUERY_ROUTER=false to send every query to the LLM planner
+QUERY_ROUTER = os.getenv("QUERY_ROUTER", "true").lower() == "true"
+MAX_NAME_WORDS = 8  # longest span tried as a card name
+NEAR_EXACT_SCORE = 92  # fuzzy QRatio accepted for a bare (misspelled) card name
+ROUTER_BATCH_SIZE = 5000
+
+# Mechanic and effect words that on their own mark a plain effect description
+EFFECT_TERMS = frozenset(tokenize(
+    "draw discard exile counterspell token sacrifice graveyard tutor ramp mana removal burn lifegain untap "
+    "proliferate blink flicker recursion reanimate upkeep tribal synergy payoff dork evasion aggro spellslinger "
+    "aristocrats voltron stax flying trample deathtouch lifelink haste vigilance menace hexproof indestructible "
+    "shroud ward flashback prowess cascade convoke cycling kicker landfall equip"
+))
+# Everyday words that only describe an effect next to another effect word, color, card type or subtype
+# ("gain life", "protection from red", "zombies that die"); on their own ("meaning of life") the planner decides
+SUPPORT_TERMS = frozenset(tokenize(
+    "destroy counter create return search library hand land add damage board wipe life gain drain mill copy tap "
+    "double bounce fog prevent phase steal control tax cost spell enter enters attack attacks block die dies "
+    "combat target opponent player theme engine fixing rock hate win protection flash strike"
+))
+COLOR_TERMS = frozenset("white blue black red green colorless multicolor".split())
+# Price, rules and deck building requests (and anything else off the beaten path) go to the LLM planner
+DEFER_PATTERN = re.compile(
+    r"\$|\bprices?\b|\bbuy\b|\brules?\b|\bruling|\bhow (?:do|does|can|would)\b|\bwhy\b|\bbuild\b|\bdeck ?lists?\b|\bshould i\b",
+    re.IGNORECASE,
+)
+SIMILAR_PATTERN = re.compile(
+    r"\b(?:similar(?:\s+\w+)?\s+to|like|alternatives?\s+(?:to|for)|replacements?\s+(?:to|for)|instead\s+of|comparable\s+to)\s+(.+)$",
+    re.IGNORECASE,
+)
+# Leading filler stripped from effect descriptions ("Find me the best ...", "What cards that ...")
+FILLER_PATTERN = re.compile(
+    r"^(?:please\s+)?(?:(?:find|show|give|get|list)(?:\s+me)?|what(?:\s+are|\s+is)?|which(?:\s+are)?|i\s+(?:want|need)|looking\s+for)?\s*"
+    r"(?:(?:the|some|any|all|good|great|best|most|strongest|top|efficient)\s+)*"
+    r"(?:(?:cards?|spells?|ones?|effects?)\s+(?:that|which|to|with)\s+)?",
+    re.IGNORECASE,
+)
+_QUOTES = str.maketrans({'’': "'", '‘': "'", '“': '"', '”': '"'})
+
+
+def plan(query_type, card_name=None, search_text=None, reason=None):
+    """A query plan in the planner.md JSON schema."""
+    return {'query_type': query_type, 'card_name': card_name, 'search_text': search_text, 'reason': reason}
+
+
+class QueryRouter:
+    """Deterministic fast path in front of the LLM query planner.
+
+    Routes, in order: requests that need judgement (prices, rules, deck building) go to the planner;
+    "similar to X" / "like X" / "alternatives to X" with X a card name and bare card names (exact,
+    accent/case-folded, "Chatterfang" style short names or near-exact typos) become seed_card plans;
+    text with a mechanic or effect word becomes a text_search plan. Card types and subtypes ("dog",
+    "town") never route a query by themselves. Anything else returns None, meaning the planner decides."""
+
+    def __init__(self, name_index, card_terms=frozenset()):
+        self.names = name_index
+        self.card_terms = card_terms
+
+    @classmethod
+    def from_card_table(cls, df, name_index):
+        """Router that also accepts the card table's types and subtypes as companions of a support term."""
+        terms = set()
+        for start in range(0, len(df), ROUTER_BATCH_SIZE):
+            columns = to_object_columns(df.iloc[start:start + ROUTER_BATCH_SIZE], fields=['types', 'subtypes'])
+            for values in columns.values():
+                terms.update(value for value in values if value)
+        return cls(name_index, frozenset(tokenize(' '.join(terms).replace(',', ' '))))
+
+    def describes_effect(self, terms):
+        """Whether query tokens `terms` describe a card effect: a mechanic or effect word, or a support
+        word next to another support word, color, card type or subtype."""
+        if terms & EFFECT_TERMS:
+            return True
+        support = terms & SUPPORT_TERMS
+        return bool(support) and len(terms & (SUPPORT_TERMS | COLOR_TERMS | self.card_terms)) > 1
+
+    def card_name(self, text, fuzzy=False):
+        """The card name `text` refers to, or None. Only exact, folded and "Name, Title" prefix matches
+        count, plus close typos when `fuzzy` is set."""
+        matches = self.names.resolve(text, limit=1, fuzzy=fuzzy)
+        if not matches:
+            return None
+        _, score, matched, how = matches[0]
+        if how in ('exact', 'normalized'):
+            return text
+        if how == 'prefix' and matched[len(fold(text).strip()):].startswith(','):
+            return text
+        if how == 'fuzzy' and score >= NEAR_EXACT_SCORE:
+            return text
+        return None
+
+    def route(self, query):
+        """Planner-schema plan for `query`, or None if the LLM planner should decide."""
+        text = query.translate(_QUOTES).strip().rstrip('?!. ')
+        if not text or DEFER_PATTERN.search(text):
+            return None
+
+        similar = SIMILAR_PATTERN.search(text)
+        if similar:
+            # Longest leading span that is a card name: "Smothering Tithe in black" -> "Smothering Tithe"
+            words = similar.group(1).split()
+            for length in range(min(len(words), MAX_NAME_WORDS), 0, -1):
+                span = ' '.join(words[:length]).strip(' ,;:')
+                if span and self.card_name(span):
+                    return plan('seed_card', card_name=span, reason="router: similar-to pattern")
+
+        effect = self.describes_effect(set(tokenize(text)))
+        if len(text.split()) <= MAX_NAME_WORDS and self.card_name(text, fuzzy=not effect):
+            return plan('seed_card', card_name=text, reason="router: card name")
+
+        if effect:
+            search_text = FILLER_PATTERN.sub('', text).strip() or text
+            return plan('text_search', search_text=search_text, reason="router: effect description")
+        return None
+
+
+_ROUTER = CardTableCache(lambda df: QueryRouter.from_card_table(df, get_name_index(df)))
+
+
+def get_router(df=None):
+    """Lazily build the router from the shared card table and its name index (rebuilt when the table changes)."""
+    return _ROUTER.get(df)
+
+
+def route_query(query):
+    """Fast-path plan for `query`, or None when it needs the LLM planner (or the router is switched off)."""
+    if not QUERY_ROUTER:
+        return None
+    return get_router().route(query)
+
+
+if __name__ == "__main__":
+    for query in ["Chatterfang", "Cards similar to Rhystic Study", "make squirrel tokens", "What commander should I build?"]:
+        print(query, '->', route_query(query))
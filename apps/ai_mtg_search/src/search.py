@@ -2,18 +2,46 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from rapidfuzz import fuzz, process
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from rapidfuzz import fuzz
 
 # can delete this after development
 from dotenv import load_dotenv
 load_dotenv()
 
-from src.db.vectorstore import get_vector_store
+from src.db.vectorstore import get_query_embeddings, get_vector_store, filter_search_kwargs
+from src.db.filters import compile_filters, get_filter_index
+from src.db.card_lexical import get_card_lexical_index
+from src.db.names import get_name_index
+from src.router import get_router
 
 OUTPUT_FIELDS = ['cardName', 'faceName', 'type', 'manaCost', 'manaValue', 'colorIdentity', 'text', 'power', 'toughness', 'side', 'layout', 'legalities.commander']
 HEADER = '|'.join(OUTPUT_FIELDS) + '\n'
 
-vectordb = get_vector_store()
+# "dense" (vector similarity only) or "hybrid" (BM25 + dense, fused with reciprocal rank fusion)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+RRF_K = 60  # rank offset in 1 / (RRF_K + rank); dampens the weight of top ranks
+HYBRID_CANDIDATES = 50  # results taken from each retriever before fusion
+# How hits for the same card from several sub-queries combine in a CandidatePool: "max", "sum" or "rrf"
+CANDIDATE_AGGREGATION = os.getenv("CANDIDATE_AGGREGATION", "rrf")
+
+RETRIEVAL_WORKERS = 16  # vector queries are network-bound, so batches fan out across threads
+
+# Lexical search runs here while the calling thread waits on the dense query, as do batched queries
+_EXECUTOR = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+
+
+def warm_up():
+    """Open the vector store and load the in-memory indexes once, so the first query doesn't pay for it.
+    
+    Nothing here runs at import time; without a warm-up everything still loads lazily on first use."""
+    get_query_embeddings()
+    get_vector_store()
+    # The card table backed indexes load independently, so build them side by side (the router loads the name index)
+    for future in [_EXECUTOR.submit(load) for load in (get_card_lexical_index, get_router, get_filter_index)]:
+        future.result()
 
 def normalize(metadata, fields=OUTPUT_FIELDS, just_values=False):
     output = {}
@@ -24,56 +52,185 @@ def normalize(metadata, fields=OUTPUT_FIELDS, just_values=False):
     return [v for v in output.values()] if just_values else output
 
 
+class CandidatePool:
+    """Scored candidate cards merged from several ranked hit lists, one entry per (cardName, side).
+    
+    `aggregate` sets how repeat hits combine: "max" keeps the best score, "sum" adds scores and "rrf"
+    adds 1 / (k + rank), which ignores raw score scales. Adding a list is linear in its length."""
+
+    def __init__(self, aggregate=CANDIDATE_AGGREGATION, k=RRF_K):
+        if aggregate not in ("max", "sum", "rrf"):
+            raise ValueError(f"Unknown candidate aggregation '{aggregate}', use 'max', 'sum' or 'rrf'")
+        self.aggregate = aggregate
+        self.k = k
+        self.scores = {}  # (cardName, side) -> aggregated score
+        self.metadata = {}  # (cardName, side) -> metadata of the first hit
+
+    def __len__(self):
+        return len(self.scores)
+
+    def add(self, results):
+        """Merge one ranked [(metadata, score)] list, best first."""
+        for rank, (metadata, score) in enumerate(results, start=1):
+            key = (metadata.get('cardName'), metadata.get('side'))
+            value = 1.0 / (self.k + rank) if self.aggregate == "rrf" else float(score)
+            if key not in self.scores:
+                self.scores[key] = value
+                self.metadata[key] = metadata
+            elif self.aggregate == "max":
+                self.scores[key] = max(self.scores[key], value)
+            else:
+                self.scores[key] += value
+        return self
+
+    def ranked(self, limit=None):
+        """[(metadata, score)] best first (ties keep first-seen order)."""
+        keys = sorted(self.scores, key=lambda key: -self.scores[key])[:limit]
+        return [(self.metadata[key], self.scores[key]) for key in keys]
+
+    def rows(self, output_fields=OUTPUT_FIELDS, limit=None):
+        """Ranked (normalized field values, score) rows for the ranker context."""
+        return [(normalize(metadata, fields=output_fields, just_values=True), score) for metadata, score in self.ranked(limit)]
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Fuse ranked [(metadata, score)] lists into one [(metadata, rrf score)] list, best first.
+    
+    Each card face scores sum(1 / (k + rank)) over the lists it appears in, so raw score scales never mix."""
+    pool = CandidatePool("rrf", k=k)
+    for ranking in rankings:
+        pool.add(ranking)
+    return pool.ranked()
+
+
+def dense_search(query, k, card_filter=None, embedding=None):
+    """Vector similarity search: [(metadata, score)], restricted to `card_filter` (a compiled CardFilter) if given.
+    
+    Pass the query's `embedding` if it is already computed; otherwise it comes from the query embedding cache."""
+    if card_filter is not None and not len(card_filter):
+        return []
+    if embedding is None:
+        embedding = get_query_embeddings().embed_query(query)
+    vectordb = get_vector_store()
+    kwargs = filter_search_kwargs(vectordb, card_filter)
+    results = vectordb.similarity_search_by_vector_with_score(embedding, k=k, **kwargs)
+    return [(doc.metadata, score) for doc, score in results]
+
+
+def lexical_search(query, k, card_filter=None):
+    """BM25 search over card name, type line and text: [(metadata, score)]."""
+    if card_filter is None:
+        return get_card_lexical_index().search(query, k=k)
+    # BM25 over the table the filter mask was built for
+    return get_card_lexical_index(card_filter.table).search(query, k=k, mask=card_filter.mask)
+
+
+def hybrid_search(query, k, candidates=HYBRID_CANDIDATES, card_filter=None):
+    """Run lexical and dense retrieval concurrently and fuse them with reciprocal rank fusion."""
+    lexical = _EXECUTOR.submit(lexical_search, query, max(k, candidates), card_filter)
+    dense = dense_search(query, max(k, candidates), card_filter)
+    return reciprocal_rank_fusion([dense, lexical.result()])[:k]
+
+
 def retrieve_by_text(
     user_input: str, 
     K: int = 50, 
     output_fields: list = OUTPUT_FIELDS, 
+    mode: str = RETRIEVAL_MODE,
+    filters: dict = None,
     ) -> str:
     
-    results = vectordb.similarity_search_with_score(
-        query=user_input, 
-        k=K, 
-    )
+    # Sidebar selections become a row mask / Pinecone filter applied inside the search
+    card_filter = compile_filters(filters)
+    if mode == "hybrid":
+        results = hybrid_search(user_input, K, card_filter=card_filter)
+    else:
+        results = dense_search(user_input, K, card_filter=card_filter)
     
     # normalize results
-    normalized_results = [normalize(result[0].metadata, fields=output_fields, just_values=True) for result in results]
+    normalized_results = [normalize(metadata, fields=output_fields, just_values=True) for metadata, _ in results]
     
     # filter for results & merge metadata 
     return normalized_results # '\n'.join(['|'.join([str(r) for r in result]) for result in normalized_results])
 
 
+def search_by_texts(queries, K=50, mode=RETRIEVAL_MODE, filters=None):
+    """Scored hits for several queries at once: one [(metadata, score)] list per query, in order.
+    
+    Queries missing from the query embedding cache are embedded in a single call, then every vector (and
+    BM25) query runs concurrently, so the batch takes about as long as its slowest query."""
+    queries = list(queries)
+    if not queries:
+        return []
+    card_filter = compile_filters(filters)
+    embeddings = get_query_embeddings().embed_queries(queries)
+    # Dense and lexical searches are submitted side by side (not nested) so workers never wait on each other
+    k = max(K, HYBRID_CANDIDATES) if mode == "hybrid" else K
+    dense = [_EXECUTOR.submit(dense_search, query, k, card_filter, embedding) for query, embedding in zip(queries, embeddings)]
+    if mode == "hybrid":
+        lexical = [_EXECUTOR.submit(lexical_search, query, k, card_filter) for query in queries]
+        return [reciprocal_rank_fusion([d.result(), l.result()])[:K] for d, l in zip(dense, lexical)]
+    return [d.result() for d in dense]
+
+
+async def asearch_by_texts(queries, **kwargs):
+    """search_by_texts off the event loop, for use inside async pipelines."""
+    return await asyncio.to_thread(search_by_texts, queries, **kwargs)
+
+
+def retrieve_by_texts(
+    queries: list, 
+    K: int = 50, 
+    output_fields: list = OUTPUT_FIELDS, 
+    mode: str = RETRIEVAL_MODE,
+    filters: dict = None,
+    ) -> list:
+    """retrieve_by_text for several queries at once (see search_by_texts): one result list per query, in order."""
+    return [
+        [normalize(metadata, fields=output_fields, just_values=True) for metadata, _ in results]
+        for results in search_by_texts(queries, K=K, mode=mode, filters=filters)
+    ]
+
+
+async def aretrieve_by_texts(queries: list, **kwargs) -> list:
+    """retrieve_by_texts off the event loop, for use inside async pipelines."""
+    return await asyncio.to_thread(retrieve_by_texts, queries, **kwargs)
+
+
+def resolve_card_name(card_name, k=3):
+    """Ranked [(metadata, score, how)] candidates for a card name from the local name index (no network call)."""
+    index = get_name_index()
+    return [(index.metadata(row), score, how) for row, score, _, how in index.resolve(card_name, limit=k)]
+
+
 def retrieve_by_name(
         card_name, 
         output_fields: list = OUTPUT_FIELDS,
         k=3,
         rerank=False
     ):
+    """Best match for a card name (exact, accent-folded, prefix or fuzzy), or None if nothing is close.
     
-    results = vectordb.similarity_search_with_score(
-        query=card_name,  # Empty string, since we're not doing semantic search
-        k=k,
-    )
-    
-    # normalize results
-    normalized_results = [normalize(result[0].metadata, fields=output_fields) for result in results]
-    scores = [result[-1] for result in results]
+    With `rerank`, the top `k` name index candidates are re-scored on face and full name similarity,
+    preferring Commander-legal cards."""
+    candidates = resolve_card_name(card_name, k=k)
+    if not candidates:
+        return None
     
     card_name_lower = card_name.lower()
 
-    def hybrid_score(card):
-        # exact match boost
-        exact_match = 10 if card_name_lower in card['name'].lower() else 0
+    def hybrid_score(candidate):
+        card = candidate[0]
         # fuzz ratio on full combined name
-        name_score = fuzz.ratio(card_name_lower, card['name'].lower())
+        name_score = fuzz.ratio(card_name_lower, card.get('name', '').lower())
         # fuzz ratio on face name (exact face)
-        face_name_score = fuzz.ratio(card_name_lower, card['faceName'].lower())
-        # Weighted average or max - you can tweak weights here
-        legality_score = 10 if card['legalities.commander'] == 'Legal' else 0 
+        face_name_score = fuzz.ratio(card_name_lower, card.get('faceName', '').lower())
+        legality_score = 10 if card.get('legalities.commander') == 'Legal' else 0 
         return (face_name_score * 0.4) + (name_score * 0.2) + legality_score
 
     # hybrid name score based on best match
-    best_match = max((normalized_results), key=hybrid_score) if rerank else normalized_results[0]
-    return best_match # '|'.join([v for v in best_match.values()]) 
+    best_match = max(candidates, key=hybrid_score) if rerank else candidates[0]
+    return normalize(best_match[0], fields=output_fields)
 
 
 
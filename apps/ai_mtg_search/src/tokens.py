@@ -0,0 +1,44 @@
+import threading
+
+import tiktoken
+
+DEFAULT_ENCODING = "o200k_base"  # for models tiktoken doesn't know yet
+CHARS_PER_TOKEN = 4  # rough average for English text, used when no encoding can be loaded
+
+_ENCODINGS = {}
+_ENCODINGS_LOCK = threading.Lock()
+
+
+def estimate_tokens(text):
+    """Length-based token estimate (about CHARS_PER_TOKEN characters a token)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def get_encoding(model):
+    """The tiktoken encoding of `model`, loaded once per process, or None if it can't be loaded.
+
+    tiktoken downloads an encoding's BPE file on first use, so without network access (or a
+    TIKTOKEN_CACHE_DIR holding it) there is none; that is only tried once per process."""
+    with _ENCODINGS_LOCK:
+        if model not in _ENCODINGS:
+            try:
+                try:
+                    encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+            except Exception:
+                encoding = None
+            _ENCODINGS[model] = encoding
+        return _ENCODINGS[model]
+
+
+def token_counter(model):
+    """Return a function counting `model` tokens in one text (ranker context rows, embedded card texts).
+
+    The encoding is only loaded on the first count; if it can't be, counts fall back to estimate_tokens."""
+    def count(text):
+        encoding = get_encoding(model)
+        if encoding is None:
+            return estimate_tokens(text)
+        return len(encoding.encode(text, disallowed_special=()))
+    return count
@@ -1,6 +1,8 @@
 import streamlit as st
 from src.constants import METADATA_FIELDS
 from src.ui.config import TYPES, SUBTYPES, SUPERTYPES, COLORIDENTITY_DICT, LAYOUT
+from src.db.filters import parse_range
+from src.rerank import RERANK_TOP_N
 
 
 
@@ -22,18 +24,20 @@ def validate_openai_api_key(api_key):
 
 
 def init_sidebar():
-    """Render sidebar UI for filters and search settings. Returns number of results and Chroma filter dict."""
+    """Render sidebar UI for filters and search settings. Returns the filter selections ({field: value}) for retrieval;
+    the number of results is kept in st.session_state['k']."""
     # --- Sidebar filters (after DB is loaded) ---
     with st.sidebar:
-        st.header("Filters & Search Settings [WIP - not functioning]")
+        st.header("Filters & Search Settings")
         
         # Number of results at the top
         st.session_state['k'] = st.number_input(
             "Number of Results", 
             min_value=1, 
             max_value=500, 
-            value=30, 
-            step=1
+            value=RERANK_TOP_N, 
+            step=1,
+            help="Candidate cards passed to the ranker (as many as fit its context token budget)"
         )
         st.markdown("---")  # Divider
         
@@ -50,7 +54,8 @@ def init_sidebar():
         # Mana and Color filters
         st.subheader("Mana & Colors")
         filter_values['manaValue'] = st.text_input(METADATA_FIELDS['manaValue']['display_name'], "")
-        filter_values['colorIdentity'] = st.multiselect(METADATA_FIELDS['colorIdentity']['display_name'], list(COLORIDENTITY_DICT.keys()), accept_new_options=False)
+        colors = st.multiselect(METADATA_FIELDS['colorIdentity']['display_name'], list(COLORIDENTITY_DICT.keys()), accept_new_options=False)
+        filter_values['colorIdentity'] = [COLORIDENTITY_DICT[color] for color in colors]
         filter_values['layout'] = st.multiselect(METADATA_FIELDS['layout']['display_name'], LAYOUT, accept_new_options=False)
         st.markdown("---")
         
@@ -66,5 +71,12 @@ def init_sidebar():
             ["Any", True, False],
             index=0
         )
+        
+        if filter_values['manaValue']:
+            try:
+                parse_range(filter_values['manaValue'])
+            except ValueError as e:
+                st.warning(str(e))
+                filter_values['manaValue'] = ""
     
-    return filter
\ No newline at end of file
+    return filter_values
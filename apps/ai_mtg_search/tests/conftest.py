@@ -0,0 +1,38 @@
+import json
+import hashlib
+
+import pytest
+
+from src.db import card_lexical, utils
+
+
+def card(name, subtype, text):
+    return [{
+        'name': name, 'type': f'Creature — {subtype}', 'types': ['Creature'], 'subtypes': [subtype],
+        'supertypes': [], 'colorIdentity': ['U'], 'manaCost': '{1}{U}', 'manaValue': 2.0, 'layout': 'normal',
+        'text': text, 'legalities': {'commander': 'Legal'},
+        'identifiers': {'scryfallOracleId': hashlib.md5(name.encode()).hexdigest()},
+    }]
+
+
+def write_cards(path, names, subtypes=('Merfolk', 'Elf')):
+    data = {}
+    for i, name in enumerate(names):
+        data[name] = card(name, subtypes[i % len(subtypes)], "Counter target spell." if i % 3 else "Draw a card.")
+    path.write_text(json.dumps({'meta': {'version': 'test'}, 'data': data}))
+
+
+@pytest.fixture
+def card_file(tmp_path, monkeypatch):
+    """Writes a generated AtomicCards.json: `card_file(names, subtypes=...)`. All card data files live under tmp_path."""
+    monkeypatch.setattr(utils, 'DATA_FOLDER', tmp_path)
+    monkeypatch.setattr(utils, 'JSON_PATH', tmp_path / 'AtomicCards.json')
+    monkeypatch.setattr(utils, 'CACHE_FOLDER', tmp_path / 'cache')
+    monkeypatch.setattr(card_lexical, 'CACHE_FOLDER', tmp_path / 'cache')
+    monkeypatch.setattr(utils, '_CARD_TABLE', None)
+
+    def write(names, **kwargs):
+        write_cards(utils.JSON_PATH, names, **kwargs)
+        return utils.JSON_PATH
+
+    return write
@@ -0,0 +1,15 @@
+from src.db import card_lexical, utils
+
+
+def test_saved_index_is_not_reused_for_other_rows_of_the_same_length(card_file):
+    card_file([f"Test Card {i}" for i in range(20)])
+    df = utils.load_card_table()
+    assert len(card_lexical.load_card_lexical_index(df)) == 20
+
+    changed = df.copy()
+    changed.loc[changed.index[4], 'text'] = "Exile target zebra."
+    index = card_lexical.load_card_lexical_index(changed)
+    assert [metadata['cardName'] for metadata, _ in index.search("zebra", k=3)] == ["Test Card 4"]
+    # Both snapshots are saved under their own content key; only the latest is kept
+    assert len(list(utils.CACHE_FOLDER.glob(f"{card_lexical.CARD_LEXICAL_PREFIX}*.npz"))) == 1
+    assert card_lexical.load_card_lexical_index(df).search("zebra", k=3) == []
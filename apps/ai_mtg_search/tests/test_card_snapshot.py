@@ -0,0 +1,97 @@
+"""The card table and every in-memory index built from it follow the vector index through syncs.
+
+Runs offline on a small generated AtomicCards.json with the local vector backend and a hashing
+embedder. From `apps/ai_mtg_search`:
+
+    OPENAI_API_KEY=sk-local python -m pytest -q tests
+"""
+import hashlib
+
+import numpy as np
+import pytest
+
+from src.db import card_lexical, local_index, utils, vectorstore
+from src import search
+from src.db.filters import get_filter_index
+from src.db.names import get_name_index
+from src.router import get_router
+
+
+class HashEmbedder:
+    """Deterministic stand-in for the OpenAI embedding model."""
+
+    def _embed(self, text):
+        seed = int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).standard_normal(vectorstore.DIMENSION).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+@pytest.fixture
+def snapshot(card_file, tmp_path, monkeypatch):
+    """A local index built from 60 generated cards, with all data files under tmp_path."""
+    monkeypatch.setattr(vectorstore, 'DATA_FOLDER', tmp_path)
+    monkeypatch.setattr(vectorstore, 'VECTOR_BACKEND', 'local')
+    monkeypatch.setattr(vectorstore, 'QUERY_CACHE_PERSIST', False)
+    monkeypatch.setattr(vectorstore, '_EMBEDDINGS', HashEmbedder())
+    monkeypatch.setattr(vectorstore, '_QUERY_EMBEDDINGS', None)
+    monkeypatch.setattr(vectorstore, '_INDEXES', {})
+    monkeypatch.setattr(vectorstore, '_INDEX_STATS', {})
+    monkeypatch.setattr(vectorstore, '_VECTOR_STORE', None)
+
+    class TmpIndex(local_index.LocalVectorIndex):
+        # Reopened after every version bump, so it has to find its files again
+        def __init__(self, name, folder=tmp_path / 'index', **kwargs):
+            super().__init__(name, folder=folder, **kwargs)
+
+    monkeypatch.setattr(vectorstore, 'LocalVectorIndex', TmpIndex)
+
+    names = [f"Test Card {i}" for i in range(60)]
+    card_file(names)
+    index = vectorstore.get_index()
+    vectorstore.ingest_cards(utils.load_card_table(), index, HashEmbedder(), cache_folder=tmp_path / 'embeddings')
+    return names, index
+
+
+def retrieve_elves(mode):
+    return search.retrieve_by_text(
+        "counter target spell", K=20, mode=mode, filters={'subtypes': ['Elf']},
+        output_fields=['cardName', 'subtypes'],
+    )
+
+
+@pytest.mark.parametrize('mode', ['dense', 'hybrid'])
+def test_filtered_search_after_sync(snapshot, card_file, tmp_path, mode):
+    names, index = snapshot
+    assert len(retrieve_elves(mode)) == 20
+
+    # Remove three cards (two of them Elves) and sync the index against the new snapshot
+    removed = {names[1], names[2], names[3]}
+    card_file([name for name in names if name not in removed])
+    summary = vectorstore.sync_cards(utils.load_card_table(), index, HashEmbedder(), cache_folder=tmp_path / 'embeddings')
+    assert summary['deleted'] == 3
+    index.compact()
+
+    results = retrieve_elves(mode)
+    assert len(utils.get_card_table()) == len(get_filter_index().df) == len(card_lexical.get_card_lexical_index()) == 57
+    assert results and all(subtypes == 'Elf' for _, subtypes in results)
+    assert not removed & {card_name for card_name, _ in results}
+
+
+def test_indexes_follow_version_bump_from_another_process(snapshot, card_file):
+    names, _ = snapshot
+    assert get_name_index().resolve("Test Card 70", fuzzy=False) == []
+
+    # Another process fetched a new snapshot and rebuilt: only the source file and the version token change here
+    card_file(names + ["Test Card 70"])
+    utils.bump_index_version()
+
+    df = utils.get_card_table()
+    assert len(df) == 61
+    assert get_name_index().resolve("Test Card 70")[0][3] == 'exact'
+    assert get_router().route("cards similar to Test Card 70")['card_name'] == "Test Card 70"
+    assert len(card_lexical.get_card_lexical_index()) == get_filter_index().size == 61
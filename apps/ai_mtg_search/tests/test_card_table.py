@@ -0,0 +1,107 @@
+import json
+
+import pandas as pd
+import pytest
+
+from src.db import utils
+
+FORMATS = [col.split('.', 1)[1] for col in utils.LEGALITY_FIELDS]
+
+
+def face(i, **fields):
+    return {
+        'name': f"Card {i}", 'colorIdentity': ['G', 'U'][:i % 3], 'colors': [], 'manaCost': f"{{{i % 5}}}{{G}}",
+        'convertedManaCost': float(i % 5 + 1), 'manaValue': float(i % 5 + 1), 'layout': 'normal',
+        'type': "Creature — Elf Druid", 'types': ['Creature'], 'subtypes': ['Elf', 'Druid'], 'supertypes': [],
+        'text': f"{{T}}: Add {{G}}.\nÉlan vital {i}" if i % 4 else None,
+        'legalities': {fmt: 'Legal' for fmt in FORMATS[:i % len(FORMATS) + 1]} if i % 5 else {'commander': 'Banned'},
+        'identifiers': {'scryfallOracleId': f"oracle-{i}"}, 'purchaseUrls': {'tcgplayer': f"https://example.com/{i}"},
+        'printings': ['LEA', 'M10'], 'rulings': [{'date': '2020-01-01', 'text': "A ruling."}] if i % 6 == 0 else [],
+        'foreignData': [], 'edhrecRank': 40000 - i * 997 if i % 7 else None, 'edhrecSaltiness': i / 8 if i % 2 else None,
+        'power': str(i % 4), 'toughness': '*', 'isFunny': True if i % 9 == 0 else None,
+        'isReserved': True if i % 11 == 0 else None, 'hasAlternativeDeckLimit': True if i % 13 == 0 else None,
+        'leadershipSkills': {'commander': i % 3 == 0, 'brawl': False, 'oathbreaker': False} if i % 3 == 0 else None,
+        **fields,
+    }
+
+
+def write_varied_cards(path, count=40):
+    """Cards covering every field type: split cards, missing fields, nested records, unicode, int-valued and
+    fractional numbers. Like the real AtomicCards.json, every field is set on at least one card."""
+    data = {}
+    for i in range(count):
+        if i % 10 == 3:
+            name = f"Card {i} // Card {i} Back"
+            data[name] = [
+                face(i, name=name, faceName=f"Card {i}", side='a', faceManaValue=1.0),
+                face(i, name=name, faceName=f"Card {i} Back", side='b', faceManaValue=2.5, manaCost=None),
+            ]
+        else:
+            data[f"Card {i}"] = [face(i)]
+    path.write_text(json.dumps({'meta': {'date': '2024-01-01', 'version': 'test'}, 'data': data}, ensure_ascii=False))
+    return path
+
+
+@pytest.fixture
+def varied_cards(tmp_path, monkeypatch):
+    path = write_varied_cards(tmp_path / 'AtomicCards.json')
+    monkeypatch.setattr(utils, 'JSON_PATH', path)
+    monkeypatch.setattr(utils, 'CACHE_FOLDER', tmp_path / 'cache')
+    return path
+
+
+def in_memory_table(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return utils.transform_card_data(json.load(f)["data"])
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 2000])
+def test_streamed_chunks_match_the_in_memory_load(varied_cards, chunk_size):
+    expected = in_memory_table(varied_cards)
+    assert len(expected) == 44
+    chunks = list(utils.iter_card_chunks(varied_cards, chunk_size=chunk_size))
+    assert max(len(chunk) for chunk in chunks) <= chunk_size
+    pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+    pd.testing.assert_frame_equal(utils.load_json_file(chunk_size=chunk_size), utils.load_json_file(chunk_size=None))
+
+
+def test_values_straddling_read_blocks(varied_cards, monkeypatch):
+    monkeypatch.setattr(utils._JSONStream.__init__, '__defaults__', (16,))  # 16-character reads
+    faces = list(utils.iter_card_faces(varied_cards))
+    with open(varied_cards, "r", encoding="utf-8") as f:
+        data = json.load(f)["data"]
+    assert faces == [(name, card_face) for name, card_faces in data.items() for card_face in card_faces]
+
+
+def test_compacting_chunks_matches_compacting_the_whole_table(varied_cards):
+    expected = utils.compact_card_table(in_memory_table(varied_cards))
+    pd.testing.assert_frame_equal(utils.compact_card_chunks(utils.iter_card_chunks(varied_cards, chunk_size=7)), expected)
+
+
+def test_compact_table_round_trips_to_the_plain_table(varied_cards):
+    plain = in_memory_table(varied_cards)
+    compact = utils.compact_card_table(plain)
+    assert compact['legalities.commander'].dtype == 'category'
+    assert compact['text'].dtype == utils.STRING_DTYPE
+    assert str(compact['edhrecRank'].dtype) == 'Int32' and compact['faceManaValue'].dtype == 'float32'
+    assert utils.FLAGS_COLUMN in compact and 'isFunny' not in compact
+    assert compact.memory_usage(deep=True).sum() < plain.memory_usage(deep=True).sum()
+
+    restored = utils.to_object_frame(compact)
+    pd.testing.assert_frame_equal(restored, plain)
+    # Same value types as well (assert_frame_equal treats None and NaN alike)
+    for col in plain.columns:
+        assert [(type(v), repr(v)) for v in restored[col]] == [(type(v), repr(v)) for v in plain[col]], col
+    assert utils.to_object_columns(compact, fields=['manaValue', 'isFunny']) == utils.to_object_columns(plain, fields=['manaValue', 'isFunny'])
+
+
+def test_missing_boolean_field_survives_the_round_trip(tmp_path):
+    # Absent from the whole file, the in-memory load keeps the field as all None
+    faces = [face(i) for i in (1, 2)]
+    for card_face in faces:
+        del card_face['isReserved']
+    path = tmp_path / 'AtomicCards.json'
+    path.write_text(json.dumps({'data': {card_face['name']: [card_face] for card_face in faces}}))
+    plain = in_memory_table(path)
+    assert plain['isReserved'].tolist() == [None, None]
+    pd.testing.assert_frame_equal(utils.to_object_frame(utils.compact_card_table(plain)), plain)
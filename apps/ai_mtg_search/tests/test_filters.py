@@ -0,0 +1,102 @@
+import json
+import itertools
+
+import numpy as np
+import pytest
+
+from src.db import utils
+from src.db.filters import FilterIndex
+from src.db.vectorstore import iter_search_documents
+
+TYPES = [(['Creature'], ['Elf', 'Druid']), (['Artifact', 'Creature'], ['Golem']), (['Instant'], []), (['Creature'], ['Goblin'])]
+COLORS = [[], ['G'], ['G', 'R'], ['U', 'B'], ['R']]
+LAYOUTS = ['normal', 'normal', 'adventure', 'split']
+LEGALITIES = ['Legal', 'Banned', 'Not Legal']
+
+
+def write_filter_cards(path, count=60):
+    data = {}
+    for i in range(count):
+        types, subtypes = TYPES[i % len(TYPES)]
+        data[f"Card {i}"] = [{
+            'name': f"Card {i}", 'types': types, 'subtypes': subtypes, 'supertypes': ['Legendary'] if i % 4 == 0 else [],
+            'colorIdentity': COLORS[i % len(COLORS)], 'layout': LAYOUTS[i % len(LAYOUTS)],
+            'manaValue': 2.5 if i == 7 else float(i % 8), 'text': "Draw a card.", 'type': ' '.join(types),
+            'legalities': {'commander': LEGALITIES[i % len(LEGALITIES)]} if i % 10 else {},
+            'leadershipSkills': {'commander': True, 'brawl': False, 'oathbreaker': False} if i % 4 == 0 else None,
+            'identifiers': {'scryfallOracleId': f"oracle-{i}"},
+        }]
+    path.write_text(json.dumps({'data': data}))
+
+
+def matches(metadata, clause):
+    """Evaluate a Pinecone metadata filter against one vector's metadata."""
+    if '$and' in clause:
+        return all(matches(metadata, sub) for sub in clause['$and'])
+    if '$or' in clause:
+        return any(matches(metadata, sub) for sub in clause['$or'])
+    (field, condition), = clause.items()
+    value = metadata.get(field)
+    results = []
+    for op, operand in condition.items():
+        if op == '$exists':
+            results.append((value is not None) == operand)
+        elif value is None:
+            results.append(False)
+        else:
+            results.append({
+                '$in': lambda: value in operand, '$eq': lambda: value == operand,
+                '$gte': lambda: value >= operand, '$lte': lambda: value <= operand,
+            }[op]())
+    return all(results)
+
+
+SELECTIONS = [
+    {'types': ['Creature']},
+    {'types': ['Artifact', 'Creature']},
+    {'subtypes': ['Elf', 'Goblin']},
+    {'supertypes': ['Legendary']},
+    {'colorIdentity': ['G']},
+    {'colorIdentity': ['G', 'R']},
+    {'layout': ['adventure', 'split']},
+    {'legalities.commander': 'Legal'},
+    {'leadershipSkills.commander': True},
+    {'manaValue': '<=2'},
+    {'manaValue': '>3'},
+    {'manaValue': '2-4'},
+    {'manaValue': '2.5'},
+    {'types': ['Creature'], 'subtypes': ['Elf'], 'colorIdentity': ['G'], 'manaValue': '<=4', 'legalities.commander': 'Legal'},
+    {'types': ['Creature'], 'colorIdentity': ['G', 'R', 'U', 'B'], 'layout': ['normal'], 'supertypes': ['Legendary']},
+    {'subtypes': ['Nonexistent']},
+]
+
+
+@pytest.fixture(scope='module')
+def cards(tmp_path_factory):
+    path = tmp_path_factory.mktemp('cards') / 'AtomicCards.json'
+    write_filter_cards(path)
+    df = utils.compact_card_chunks(utils.iter_card_chunks(path))
+    stored = [doc.metadata for batch in iter_search_documents(df, batch_size=16) for doc in batch]
+    return FilterIndex(df), stored
+
+
+@pytest.mark.parametrize('selections', SELECTIONS, ids=lambda selections: ','.join(f"{k}={v}" for k, v in selections.items()))
+def test_bitmap_mask_matches_pinecone_filter(cards, selections):
+    filter_index, stored = cards
+    card_filter = filter_index.compile(selections)
+    expected = np.array([matches(metadata, card_filter.native) for metadata in stored])
+    np.testing.assert_array_equal(card_filter.mask, expected)
+
+
+def test_every_pair_of_selections_agrees(cards):
+    filter_index, stored = cards
+    for first, second in itertools.combinations(SELECTIONS[:13], 2):
+        card_filter = filter_index.compile({**first, **second})
+        expected = np.array([matches(metadata, card_filter.native) for metadata in stored])
+        np.testing.assert_array_equal(card_filter.mask, expected, err_msg=str({**first, **second}))
+
+
+def test_empty_selections_compile_to_no_filter(cards):
+    filter_index, _ = cards
+    assert filter_index.compile({}) is None
+    assert filter_index.compile({'types': [], 'layout': 'Any', 'manaValue': ''}) is None
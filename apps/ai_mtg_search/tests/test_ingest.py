@@ -0,0 +1,94 @@
+import json
+
+import pytest
+from langchain.schema import Document
+
+from src.db.ingest import Checkpoint, run_ingest_pipeline
+
+RUN_KEY = {'index': 'test', 'batch_size': 10, 'cards': 'abc', 'rows': 50}
+
+
+class Embedder:
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+class Index:
+    """Records upsert requests; raises after `fail_after` of them, like a crashed build."""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.requests = []
+        self.vectors = {}
+
+    def upsert(self, vectors):
+        if self.fail_after is not None and len(self.requests) >= self.fail_after:
+            raise RuntimeError("simulated crash")
+        self.requests.append(len(vectors))
+        self.vectors.update((vector['id'], vector) for vector in vectors)
+
+
+def batches(cards=50, batch_size=10):
+    """(batch_id, docs, ids, fingerprints) batches, as iter_ingest_batches yields them."""
+    for start in range(0, cards, batch_size):
+        rows = range(start, start + batch_size)
+        docs = [Document(page_content=f"Card {i}: text", metadata={'cardName': f"Card {i}"}) for i in rows]
+        ids = [f"card-{i}" for i in rows]
+        yield start, docs, ids, [f"fp-{vector_id}" for vector_id in ids]
+
+
+def ingest(checkpoint, index, embedder=None):
+    return run_ingest_pipeline(
+        batches(), embedder or Embedder(), index, checkpoint=checkpoint, embed_workers=1, upsert_workers=1, upsert_chunk_size=4,
+    )
+
+
+def test_interrupted_build_resumes_from_the_checkpoint(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    index = Index(fail_after=7)  # two full batches (3 requests of <= 4 vectors each) and part of the third
+    with pytest.raises(RuntimeError):
+        ingest(Checkpoint(path, RUN_KEY), index)
+
+    checkpoint = Checkpoint(path, RUN_KEY)
+    assert sorted(checkpoint.done) == [0, 10]
+    index.fail_after = None
+    embedder = Embedder()
+    stats = ingest(checkpoint, index, embedder)
+    assert stats.resumed == 20 and stats.cards == 30
+    assert len(embedder.texts) == 30 and "Card 0: text" not in embedder.texts
+    assert sorted(index.vectors) == sorted(f"card-{i}" for i in range(50))
+    assert max(index.requests) == 4
+    assert checkpoint.manifest() == {f"card-{i}": f"fp-card-{i}" for i in range(50)}
+
+
+def test_log_of_another_run_is_discarded(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    Checkpoint(path, RUN_KEY).commit(0, {'card-0': 'fp'})
+    assert Checkpoint(path, {**RUN_KEY, 'rows': 51}).done == {}
+    assert not path.exists()
+
+
+@pytest.mark.parametrize('content', ['', '{"run": {"index": "te', '{"run": {"index": "te\n{"batch": 0, "manifest": {}}\n'])
+def test_truncated_header_starts_fresh(tmp_path, content):
+    path = tmp_path / "checkpoint.jsonl"
+    path.write_text(content)
+    checkpoint = Checkpoint(path, RUN_KEY)
+    assert checkpoint.done == {}
+    checkpoint.commit(0, {'card-0': 'fp'})
+    assert Checkpoint(path, RUN_KEY).done == {0: {'card-0': 'fp'}}
+
+
+def test_half_written_batch_is_dropped_before_appending(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    Checkpoint(path, RUN_KEY).commit(0, {'card-0': 'fp'})
+    with open(path, "a") as f:
+        f.write(json.dumps({'batch': 10, 'manifest': {'card-10': 'fp'}})[:20])
+
+    checkpoint = Checkpoint(path, RUN_KEY)
+    assert checkpoint.done == {0: {'card-0': 'fp'}}
+    checkpoint.commit(10, {'card-10': 'fp'})
+    assert Checkpoint(path, RUN_KEY).done == {0: {'card-0': 'fp'}, 10: {'card-10': 'fp'}}
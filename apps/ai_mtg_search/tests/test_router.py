@@ -0,0 +1,40 @@
+import pytest
+
+from src.db import utils
+from src.db.names import NameIndex
+from src.router import QueryRouter
+
+
+@pytest.fixture
+def router(card_file):
+    card_file(["Rhystic Study", "Lightning Bolt", "Chatterfang, Squirrel General"], subtypes=('Dog', 'Town', 'Squirrel'))
+    df = utils.load_card_table()
+    return QueryRouter.from_card_table(df, NameIndex(df))
+
+
+@pytest.mark.parametrize('query', [
+    "What time is it?", "Tell me a joke about a dog", "Who will win the election", "Write me a poem about the moon",
+    "Best pizza in town", "What is the meaning of life", "Squirrel facts", "What should I build with Chatterfang?",
+])
+def test_off_topic_and_judgement_queries_go_to_the_planner(router, query):
+    assert router.route(query) is None
+
+
+@pytest.mark.parametrize('query, search_text', [
+    ("What cards that make the most squirrel tokens?", "make the most squirrel tokens"),
+    ("Show me cards with protection from red", "protection from red"),
+    ("Squirrels that gain life", "Squirrels that gain life"),
+    ("Find me the most efficient exile removal spells", "exile removal spells"),
+])
+def test_effect_descriptions_take_the_fast_path(router, query, search_text):
+    assert router.route(query) == {
+        'query_type': 'text_search', 'card_name': None, 'search_text': search_text, 'reason': "router: effect description",
+    }
+
+
+@pytest.mark.parametrize('query, card_name', [
+    ("Chatterfang", "Chatterfang"), ("cards similar to Rhystic Study", "Rhystic Study"), ("Lightning Blot", "Lightning Blot"),
+])
+def test_card_names_become_seed_card_plans(router, query, card_name):
+    plan = router.route(query)
+    assert plan['query_type'] == 'seed_card' and plan['card_name'] == card_name
@@ -0,0 +1,16 @@
+from src import search
+from src.db import utils
+
+
+def test_retrieve_by_name_rerank_prefers_commander_legal_cards(card_file):
+    card_file(["Lightning Bolt", "Lightning Bold", "Rhystic Study"])
+    df = utils.load_card_table()
+    legality = df['legalities.commander'].cat.add_categories(['Banned'])
+    legality[df['cardName'] == "Lightning Bolt"] = 'Banned'
+    utils.set_card_table(df.assign(**{'legalities.commander': legality}))
+
+    assert search.retrieve_by_name("Lightnig Bolt")['cardName'] == "Lightning Bolt"
+    assert search.retrieve_by_name("Lightnig Bolt", rerank=True)['cardName'] == "Lightning Bold"
+    # An exact name has a single candidate, reranked or not
+    assert search.retrieve_by_name("Rhystic Study", rerank=True)['cardName'] == "Rhystic Study"
+    assert search.retrieve_by_name("Zzyzx Qqq") is None
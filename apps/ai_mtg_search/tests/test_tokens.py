@@ -0,0 +1,37 @@
+import pytest
+import tiktoken
+
+from src import tokens
+from src.context import build_context, CONTEXT_HEADER, CONTEXT_LEGEND
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """tiktoken without its BPE files and no network to download them."""
+    calls = []
+
+    def unavailable(name):
+        calls.append(name)
+        raise ConnectionError("no network")
+
+    monkeypatch.setattr(tokens, '_ENCODINGS', {})
+    monkeypatch.setattr(tiktoken, 'encoding_for_model', unavailable)
+    monkeypatch.setattr(tiktoken, 'get_encoding', unavailable)
+    return calls
+
+
+def test_token_counter_is_lazy_and_falls_back_to_an_estimate(offline):
+    count = tokens.token_counter("gpt-4o")
+    assert offline == []
+    assert count("Counter target spell.") == tokens.estimate_tokens("Counter target spell.") == 6
+    assert count("Draw a card.") == 3
+    assert offline == ["gpt-4o"]  # a failed load isn't retried
+
+
+def test_context_budget_holds_without_an_encoding(offline):
+    ranked = [({'cardName': f"Card {i}", 'text': "Draw a card. " * 20, 'manaCost': '{1}{U}'}, 1 / (i + 1)) for i in range(50)]
+    count = tokens.token_counter("gpt-4o")
+    context, included = build_context(ranked, count, budget=400)
+    assert 0 < included < 50
+    assert count(context) <= 400
+    assert context.startswith(CONTEXT_LEGEND + CONTEXT_HEADER) and "Card 0|" in context
@@ -1,9 +1,13 @@
 import os
+import sys
 import json
 from langchain_openai import OpenAI, ChatOpenAI
 from langchain.chains import LLMChain
 import streamlit as st
 
+# The shared LLM client layer lives in apps/shared
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
 from src.constants import DESCRIPTION, DUMMY_DATA
 from src.utils import validate_openai_api_key, query_llm, render_prompts, EVALS
 from src.prompts import STARTING_PROMPT, TUNING_PROMPT
@@ -1,9 +1,10 @@
 import streamlit as st
-from langchain.prompts import PromptTemplate
-from langchain_openai import OpenAI, ChatOpenAI
+from langchain_openai import OpenAI
 from langchain.chains import LLMChain
 
 from .constants import DUMMY_DATA
+
+from shared.llm import get_chat_model, prompt_template
 from .prompts import (
     STARTING_PROMPT,
     FACTUALNESS_AND_ACCURACY,
@@ -42,17 +43,18 @@ def validate_openai_api_key(api_key: str) -> bool:
 # --- LLM Query Helper ---
 def query_llm(prompt: str, params: dict) -> str:
     """Send a prompt and parameters to the LLM and return the output as a string."""
-    prompt_template = PromptTemplate(
-        template=prompt,
+    template = prompt_template(
+        prompt,
         input_variables=list(params.keys())
     )
     
-    LLM = ChatOpenAI(
-        model="gpt-4.1-mini",
+    # Shared pooled client, rate limited per model across the whole tuning loop
+    LLM = get_chat_model(
+        "gpt-4.1-mini",
         temperature=0.0
     )
     
-    chain = prompt_template | LLM
+    chain = template | LLM
     result = chain.invoke(params).content
     
     if isinstance(result, str):
@@ -0,0 +1,134 @@
+"""Local OpenAI-compatible stand-in for running the apps and load tests without the real API.
+
+Serves /v1/models, /v1/chat/completions (plain and streamed) and /v1/completions with canned
+answers after `--latency` seconds, answers every `--rate-limit-every`-th request with a 429, and
+counts the TCP connections it accepted, to check that clients reuse them. Run from `apps`:
+
+    python -m shared.fake_openai --port 8089 --latency 0.2 --rate-limit-every 10
+    OPENAI_API_KEY=sk-local OPENAI_BASE_URL=http://localhost:8089/v1 streamlit run agent/app.py
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STATS = {'connections': 0, 'requests': 0, 'rate_limited': 0}
+_STATS_LOCK = threading.Lock()
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled clients reuse connections
+    disable_nagle_algorithm = True
+    latency = 0.0
+    rate_limit_every = 0
+    answer = "Final Answer: This is a canned answer from the local stand-in."
+
+    def setup(self):
+        super().setup()
+        with _STATS_LOCK:
+            STATS['connections'] += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            return self._send_json(200, {'object': 'list', 'data': [{'id': 'gpt-4.1-nano', 'object': 'model', 'owned_by': 'local'}]})
+        self._send_json(404, {'error': {'message': f'unknown path {self.path}'}})
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        with _STATS_LOCK:
+            STATS['requests'] += 1
+            limited = self.rate_limit_every and STATS['requests'] % self.rate_limit_every == 0
+            if limited:
+                STATS['rate_limited'] += 1
+        if limited:
+            return self._send_json(429, {'error': {'message': 'Rate limit reached', 'type': 'requests'}}, {'Retry-After': '1'})
+        time.sleep(self.latency)
+
+        model = request.get('model', 'gpt-4.1-nano')
+        usage = {'prompt_tokens': len(json.dumps(request)) // 4, 'completion_tokens': len(self.answer) // 4}
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        if self.path.endswith('/chat/completions'):
+            if request.get('stream'):
+                return self._stream_chat(model)
+            return self._send_json(200, {
+                'id': 'chatcmpl-local', 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': self.answer}, 'finish_reason': 'stop'}],
+                'usage': usage,
+            })
+        if self.path.endswith('/completions'):
+            return self._send_json(200, {
+                'id': 'cmpl-local', 'object': 'text_completion', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'text': self.answer, 'finish_reason': 'stop', 'logprobs': None}],
+                'usage': usage,
+            })
+        self._send_json(404, {'error': {'message': f'unknown path {self.path}'}})
+
+    def _stream_chat(self, model):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        words = self.answer.split(' ')
+        for i, word in enumerate(words):
+            delta = {'content': word + (' ' if i < len(words) - 1 else '')}
+            self._write_chunk({
+                'id': 'chatcmpl-local', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}],
+            })
+        self._write_chunk({
+            'id': 'chatcmpl-local', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+            'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+        })
+        self._write_event(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, payload):
+        self._write_event(f"data: {json.dumps(payload)}\n\n".encode())
+
+    def _write_event(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def serve(port=8089, latency=0.0, rate_limit_every=0):
+    """Start the stand-in on a background thread and return the server (call shutdown() to stop)."""
+    handler = type('Handler', (FakeOpenAIHandler,), {'latency': latency, 'rate_limit_every': rate_limit_every})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--rate-limit-every', type=int, default=0, help="answer every n-th request with a 429 (0: never)")
+    args = parser.parse_args()
+
+    serve(args.port, args.latency, args.rate_limit_every)
+    print(f"OpenAI stand-in on http://localhost:{args.port}/v1 (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(10)
+            print(STATS)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
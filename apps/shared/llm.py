@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import httpx
+from langchain.prompts import PromptTemplate
+from langchain_openai import ChatOpenAI, OpenAI
+
+# Connection pool shared by every model client in the process
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "10"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))  # seconds
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))  # the OpenAI SDK retries 429s and 5xx with exponential backoff
+# Per-model budgets, requests and tokens per minute; LLM_LIMITS="gpt-4.1-mini=500:200000,gpt-4.1-nano=500:200000" overrides single models
+LLM_RPM = int(os.getenv("LLM_RPM", "500"))
+LLM_TPM = int(os.getenv("LLM_TPM", "200000"))
+LLM_LIMITS = os.getenv("LLM_LIMITS", "")
+
+CHARS_PER_TOKEN = 4  # rough prompt size estimate for the token budget
+DEFAULT_COMPLETION_TOKENS = 512  # assumed completion size when a request sets no max_tokens
+RATE_LIMIT_PAUSE = 1.0  # seconds every caller of a model waits after a 429 without Retry-After
+PROMPT_CACHE_SIZE = int(os.getenv("PROMPT_CACHE_SIZE", "64"))  # parsed prompt templates kept (LRU)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilling `rate` units per second up to `capacity`.
+
+    reserve() takes the units right away and returns how long the caller has to wait for them, so
+    sync callers sleep and async callers await the same bucket, and waiters are served in order."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.available = capacity
+        self.updated = clock()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        with self._lock:
+            now = self.clock()
+            self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+            self.updated = now
+            # Larger requests than the bucket holds still go through, one full bucket at a time
+            self.available -= min(amount, self.capacity)
+            wait = -self.available / self.rate if self.available < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def pause(self, seconds):
+        """Hold every caller back for `seconds` (after a rate limit response)."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+
+class ModelLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for one model."""
+
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM):
+        self.requests = TokenBucket(rpm / 60, rpm)
+        self.tokens = TokenBucket(tpm / 60, tpm)
+        self.waited = 0.0  # seconds callers spent waiting on this limiter
+        self.rate_limited = 0  # 429 responses seen
+
+    def delay(self, tokens):
+        """Seconds to wait before sending a request of about `tokens` tokens."""
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        self.waited += wait
+        return wait
+
+    def pause(self, seconds):
+        self.rate_limited += 1
+        self.requests.pause(seconds)
+        self.tokens.pause(seconds)
+
+
+def parse_limits(text):
+    """"model=rpm:tpm,..." -> {model: (rpm, tpm)}."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        model, _, values = item.partition('=')
+        rpm, _, tpm = values.partition(':')
+        limits[model.strip()] = (int(rpm), int(tpm or LLM_TPM))
+    return limits
+
+
+_LIMITS = parse_limits(LLM_LIMITS)
+_LIMITERS = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def get_limiter(model):
+    """The process-wide limiter for a model (shared by every app and client using it)."""
+    with _LIMITERS_LOCK:
+        if model not in _LIMITERS:
+            _LIMITERS[model] = ModelLimiter(*_LIMITS.get(model, (LLM_RPM, LLM_TPM)))
+        return _LIMITERS[model]
+
+
+def request_cost(request):
+    """(model, estimated tokens) of an OpenAI API request, or (None, 0) if it names no model."""
+    try:
+        body = json.loads(request.content or b'{}')
+    except (ValueError, httpx.RequestNotRead):
+        return None, 0
+    if not isinstance(body, dict) or 'model' not in body:
+        return None, 0
+    prompt = json.dumps(body.get('messages') or body.get('prompt') or body.get('input') or '')
+    completion = body.get('max_completion_tokens') or body.get('max_tokens') or DEFAULT_COMPLETION_TOKENS
+    return body['model'], len(prompt) // CHARS_PER_TOKEN + completion
+
+
+def retry_after(response):
+    """Seconds the server asked us to wait (Retry-After / retry-after-ms), else RATE_LIMIT_PAUSE."""
+    try:
+        if 'retry-after-ms' in response.headers:
+            return float(response.headers['retry-after-ms']) / 1000
+        return float(response.headers.get('retry-after', RATE_LIMIT_PAUSE))
+    except ValueError:
+        return RATE_LIMIT_PAUSE
+
+
+def _limit_request(request):
+    model, tokens = request_cost(request)
+    if model:
+        time.sleep(get_limiter(model).delay(tokens))
+
+
+def _note_rate_limit(response):
+    # One 429 pauses the model for every caller, not just the one that got it
+    if response.status_code == 429:
+        model, _ = request_cost(response.request)
+        if model:
+            get_limiter(model).pause(retry_after(response))
+
+
+async def _alimit_request(request):
+    model, tokens = request_cost(request)
+    if model:
+        await asyncio.sleep(get_limiter(model).delay(tokens))
+
+
+async def _anote_rate_limit(response):
+    _note_rate_limit(response)
+
+
+def _limits():
+    return httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE)
+
+
+_LOCK = threading.RLock()
+_HTTP_CLIENT = None
+_MODELS = {}  # (class, settings) -> model shared by sync callers
+# Async connections belong to the event loop that opened them, and Streamlit reruns call asyncio.run
+# anew, so each thread keeps the async pool (and models using it) of its current loop, closed with that loop
+_ASYNC = threading.local()
+
+
+def get_http_client():
+    """Process-wide keep-alive connection pool for sync LLM calls, rate limited per model."""
+    global _HTTP_CLIENT
+    with _LOCK:
+        if _HTTP_CLIENT is None:
+            _HTTP_CLIENT = httpx.Client(
+                limits=_limits(), timeout=LLM_TIMEOUT,
+                event_hooks={'request': [_limit_request], 'response': [_note_rate_limit]},
+            )
+        return _HTTP_CLIENT
+
+
+async def _close_with_loop(client):
+    """Wait for the event loop to shut down, then close `client` on it.
+
+    asyncio.run finalizes pending async generators before it closes the loop, so the pool's
+    connections are closed on the loop that owns them instead of leaking with it."""
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+def _async_state():
+    """(async client, models) for the running event loop, or None outside one."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    if getattr(_ASYNC, 'loop', None) is not loop:
+        client = httpx.AsyncClient(
+            limits=_limits(), timeout=LLM_TIMEOUT,
+            event_hooks={'request': [_alimit_request], 'response': [_anote_rate_limit]},
+        )
+        lifetime = _close_with_loop(client)
+        # Start the generator so the loop tracks it; the task only runs it up to its `yield`
+        _ASYNC.lifetime = (lifetime, asyncio.ensure_future(anext(lifetime)))
+        _ASYNC.loop, _ASYNC.client, _ASYNC.models = loop, client, {}
+    return _ASYNC.client, _ASYNC.models
+
+
+def get_async_http_client():
+    """Keep-alive connection pool for async LLM calls on the running event loop (None outside one)."""
+    state = _async_state()
+    return state[0] if state else None
+
+
+def _get_model(cls, **settings):
+    api_key = os.getenv("OPENAI_API_KEY")
+    # Any OpenAI-compatible endpoint, e.g. http://localhost:8089/v1 for `python -m shared.fake_openai`
+    base_url = os.getenv("OPENAI_BASE_URL") or None
+    # The API key is part of the key, since the apps set it from the sidebar after import
+    key = (cls, api_key, base_url, tuple(sorted(settings.items())))
+    state = _async_state()
+    with _LOCK:
+        models = state[1] if state else _MODELS
+        if key not in models:
+            models[key] = cls(
+                **settings, base_url=base_url, max_retries=LLM_MAX_RETRIES,
+                http_client=get_http_client(), http_async_client=state[0] if state else None,
+            )
+        return models[key]
+
+
+def get_chat_model(model, temperature=0.0, **kwargs):
+    """Shared ChatOpenAI on the pooled, rate limited connections (one instance per settings and API key)."""
+    return _get_model(ChatOpenAI, model=model, temperature=temperature, **kwargs)
+
+
+def get_completion_model(temperature=0.0, **kwargs):
+    """Shared completions-API OpenAI model (langchain's default model unless `model` is given)."""
+    return _get_model(OpenAI, temperature=temperature, **kwargs)
+
+
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def _prompt_template(template, input_variables):
+    if input_variables is None:
+        return PromptTemplate.from_template(template)
+    return PromptTemplate(template=template, input_variables=list(input_variables))
+
+
+def prompt_template(template, input_variables=None):
+    """Parsed PromptTemplate for a template string, kept for the PROMPT_CACHE_SIZE most recent templates."""
+    return _prompt_template(template, tuple(input_variables) if input_variables is not None else None)
+
+
+_PROMPT_FILES = {}
+
+
+def load_prompt_template(path, input_variables=None):
+    """PromptTemplate from a prompt file, re-read only when the file changes."""
+    path = Path(path)
+    mtime = path.stat().st_mtime_ns
+    cached = _PROMPT_FILES.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = _PROMPT_FILES[path] = (mtime, path.read_text(encoding='utf-8'))
+    return prompt_template(cached[1], input_variables)
+
+
+def limiter_stats():
+    return {
+        model: {'waited_s': round(limiter.waited, 3), 'rate_limited': limiter.rate_limited}
+        for model, limiter in _LIMITERS.items()
+    }
+
+
+if __name__ == "__main__":
+    # Concurrent load through the shared client, e.g. against `python -m shared.fake_openai --rate-limit-every 10`:
+    #   OPENAI_API_KEY=sk-local OPENAI_BASE_URL=http://localhost:8089/v1 LLM_RPM=120 python -m shared.llm 40
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    chain = prompt_template("Say hi to {name}.") | get_chat_model("gpt-4.1-nano")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: chain.invoke({'name': f'user {i}'}), range(count)))
+    print(f"{count} requests in {time.perf_counter() - start:.2f}s", limiter_stats())